@@ -26,6 +26,7 @@ from operation.views_financiero import DashboardFinancieroViewSet
 from operation.views_operativo import DashboardOperativoViewSet
 # Printer management imports
 from operation.views_printer_config import PrinterConfigViewSet
+from operation.sse_views import sse_stream
 
 # Create router and register viewsets
 router = DefaultRouter()
@@ -182,7 +183,8 @@ urlpatterns = [
     path('csrf/', get_csrf_token, name='csrf-token'),
     # Authentication endpoints
     path('auth/', include('backend.auth_urls')),
-    # REMOVIDO: SSE endpoints - Era específico para kitchen views
+    # SSE: cambios de órdenes e items en tiempo real (servir con ASGI)
+    path('sse/<str:stream_type>/', sse_stream, name='sse-stream'),
     # Import endpoints FIRST to avoid router conflicts
     path('import/units/', import_units_excel, name='import-units-excel'),
     path('restaurant-config/operational_info/', operational_info, name='operational-info'),
@@ -3,6 +3,10 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Los streams SSE (/api/v1/sse/<stream>/) requieren este punto de entrada para
+mantener muchas conexiones abiertas sin un hilo por cliente, por ejemplo:
+``uvicorn backend.asgi:application --host 0.0.0.0 --port 8000``
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,54 @@
+"""
+GET condicional (ETag / Last-Modified) para ViewSets de polling
+"""
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    list y retrieve responden 304 sin ejecutar el queryset ni los serializers cuando
+    las colecciones de `version_resources` no cambiaron desde la versión del cliente.
+
+    Las acciones que dependen de otras colecciones las declaran en `get_version_resources`.
+    `version_bucket_seconds` agrega al ETag un intervalo de tiempo para respuestas
+    con campos que dependen de la hora (p.ej. minutos transcurridos).
+    """
+    version_resources = ()
+    version_bucket_seconds = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(request, super().retrieve, *args, **kwargs)
+
+    def get_version_resources(self):
+        return self.version_resources
+
+    def get_validators(self):
+        """Devuelve (etag, last_modified en segundos epoch)"""
+        from config.models import ResourceVersion
+
+        parts, last_modified = ResourceVersion.current(self.get_version_resources())
+        last_modified = int(last_modified.timestamp()) if last_modified else 0
+        if self.version_bucket_seconds:
+            bucket = int(timezone.now().timestamp()) // self.version_bucket_seconds
+            parts.append(f"t{bucket}")
+            last_modified = max(last_modified, bucket * self.version_bucket_seconds)
+        return f'"{"-".join(parts)}"', last_modified
+
+    def conditional_get(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Siempre revalidar: el 304 es casi gratis
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -231,7 +231,7 @@ SPECTACULAR_SETTINGS = {
 # ──────────────────────────────────────────────────────────────
 
 # NO RATE LIMITING - Local development unlimited requests
-# Cache configuration for Django sessions only
+# Cache configuration (sesiones y reportes de dashboards)
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -239,7 +239,49 @@ CACHES = {
         'OPTIONS': {
             'MAX_ENTRIES': 1000,
         }
-    }
+    },
+    # Reportes de dashboards: en disco para que la invalidación alcance a todos los procesos web
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'data' / 'cache' / 'reports',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        }
+    },
+}
+
+# ──────────────────────────────────────────────────────────────
+# Impresión asíncrona (operation/print_dispatcher.py)
+# ──────────────────────────────────────────────────────────────
+PRINT_DISPATCHER = {
+    # False: no iniciar hilos en el proceso web; usar `manage.py run_print_dispatcher`
+    'THREADS': os.getenv('PRINT_DISPATCHER_THREADS', 'True').lower() == 'true',
+    'MAX_ATTEMPTS': int(os.getenv('PRINT_MAX_ATTEMPTS', '5')),
+    'BACKOFF_SECONDS': 2,       # 2s, 4s, 8s... entre reintentos
+    'MAX_BACKOFF_SECONDS': 60,
+    'BATCH_SIZE': 20,           # Items agrupados por escritura al dispositivo
+    'POLL_SECONDS': 30,
+    'STALE_SECONDS': 120,
+}
+
+# ──────────────────────────────────────────────────────────────
+# Eventos en tiempo real - SSE (operation/events.py, operation/sse_views.py)
+# ──────────────────────────────────────────────────────────────
+EVENT_STREAM = {
+    'BROKER': 'operation.events.InMemoryBroker',  # Broker local del proceso
+    'HEARTBEAT_SECONDS': 15,
+    'MAX_QUEUE_SIZE': 500,      # Eventos por conexión antes de forzar reconexión
+    'SYNC_MAX_SECONDS': 60,     # Duración máxima de un stream servido por WSGI
+}
+
+# ──────────────────────────────────────────────────────────────
+# Caché de reportes de dashboards (operation/report_cache.py)
+# ──────────────────────────────────────────────────────────────
+DASHBOARD_CACHE = {
+    'ENABLED': True,
+    'CACHE': 'reports',         # Alias de CACHES
+    'TODAY_SECONDS': 30,        # Reportes que incluyen el día en curso
+    'PAST_SECONDS': None,       # Días cerrados: sin expiración (se invalidan por eventos)
 }
 
 # Enhanced Logging configuration with Authentication support
@@ -0,0 +1,59 @@
+"""
+Unidad de trabajo para recálculos diferidos al commit de la transacción
+"""
+import threading
+import weakref
+from django.db import transaction
+
+
+class _PendingBatch:
+    """Ids marcados durante una transacción; es el callback on_commit de esa transacción"""
+
+    def __init__(self, flush, ids):
+        self._flush = flush
+        self.ids = set(ids)
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        self._flush(self.ids)
+
+
+class DeferredRecalculation:
+    """
+    Acumula ids marcados como "sucios" durante la transacción actual y ejecuta
+    el recálculo una sola vez, en lote, cuando la transacción hace commit.
+
+    Fuera de un bloque atómico el recálculo se ejecuta inmediatamente.
+
+    Cada transacción registra un único callback on_commit (el lote) y el hilo solo
+    guarda una referencia débil a él: si la transacción o el savepoint donde se
+    registró se revierte, Django descarta el callback, el lote desaparece con él y
+    la siguiente marca empieza uno nuevo. Los ids marcados dentro de un savepoint
+    revertido cuyo lote se registró antes, en el bloque exterior, se recalculan
+    igual al commit (el recálculo es idempotente).
+    """
+
+    def __init__(self, flush):
+        self._flush = flush
+        self._local = threading.local()
+
+    def _current_batch(self):
+        ref = getattr(self._local, 'batch', None)
+        batch = ref() if ref is not None else None
+        if batch is None or batch.done:
+            return None
+        return batch
+
+    def mark(self, *ids):
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return
+        batch = self._current_batch()
+        if batch is not None:
+            batch.ids.update(ids)
+            return
+        batch = _PendingBatch(self._flush, ids)
+        self._local.batch = weakref.ref(batch)
+        # Fuera de un bloque atómico se ejecuta aquí mismo
+        transaction.on_commit(batch)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ConfigConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'config'
+
+    def ready(self):
+        """Conectar el versionado de recursos para los GET condicionales"""
+        from .signals import setup_signals
+        setup_signals()
@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from decimal import Decimal
 from django.core.validators import MinValueValidator
+from backend.unit_of_work import DeferredRecalculation
 
 
 
@@ -48,6 +49,9 @@ class Zone(models.Model):
 
 class Table(models.Model):
     """Mesas del restaurante"""
+    # Estados de orden que mantienen la mesa ocupada
+    ACTIVE_ORDER_STATUSES = ['CREATED', 'PREPARING']
+
     zone = models.ForeignKey(Zone, on_delete=models.PROTECT)
     table_number = models.CharField(max_length=20, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -61,6 +65,21 @@ class Table(models.Model):
     def __str__(self):
         return f"Mesa {self.table_number} - {self.zone.name}"
 
+    @classmethod
+    def with_active_orders_count(cls, queryset):
+        """Anota `active_orders_total` (órdenes activas por mesa) en la misma consulta de mesas"""
+        return queryset.annotate(active_orders_total=models.Count(
+            'order', filter=models.Q(order__status__in=cls.ACTIVE_ORDER_STATUSES)
+        ))
+
+    def get_active_orders_count(self):
+        """Órdenes activas: usa la anotación o las órdenes activas precargadas si existen"""
+        if hasattr(self, 'active_orders_total'):
+            return self.active_orders_total
+        if hasattr(self, 'active_orders'):
+            return len(self.active_orders)
+        return self.order_set.filter(status__in=self.ACTIVE_ORDER_STATUSES).count()
+
     def release_table(self):
         """Releases the table when order is SERVED"""
         # For now, just mark as available
@@ -100,15 +119,48 @@ class Container(models.Model):
         return f"{self.name} - {self.price}"
 
     def update_stock(self, quantity, operation='subtract'):
-        """Actualiza el stock del envase"""
+        """Actualiza el stock del envase con un UPDATE atómico (ver adjust_stock)"""
         if operation == 'subtract':
-            if self.stock < quantity:
-                raise ValidationError(f"Stock insuficiente. Stock actual: {self.stock}")
-            self.stock -= quantity
+            Container.adjust_stock({self.pk: -quantity})
         elif operation == 'add':
-            self.stock += quantity
-        
-        self.save()
+            Container.adjust_stock({self.pk: quantity})
+        self.refresh_from_db(fields=['stock', 'updated_at'])
+
+    @staticmethod
+    def adjust_stock(deltas):
+        """
+        Aplica variaciones de stock {container_id: delta} en un único UPDATE condicional
+        (stock = stock + delta WHERE stock + delta >= 0). Si alguna fila no cumple la
+        condición se revierte todo y se lanza ValidationError.
+        """
+        deltas = {pk: int(delta) for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        delta = models.Case(
+            *[models.When(pk=pk, then=models.Value(value)) for pk, value in deltas.items()],
+            output_field=models.IntegerField()
+        )
+        required = models.Case(
+            *[models.When(pk=pk, then=models.Value(-value)) for pk, value in deltas.items()],
+            output_field=models.IntegerField()
+        )
+
+        with transaction.atomic():
+            updated = Container.objects.filter(pk__in=deltas, stock__gte=required).update(
+                stock=models.F('stock') + delta,
+                updated_at=timezone.now()
+            )
+            if updated < len(deltas):
+                insufficient = [
+                    f"{name} (Stock actual: {stock})"
+                    for pk, name, stock in Container.objects.filter(pk__in=deltas)
+                    .values_list('pk', 'name', 'stock')
+                    if stock + deltas[pk] < 0
+                ]
+                raise ValidationError(f"Stock insuficiente: {', '.join(insufficient)}")
+
+        # QuerySet.update no emite signals
+        ResourceVersion.bump('recipes', 'orders')
 
     def delete(self, *args, **kwargs):
         # Soft delete - solo marcamos como inactivo si tiene ventas asociadas
@@ -117,3 +169,57 @@ class Container(models.Model):
             self.save()
         else:
             super().delete(*args, **kwargs)
+
+
+class ResourceVersion(models.Model):
+    """
+    Versión por colección de recursos de la API (orders, tables, recipes).
+    Se incrementa al commit de cualquier cambio (ver config/signals.py) y alimenta
+    los ETag / Last-Modified de los GET condicionales.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'resource_version'
+        verbose_name = 'Versión de Recurso'
+        verbose_name_plural = 'Versiones de Recursos'
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @staticmethod
+    def bump(*names):
+        """Marca colecciones como modificadas; se incrementan una vez al commit"""
+        pending_resource_versions.mark(*names)
+
+    @classmethod
+    def increment(cls, names):
+        """Incrementa las versiones en una sola sentencia (crea las que falten)"""
+        now = timezone.now()
+        updated = cls.objects.filter(name__in=names).update(
+            version=models.F('version') + 1, updated_at=now
+        )
+        if updated < len(names):
+            existing = set(cls.objects.filter(name__in=names).values_list('name', flat=True))
+            cls.objects.bulk_create(
+                [cls(name=name, version=1, updated_at=now) for name in names if name not in existing],
+                ignore_conflicts=True
+            )
+
+    @classmethod
+    def current(cls, names):
+        """Devuelve (etag_parts, last_modified) de las colecciones indicadas"""
+        rows = {
+            name: (version, updated_at)
+            for name, version, updated_at in cls.objects.filter(name__in=names)
+            .values_list('name', 'version', 'updated_at')
+        }
+        parts = [f"{name}{rows.get(name, (0, None))[0]}" for name in names]
+        timestamps = [updated_at for _, updated_at in rows.values()]
+        return parts, max(timestamps) if timestamps else None
+
+
+# Incremento diferido de versiones: una vez por transacción y por colección, al commit
+pending_resource_versions = DeferredRecalculation(ResourceVersion.increment)
@@ -44,10 +44,42 @@ class TableSerializer(serializers.ModelSerializer):
         return None
     
     def get_active_orders_count(self, obj):
-        return obj.order_set.filter(status__in=['CREATED', 'PREPARING']).count()
+        return obj.get_active_orders_count()
     
     def get_has_active_orders(self, obj):
-        return obj.order_set.filter(status__in=['CREATED', 'PREPARING']).exists()
+        return obj.get_active_orders_count() > 0
+
+
+class TableStatusSerializer(serializers.ModelSerializer):
+    """Estado liviano de mesas para el plano del salón (/tables/status/)"""
+    zone_name = serializers.CharField(source='zone.name', read_only=True)
+    active_orders_count = serializers.IntegerField(source='active_orders_total', read_only=True)
+    has_active_orders = serializers.SerializerMethodField()
+    active_orders = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Table
+        fields = ['id', 'zone', 'zone_name', 'table_number', 'active_orders_count',
+                  'has_active_orders', 'active_orders']
+        read_only_fields = fields
+
+    def get_has_active_orders(self, obj):
+        return obj.active_orders_total > 0
+
+    def get_active_orders(self, obj):
+        return [
+            {
+                'id': order.id,
+                'status': order.status,
+                'waiter': order.waiter,
+                'customer_name': order.customer_name,
+                'party_size': order.party_size,
+                'total_amount': order.total_amount,
+                'items_count': order.items_total,
+                'created_at': order.created_at,
+            }
+            for order in obj.active_orders
+        ]
 
 
 class TableDetailSerializer(TableSerializer):
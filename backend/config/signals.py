@@ -0,0 +1,47 @@
+"""
+Incremento de ResourceVersion ante cualquier cambio de los modelos que forman
+cada colección de la API. Las actualizaciones masivas (QuerySet.update,
+bulk_create) no emiten signals: esos caminos llaman a ResourceVersion.bump().
+"""
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from .models import ResourceVersion
+
+# Modelo -> colecciones cuya representación depende de él
+RESOURCE_DEPENDENCIES = {
+    'config.Unit': ('recipes',),
+    'config.Zone': ('tables', 'orders'),
+    'config.Table': ('tables', 'orders'),
+    'config.Container': ('recipes', 'orders'),
+    'inventory.Group': ('recipes', 'orders'),
+    'inventory.Ingredient': ('recipes',),
+    'inventory.Recipe': ('recipes', 'orders'),
+    'inventory.RecipeItem': ('recipes',),
+    'operation.PrinterConfig': ('recipes',),
+    'operation.Order': ('orders', 'tables'),
+    'operation.OrderItem': ('orders',),
+    'operation.Payment': ('orders',),
+    'operation.PaymentItem': ('orders',),
+    'operation.ContainerSale': ('orders',),
+}
+
+# Campos de mantenimiento que no cambian ninguna representación
+IGNORED_UPDATE_FIELDS = {'last_used_at'}
+
+
+def _bump_on_save(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= IGNORED_UPDATE_FIELDS:
+        return
+    ResourceVersion.bump(*RESOURCE_DEPENDENCIES[sender._meta.label])
+
+
+def _bump_on_delete(sender, **kwargs):
+    ResourceVersion.bump(*RESOURCE_DEPENDENCIES[sender._meta.label])
+
+
+def setup_signals():
+    for label in RESOURCE_DEPENDENCIES:
+        model = apps.get_model(label)
+        post_save.connect(_bump_on_save, sender=model, dispatch_uid=f'resource_version_save_{label}')
+        post_delete.connect(_bump_on_delete, sender=model, dispatch_uid=f'resource_version_delete_{label}')
@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from config.models import Container, Table, Zone
+from inventory.models import Group, Recipe
+from operation.models import Order, OrderItem
+
+
+@pytest.fixture
+def api_client(db):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user('mesero'))
+    return client
+
+
+def test_table_status_etag_changes_with_order_items(api_client, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        table = Table.objects.create(zone=Zone.objects.create(name='Salón'), table_number='M1')
+        order = Order.objects.create(table=table, waiter='mesero')
+        recipe = Recipe.objects.create(
+            group=Group.objects.create(name='Fondos'), name='Arroz chaufa',
+            base_price=Decimal('10.00'), preparation_time=10
+        )
+
+    response = api_client.get('/api/v1/tables/status/')
+    etag = response['ETag']
+    assert response.data[0]['active_orders'][0]['items_count'] == 0
+    assert api_client.get('/api/v1/tables/status/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        OrderItem.objects.create(order=order, recipe=recipe)
+
+    response = api_client.get('/api/v1/tables/status/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data[0]['active_orders'][0]['items_count'] == 1
+
+
+def test_container_adjust_stock_rolls_back_every_row_when_one_is_short(db):
+    small = Container.objects.create(name='Taper chico', price=Decimal('1.00'), stock=5)
+    large = Container.objects.create(name='Taper grande', price=Decimal('1.50'), stock=1)
+
+    with pytest.raises(ValidationError, match='Taper grande'):
+        Container.adjust_stock({small.pk: -2, large.pk: -2})
+    assert dict(Container.objects.values_list('name', 'stock')) == {'Taper chico': 5, 'Taper grande': 1}
+
+    Container.adjust_stock({small.pk: -2, large.pk: 3})
+    assert dict(Container.objects.values_list('name', 'stock')) == {'Taper chico': 3, 'Taper grande': 4}
+
+
+@pytest.mark.parametrize('count', [2, 10])
+def test_table_list_and_status_count_active_orders_in_the_table_query(api_client, django_assert_num_queries, count):
+    hall, terrace = Zone.objects.create(name='Salón'), Zone.objects.create(name='Terraza')
+    tables = [Table.objects.create(zone=hall, table_number=f'M{number}') for number in range(count)]
+    outside = Table.objects.create(zone=terrace, table_number='T1')
+    Order.objects.create(table=tables[0], waiter='mesero')
+    Order.objects.create(table=tables[0], waiter='mesero', status='PREPARING')
+    Order.objects.create(table=outside, waiter='mesero', status='PAID')
+
+    # ResourceVersion + mesas con zona y órdenes activas anotadas; LoggedModelViewSet
+    # agrega consultas fijas (COUNT del queryset y grupos del usuario)
+    with django_assert_num_queries(5):
+        listed = api_client.get('/api/v1/tables/').data
+    # ResourceVersion + mesas + órdenes activas precargadas, más las de LoggedModelViewSet
+    with django_assert_num_queries(5):
+        status = api_client.get('/api/v1/tables/status/').data
+
+    for rows in (listed, status):
+        counts = {row['table_number']: (row['active_orders_count'], row['has_active_orders']) for row in rows}
+        assert counts == {'T1': (0, False), 'M0': (2, True), **{table.table_number: (0, False) for table in tables[1:]}}
+    assert [order['status'] for order in status[0]['active_orders']] == ['CREATED', 'PREPARING']
+    assert [row['table_number'] for row in api_client.get('/api/v1/tables/status/', {'zone': terrace.pk}).data] == ['T1']
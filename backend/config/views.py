@@ -9,6 +9,7 @@ from django.views.decorators.http import require_http_methods
 from backend.development_permissions import IsAuthenticatedPermission, IsAdminPermission
 from backend.permissions_logger import log_permissions, PermissionLogger
 from backend.logged_viewsets import LoggedModelViewSet
+from backend.conditional_viewsets import ConditionalGetMixin
 import pandas as pd
 import io
 import json
@@ -16,7 +17,7 @@ import logging
 from .models import Unit, Zone, Table, Container
 from .serializers import (
     UnitSerializer, ZoneSerializer,
-    TableSerializer, TableDetailSerializer, ContainerSerializer
+    TableSerializer, TableDetailSerializer, TableStatusSerializer, ContainerSerializer
 )
 
 # Logger for config views
@@ -54,19 +55,48 @@ class ZoneViewSet(LoggedModelViewSet):
         return Response(serializer.data)
 
 
-class TableViewSet(LoggedModelViewSet):
-    queryset = Table.objects.select_related('zone').prefetch_related(
-        'order_set__orderitem_set__recipe',
-        'order_set__container_sales__container'
+class TableViewSet(ConditionalGetMixin, LoggedModelViewSet):
+    queryset = Table.with_active_orders_count(
+        Table.objects.select_related('zone')
     ).order_by('zone__name', 'table_number')
     permission_classes = [IsAuthenticatedPermission]  # Django authentication required
     pagination_class = None  # Deshabilitar paginación para mesas
+    version_resources = ('tables',)
     
     def get_serializer_class(self):
         if self.action in ['retrieve', 'create', 'update', 'partial_update']:
             return TableDetailSerializer
         return TableSerializer
+
+    def get_version_resources(self):
+        # El estado incluye total e items de las órdenes activas: cambia con 'orders'
+        if self.action == 'table_status':
+            return ('tables', 'orders')
+        return self.version_resources
     
+    @action(detail=False, methods=['get'], url_path='status')
+    def table_status(self, request):
+        """
+        Estado del plano del salón: conteo de órdenes activas anotado en la consulta de
+        mesas y solo las órdenes activas precargadas (una consulta más), con GET condicional
+        """
+        return self.conditional_get(request, self._table_status)
+
+    def _table_status(self, request):
+        from django.db.models import Count, Prefetch
+        from operation.models import Order
+
+        active_orders = Order.objects.filter(
+            status__in=Table.ACTIVE_ORDER_STATUSES
+        ).annotate(items_total=Count('orderitem')).order_by('created_at')
+        tables = self.filter_queryset(self.get_queryset()).prefetch_related(
+            Prefetch('order_set', queryset=active_orders, to_attr='active_orders')
+        )
+        zone = request.query_params.get('zone')
+        if zone:
+            tables = tables.filter(zone_id=zone)
+        return Response(TableStatusSerializer(tables, many=True).data)
+
     @action(detail=True, methods=['get'])
     def orders(self, request, pk=None):
         """Obtener todas las órdenes de una mesa"""
@@ -92,8 +122,10 @@ class TableViewSet(LoggedModelViewSet):
     def active_orders(self, request, pk=None):
         """Obtener todas las órdenes activas (no pagadas) de una mesa"""
         table = self.get_object()
-        orders = table.order_set.filter(status__in=['CREATED', 'PREPARING']).order_by('-created_at')
         from operation.serializers import OrderDetailSerializer
+        orders = OrderDetailSerializer.setup_eager_loading(
+            table.order_set.filter(status__in=Table.ACTIVE_ORDER_STATUSES)
+        ).order_by('-created_at')
         serializer = OrderDetailSerializer(orders, many=True)
         return Response(serializer.data)
 
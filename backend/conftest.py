@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def without_print_threads(settings):
+    """Las pruebas no inician hilos de impresión (ni la reanudación al primer request)"""
+    settings.PRINT_DISPATCHER = {**settings.PRINT_DISPATCHER, 'THREADS': False}
+
+
+@pytest.fixture(autouse=True)
+def report_cache_in_memory(settings):
+    """Caché de reportes en memoria y vacía en cada prueba (no se comparte con data/cache)"""
+    settings.CACHES = {
+        **settings.CACHES,
+        'reports': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-reports'},
+    }
+    from django.core.cache import caches
+    caches['reports'].clear()
@@ -0,0 +1,14 @@
+"""
+Management command para registrar una foto del stock de ingredientes (programar periódicamente, p.ej. cron)
+"""
+from django.core.management.base import BaseCommand
+
+from inventory.models import StockSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Registra una foto del stock actual de todos los ingredientes'
+
+    def handle(self, *args, **options):
+        snapshots = StockSnapshot.take()
+        self.stdout.write(self.style.SUCCESS(f'📦 Foto de stock registrada para {len(snapshots)} ingredientes'))
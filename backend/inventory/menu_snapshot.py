@@ -0,0 +1,53 @@
+"""
+Menú compacto para las tablets de los mozos, precalculado y versionado con ResourceVersion('recipes')
+"""
+import threading
+
+from config.models import ResourceVersion
+from .models import Recipe
+
+
+class MenuSnapshot:
+    """
+    Guarda en memoria (por proceso) el último menú construido junto con la versión de
+    'recipes' con la que se generó. La versión se incrementa al cambiar recetas, grupos,
+    precios o stock de ingredientes, así que el menú solo se reconstruye tras un cambio.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._menu = None
+
+    @staticmethod
+    def current_version():
+        return ResourceVersion.objects.filter(name='recipes').values_list('version', flat=True).first() or 0
+
+    @staticmethod
+    def build():
+        recipes = Recipe.objects.filter(is_active=True).select_related('group').order_by('name', '-version')
+        return [
+            {
+                'id': recipe.id,
+                'name': recipe.name,
+                'group': recipe.group_id,
+                'group_name': recipe.group.name if recipe.group else None,
+                'price': recipe.base_price,
+                'available': recipe.is_available and recipe.is_in_stock,
+                'portions_available': recipe.portions_available,
+                'printer': recipe.printer_id,
+            }
+            for recipe in recipes
+        ]
+
+    def get(self):
+        """Devuelve (version, menu), reconstruyendo el menú solo si la versión cambió"""
+        version = self.current_version()
+        with self._lock:
+            if self._version != version:
+                self._menu = self.build()
+                self._version = version
+            return version, self._menu
+
+
+menu_snapshot = MenuSnapshot()
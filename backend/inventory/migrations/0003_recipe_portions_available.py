@@ -0,0 +1,40 @@
+# Generated by Django 5.2.2 on 2026-10-16 21:10
+
+from django.db import migrations, models
+
+# SQLite reconstruye recipe al quitar la columna (reversa) y falla si hay vistas de
+# dashboard en el esquema: se eliminan antes y se recrean después.
+from operation.migrations._views import around_table_rebuild
+
+
+def backfill_portions_available(apps, schema_editor):
+    Recipe = apps.get_model('inventory', 'Recipe')
+    RecipeItem = apps.get_model('inventory', 'RecipeItem')
+
+    portions = {}
+    for recipe_id, quantity, stock in RecipeItem.objects.values_list(
+        'recipe_id', 'quantity', 'ingredient__current_stock'
+    ):
+        available = max(int(stock // quantity), 0)
+        portions[recipe_id] = min(portions.get(recipe_id, available), available)
+
+    recipes = [Recipe(pk=recipe_id, portions_available=value) for recipe_id, value in portions.items()]
+    Recipe.objects.bulk_update(recipes, ['portions_available'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_initial'),
+    ]
+
+    operations = [
+        *around_table_rebuild(
+            migrations.AddField(
+                model_name='recipe',
+                name='portions_available',
+                field=models.PositiveIntegerField(blank=True, editable=False, help_text='Porciones preparables con el stock actual (vacío si la receta no tiene ingredientes)', null=True),
+            ),
+        ),
+        migrations.RunPython(backfill_portions_available, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.2 on 2026-10-16 21:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def take_initial_snapshot(apps, schema_editor):
+    Ingredient = apps.get_model('inventory', 'Ingredient')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+    taken_at = django.utils.timezone.now()
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(ingredient_id=pk, stock=stock, last_movement_id=0, taken_at=taken_at)
+        for pk, stock in Ingredient.objects.values_list('pk', 'current_stock')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_recipe_portions_available'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('kind', models.CharField(choices=[('CONSUME', 'Consumo'), ('RESTORE', 'Restauración'), ('ADJUST', 'Ajuste manual'), ('IMPORT', 'Ingreso')], max_length=10)),
+                ('reference', models.CharField(blank=True, help_text='Origen del movimiento (ej: order:15)', max_length=50)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='inventory.ingredient')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'db_table': 'stock_movement',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['created_at', 'kind'], name='stock_movem_created_5f99cf_idx'), models.Index(fields=['ingredient', 'created_at'], name='stock_movem_ingredi_abd653_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('last_movement_id', models.PositiveBigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.ingredient')),
+            ],
+            options={
+                'verbose_name': 'Foto de Stock',
+                'verbose_name_plural': 'Fotos de Stock',
+                'db_table': 'stock_snapshot',
+                'ordering': ['-taken_at'],
+                'indexes': [models.Index(fields=['taken_at'], name='stock_snaps_taken_a_f3a32c_idx')],
+            },
+        ),
+        migrations.RunPython(take_initial_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.2 on 2026-10-16 22:05
+
+from decimal import Decimal
+from django.db import migrations, models
+
+# SQLite reconstruye recipe al agregar la columna y falla si hay vistas que la
+# referencian: se eliminan las vistas de dashboard antes y se recrean después.
+from operation.migrations._views import around_table_rebuild
+
+
+def backfill_ingredients_cost(apps, schema_editor):
+    Recipe = apps.get_model('inventory', 'Recipe')
+    RecipeItem = apps.get_model('inventory', 'RecipeItem')
+
+    costs = {}
+    for recipe_id, quantity, unit_price in RecipeItem.objects.values_list(
+        'recipe_id', 'quantity', 'ingredient__unit_price'
+    ):
+        costs[recipe_id] = costs.get(recipe_id, Decimal('0.00')) + unit_price * quantity
+
+    recipes = [Recipe(pk=recipe_id, ingredients_cost=cost) for recipe_id, cost in costs.items()]
+    Recipe.objects.bulk_update(recipes, ['ingredients_cost'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stockmovement_stocksnapshot'),
+    ]
+
+    operations = [
+        *around_table_rebuild(
+            migrations.AddField(
+                model_name='recipe',
+                name='ingredients_cost',
+                field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, help_text='Costo de ingredientes calculado (se actualiza al cambiar precios o ingredientes)', max_digits=10),
+            ),
+        ),
+        migrations.RunPython(backfill_ingredients_cost, migrations.RunPython.noop),
+    ]
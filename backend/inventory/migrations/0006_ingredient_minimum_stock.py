@@ -0,0 +1,35 @@
+# Generated by Django 5.2.2 on 2026-10-16 22:40
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+# SQLite reconstruye ingredient al agregar las columnas no nulas y falla si hay vistas
+# de dashboard en el esquema: se eliminan antes y se recrean después.
+from operation.migrations._views import around_table_rebuild
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_recipe_ingredients_cost'),
+    ]
+
+    operations = [
+        *around_table_rebuild(
+            migrations.AddField(
+                model_name='ingredient',
+                name='minimum_stock',
+                field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Punto de reposición: por debajo de este stock el ingrediente se marca como bajo', max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))]),
+            ),
+            migrations.AddField(
+                model_name='ingredient',
+                name='is_low_stock',
+                field=models.BooleanField(default=False, editable=False),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(condition=models.Q(('is_low_stock', True)), fields=['name'], name='ingredient_low_stock_idx'),
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from decimal import Decimal
-from config.models import Unit, Container
+from config.models import Unit, Container, ResourceVersion
+from backend.unit_of_work import DeferredRecalculation
 
 
 class Group(models.Model):
@@ -39,6 +43,14 @@ class Ingredient(models.Model):
         decimal_places=2, 
         validators=[MinValueValidator(Decimal('0.00'))]
     )
+    minimum_stock = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        validators=[MinValueValidator(Decimal('0.00'))],
+        help_text="Punto de reposición: por debajo de este stock el ingrediente se marca como bajo"
+    )
+    is_low_stock = models.BooleanField(default=False, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -48,27 +60,127 @@ class Ingredient(models.Model):
         verbose_name = 'Ingrediente'
         verbose_name_plural = 'Ingredientes'
         ordering = ['-id']
+        indexes = [
+            # Índice parcial: listar los k ingredientes bajo el mínimo sin recorrer el resto
+            models.Index(
+                fields=['name'],
+                condition=models.Q(is_low_stock=True),
+                name='ingredient_low_stock_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.unit.name})"
 
+    def save(self, *args, **kwargs):
+        previous_stock, previous_price = None, None
+        if not self._state.adding:
+            previous_stock, previous_price = Ingredient.objects.filter(pk=self.pk).values_list(
+                'current_stock', 'unit_price'
+            ).first() or (None, None)
+        self.is_low_stock = self.current_stock < self.minimum_stock
+        super().save(*args, **kwargs)
+        if previous_price is not None and previous_price != self.unit_price:
+            # Recalcular el costo de las recetas que lo usan, al commit
+            pending_ingredient_costs.mark(self.pk)
+        # Registrar en el libro de movimientos las altas y ediciones directas de stock
+        delta = self.current_stock - (previous_stock or Decimal('0.00'))
+        if delta:
+            StockMovement.objects.create(
+                ingredient=self,
+                delta=delta,
+                kind=StockMovement.IMPORT if previous_stock is None else StockMovement.ADJUST
+            )
+        # Recalcular porciones disponibles de las recetas que lo usan, al commit
+        pending_ingredient_portions.mark(self.pk)
+
     def delete(self, *args, **kwargs):
         if self.recipeitem_set.exists():
             raise ValidationError("No se puede eliminar un ingrediente que pertenece a una receta")
         super().delete(*args, **kwargs)
 
-    def update_stock(self, quantity, operation='subtract'):
-        """Actualiza el stock del ingrediente"""
+    @staticmethod
+    @transaction.atomic
+    def update_prices(prices):
+        """
+        Actualiza precios {ingredient_id: unit_price} con un bulk_update y recalcula el
+        costo de las recetas afectadas en una sola pasada al commit
+        """
+        ingredients = [
+            Ingredient(pk=pk, unit_price=Decimal(str(price)), updated_at=timezone.now())
+            for pk, price in prices.items()
+        ]
+        Ingredient.objects.bulk_update(ingredients, ['unit_price', 'updated_at'])
+        # bulk_update no emite signals
+        ResourceVersion.bump('recipes')
+        pending_ingredient_costs.mark(*prices)
+        return len(ingredients)
+
+    def update_stock(self, quantity, operation='subtract', kind='ADJUST', reference=''):
+        """Actualiza el stock del ingrediente con un UPDATE atómico (ver adjust_stock)"""
+        quantity = Decimal(str(quantity))
         if operation == 'subtract':
-            if self.current_stock < quantity:
-                raise ValidationError(f"Stock insuficiente. Stock actual: {self.current_stock}")
-            self.current_stock -= quantity
+            Ingredient.adjust_stock({self.pk: -quantity}, kind, reference)
         elif operation == 'add':
-            self.current_stock += quantity
-        
-        # Actualizar is_active basado en el stock
-        self.is_active = self.current_stock > 0
-        self.save()
+            Ingredient.adjust_stock({self.pk: quantity}, kind, reference)
+        self.refresh_from_db(fields=['current_stock', 'is_active', 'is_low_stock', 'updated_at'])
+
+    @staticmethod
+    def adjust_stock(deltas, kind='ADJUST', reference=''):
+        """
+        Aplica variaciones de stock {ingredient_id: delta} en un único UPDATE condicional:
+        current_stock = current_stock + delta WHERE current_stock + delta >= 0, actualizando
+        is_active e is_low_stock en la misma sentencia. Sin lecturas previas ni locks: si alguna fila no
+        cumple la condición se revierte todo y se lanza ValidationError.
+
+        Los movimientos se registran en StockMovement con un solo bulk_create.
+        """
+        deltas = {pk: Decimal(str(delta)) for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        decimal_field = models.DecimalField(max_digits=10, decimal_places=2)
+        delta = models.Case(
+            *[models.When(pk=pk, then=models.Value(value)) for pk, value in deltas.items()],
+            output_field=decimal_field
+        )
+        required = models.Case(
+            *[models.When(pk=pk, then=models.Value(-value)) for pk, value in deltas.items()],
+            output_field=decimal_field
+        )
+
+        with transaction.atomic():
+            updated = Ingredient.objects.filter(
+                pk__in=deltas, current_stock__gte=required
+            ).update(
+                current_stock=models.F('current_stock') + delta,
+                is_active=models.Case(
+                    models.When(current_stock__gt=required, then=models.Value(True)),
+                    default=models.Value(False)
+                ),
+                # Cruce del punto de reposición: current_stock + delta < minimum_stock
+                is_low_stock=models.Case(
+                    models.When(current_stock__lt=models.F('minimum_stock') - delta, then=models.Value(True)),
+                    default=models.Value(False)
+                ),
+                updated_at=timezone.now()
+            )
+            if updated < len(deltas):
+                insufficient = [
+                    f"{name} (Stock actual: {stock})"
+                    for pk, name, stock in Ingredient.objects.filter(pk__in=deltas)
+                    .values_list('pk', 'name', 'current_stock')
+                    if stock + deltas[pk] < 0
+                ]
+                raise ValidationError(f"Stock insuficiente: {', '.join(insufficient)}")
+
+            StockMovement.objects.bulk_create([
+                StockMovement(ingredient_id=pk, delta=value, kind=kind, reference=reference)
+                for pk, value in deltas.items()
+            ])
+
+        # QuerySet.update no emite signals
+        ResourceVersion.bump('recipes')
+        pending_ingredient_portions.mark(*deltas)
 
 
 class Recipe(models.Model):
@@ -106,11 +218,24 @@ class Recipe(models.Model):
         validators=[MinValueValidator(Decimal('0.00'))],
         help_text="Porcentaje de ganancia sobre el costo de ingredientes"
     )
+    ingredients_cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False,
+        help_text="Costo de ingredientes calculado (se actualiza al cambiar precios o ingredientes)"
+    )
     is_available = models.BooleanField(default=True)
     is_active = models.BooleanField(
         default=True,
         help_text="Solo las versiones activas se muestran al crear pedidos"
     )
+    portions_available = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Porciones preparables con el stock actual (vacío si la receta no tiene ingredientes)"
+    )
     preparation_time = models.PositiveIntegerField(help_text="Tiempo en minutos")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -133,19 +258,73 @@ class Recipe(models.Model):
             total_cost += ingredient_cost
         return total_cost
 
-    def calculate_base_price(self):
-        """Calcula el precio base basado en los ingredientes y el porcentaje de ganancia"""
-        ingredients_cost = self.calculate_ingredients_cost()
-        if self.profit_percentage > 0:
-            profit_amount = ingredients_cost * (self.profit_percentage / Decimal('100.00'))
+    @staticmethod
+    def price_from_cost(ingredients_cost, profit_percentage):
+        """Precio base = costo de ingredientes + porcentaje de ganancia"""
+        if profit_percentage > 0:
+            profit_amount = ingredients_cost * (profit_percentage / Decimal('100.00'))
             return ingredients_cost + profit_amount
         return ingredients_cost
 
+    def calculate_base_price(self):
+        """Calcula el precio base basado en los ingredientes y el porcentaje de ganancia"""
+        return Recipe.price_from_cost(self.calculate_ingredients_cost(), self.profit_percentage)
+
     def update_base_price(self):
         """Actualiza el precio base cuando cambian los precios de ingredientes o porcentaje de ganancia"""
-        self.base_price = self.calculate_base_price()
+        self.ingredients_cost = self.calculate_ingredients_cost()
+        self.base_price = Recipe.price_from_cost(self.ingredients_cost, self.profit_percentage)
         self.save()
 
+    @staticmethod
+    def compute_costs(recipe_ids):
+        """Costo de ingredientes {recipe_id: costo} de varias recetas con una sola consulta"""
+        costs = {recipe_id: Decimal('0.00') for recipe_id in recipe_ids}
+        for recipe_id, quantity, unit_price in RecipeItem.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'quantity', 'ingredient__unit_price'):
+            costs[recipe_id] += unit_price * quantity
+        return costs
+
+    @staticmethod
+    def reprice(queryset, dry_run=False):
+        """
+        Recalcula `ingredients_cost` y `base_price` de las recetas del queryset en una pasada:
+        una consulta de recetas, una de ingredientes y un bulk_update de las que cambiaron.
+        Devuelve las recetas modificadas con sus valores anteriores (`old_*`); con dry_run no escribe.
+        """
+        recipes = list(queryset.only(
+            'pk', 'name', 'version', 'ingredients_cost', 'base_price', 'profit_percentage'
+        ))
+        costs = Recipe.compute_costs([recipe.pk for recipe in recipes])
+        changed = []
+        for recipe in recipes:
+            cost = costs[recipe.pk].quantize(Decimal('0.01'))
+            price = Recipe.price_from_cost(cost, recipe.profit_percentage).quantize(Decimal('0.01'))
+            if recipe.ingredients_cost != cost or recipe.base_price != price:
+                recipe.old_ingredients_cost, recipe.old_base_price = recipe.ingredients_cost, recipe.base_price
+                recipe.ingredients_cost, recipe.base_price = cost, price
+                changed.append(recipe)
+        if changed and not dry_run:
+            Recipe.objects.bulk_update(changed, ['ingredients_cost', 'base_price'], batch_size=500)
+            # bulk_update no emite signals
+            ResourceVersion.bump('recipes', 'orders')
+        return changed
+
+    @staticmethod
+    def refresh_costs(recipe_ids):
+        """Recalcula costo y precio base de varias recetas (ver reprice)"""
+        Recipe.reprice(Recipe.objects.filter(pk__in=recipe_ids))
+
+    @staticmethod
+    def refresh_costs_for_ingredients(ingredient_ids):
+        """Recalcula el costo de las recetas que usan los ingredientes dados"""
+        recipe_ids = set(RecipeItem.objects.filter(
+            ingredient_id__in=ingredient_ids
+        ).values_list('recipe_id', flat=True))
+        if recipe_ids:
+            Recipe.refresh_costs(recipe_ids)
+
     def check_availability(self):
         """Verifica si la receta está disponible según el stock (automático basado en stock)"""
         if not self.is_available:
@@ -163,15 +342,63 @@ class Recipe(models.Model):
             if recipe_item.ingredient.current_stock < recipe_item.quantity:
                 return False
         return True
-    
+
+    @property
+    def is_in_stock(self):
+        """Disponibilidad por stock leída del índice materializado `portions_available`"""
+        return self.portions_available is None or self.portions_available > 0
+
+    @classmethod
+    def in_stock(cls, queryset):
+        """Filtra las recetas con al menos una porción disponible según `portions_available`"""
+        return queryset.filter(
+            models.Q(portions_available__isnull=True) | models.Q(portions_available__gt=0)
+        )
+
+    @staticmethod
+    def refresh_portions_available(recipe_ids):
+        """
+        Recalcula `portions_available` = min(floor(stock / cantidad)) de varias recetas
+        con una sola consulta de sus ingredientes; solo escribe las que cambiaron
+        """
+        portions = dict.fromkeys(recipe_ids)
+        for recipe_id, quantity, stock in RecipeItem.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'quantity', 'ingredient__current_stock'):
+            available = max(int(stock // quantity), 0)
+            current = portions[recipe_id]
+            portions[recipe_id] = available if current is None else min(current, available)
+
+        changed = [
+            Recipe(pk=recipe_id, portions_available=portions[recipe_id])
+            for recipe_id, stored in Recipe.objects.filter(pk__in=recipe_ids)
+            .values_list('pk', 'portions_available')
+            if stored != portions[recipe_id]
+        ]
+        if changed:
+            Recipe.objects.bulk_update(changed, ['portions_available'])
+            # bulk_update no emite signals
+            ResourceVersion.bump('recipes')
+
+    @staticmethod
+    def refresh_portions_for_ingredients(ingredient_ids):
+        """Recalcula las recetas que usan los ingredientes dados (índice inverso recipe_item.ingredient_id)"""
+        recipe_ids = set(RecipeItem.objects.filter(
+            ingredient_id__in=ingredient_ids
+        ).values_list('recipe_id', flat=True))
+        if recipe_ids:
+            Recipe.refresh_portions_available(recipe_ids)
+
     def save(self, *args, **kwargs):
         # No modificar automáticamente is_available, debe ser controlado manualmente
         super().save(*args, **kwargs)
 
     def consume_ingredients(self):
         """Consume los ingredientes del stock cuando se prepara la receta"""
-        for recipe_item in self.recipeitem_set.all():
-            recipe_item.ingredient.update_stock(recipe_item.quantity, 'subtract')
+        Ingredient.adjust_stock({
+            recipe_item.ingredient_id: -recipe_item.quantity
+            for recipe_item in self.recipeitem_set.all()
+        }, StockMovement.CONSUME, f"recipe:{self.pk}")
 
     def delete(self, *args, **kwargs):
         """Override delete para validar que no haya ordenes asociadas"""
@@ -204,5 +431,130 @@ class RecipeItem(models.Model):
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        # Actualizar precio base de la receta cuando se modifica un ingrediente
-        self.recipe.update_base_price()
+        # Actualizar costo, precio base y porciones de la receta una sola vez, al commit
+        pending_recipe_costs.mark(self.recipe_id)
+        pending_recipe_portions.mark(self.recipe_id)
+
+
+class StockMovement(models.Model):
+    """
+    Libro de movimientos de stock de ingredientes (solo inserción).
+    El stock en un instante se obtiene de la última StockSnapshot más los movimientos posteriores.
+    """
+    CONSUME = 'CONSUME'
+    RESTORE = 'RESTORE'
+    ADJUST = 'ADJUST'
+    IMPORT = 'IMPORT'
+    KIND_CHOICES = [
+        (CONSUME, 'Consumo'),
+        (RESTORE, 'Restauración'),
+        (ADJUST, 'Ajuste manual'),
+        (IMPORT, 'Ingreso'),
+    ]
+
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='stock_movements')
+    delta = models.DecimalField(max_digits=12, decimal_places=2)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    reference = models.CharField(max_length=50, blank=True, help_text="Origen del movimiento (ej: order:15)")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'stock_movement'
+        verbose_name = 'Movimiento de Stock'
+        verbose_name_plural = 'Movimientos de Stock'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['created_at', 'kind']),
+            models.Index(fields=['ingredient', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.ingredient_id}: {self.delta}"
+
+    @staticmethod
+    def consumption(start, end):
+        """Consumo neto por ingrediente (consumos menos restauraciones) en [start, end)"""
+        return StockMovement.objects.filter(
+            created_at__gte=start,
+            created_at__lt=end,
+            kind__in=[StockMovement.CONSUME, StockMovement.RESTORE]
+        ).values(
+            'ingredient_id', 'ingredient__name', 'ingredient__unit__name'
+        ).annotate(
+            consumed=-models.Sum('delta')
+        ).order_by('ingredient__name')
+
+
+class StockSnapshot(models.Model):
+    """Foto periódica del stock de todos los ingredientes (ver comando snapshot_stock)"""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='stock_snapshots')
+    stock = models.DecimalField(max_digits=12, decimal_places=2)
+    # Último StockMovement incluido en la foto
+    last_movement_id = models.PositiveBigIntegerField(default=0)
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'stock_snapshot'
+        verbose_name = 'Foto de Stock'
+        verbose_name_plural = 'Fotos de Stock'
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['taken_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient_id} @ {self.taken_at}: {self.stock}"
+
+    @staticmethod
+    @transaction.atomic
+    def take():
+        """Registra el stock actual de todos los ingredientes con un solo bulk_create"""
+        last_movement_id = StockMovement.objects.aggregate(last=models.Max('id'))['last'] or 0
+        taken_at = timezone.now()
+        return StockSnapshot.objects.bulk_create([
+            StockSnapshot(ingredient_id=pk, stock=stock, last_movement_id=last_movement_id, taken_at=taken_at)
+            for pk, stock in Ingredient.objects.values_list('pk', 'current_stock')
+        ])
+
+    @staticmethod
+    def stock_at(moment):
+        """
+        Stock por ingrediente {ingredient_id: stock} en `moment`: última foto anterior más
+        los movimientos posteriores. Sin foto previa se descuentan del stock actual los
+        movimientos posteriores a `moment`.
+        """
+        latest = StockSnapshot.objects.filter(taken_at__lte=moment).order_by('-taken_at').first()
+        if latest is None:
+            stock = dict(Ingredient.objects.values_list('pk', 'current_stock'))
+            movements = StockMovement.objects.filter(created_at__gt=moment)
+            sign = -1
+        else:
+            stock = dict(StockSnapshot.objects.filter(
+                taken_at=latest.taken_at
+            ).values_list('ingredient_id', 'stock'))
+            movements = StockMovement.objects.filter(
+                id__gt=latest.last_movement_id, created_at__lte=moment
+            )
+            sign = 1
+
+        for ingredient_id, delta in movements.values('ingredient_id').annotate(
+            total=models.Sum('delta')
+        ).values_list('ingredient_id', 'total'):
+            stock[ingredient_id] = stock.get(ingredient_id, Decimal('0.00')) + sign * delta
+        return stock
+
+
+@receiver(post_delete, sender=RecipeItem)
+def refresh_portions_on_recipe_item_delete(sender, instance, **kwargs):
+    """Recalcula costo y porciones disponibles al quitar un ingrediente (también en borrados masivos)"""
+    pending_recipe_costs.mark(instance.recipe_id)
+    pending_recipe_portions.mark(instance.recipe_id)
+
+
+# Índice de porciones disponibles: recálculo en lote una vez por transacción, al commit
+pending_recipe_portions = DeferredRecalculation(Recipe.refresh_portions_available)
+pending_ingredient_portions = DeferredRecalculation(Recipe.refresh_portions_for_ingredients)
+
+# Costos y precios de recetas: recálculo en lote una vez por transacción, al commit
+pending_recipe_costs = DeferredRecalculation(Recipe.refresh_costs)
+pending_ingredient_costs = DeferredRecalculation(Recipe.refresh_costs_for_ingredients)
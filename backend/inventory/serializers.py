@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.db import transaction
 from .models import Group, Ingredient, Recipe, RecipeItem
 from config.serializers import UnitSerializer
 
@@ -24,10 +25,10 @@ class IngredientSerializer(serializers.ModelSerializer):
         model = Ingredient
         fields = [
             'id', 'unit', 'unit_name', 
-            'name', 'unit_price', 'current_stock', 'is_active', 
+            'name', 'unit_price', 'current_stock', 'minimum_stock', 'is_low_stock', 'is_active', 
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'is_active', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'is_low_stock', 'is_active', 'created_at', 'updated_at']
 
 
 class IngredientDetailSerializer(IngredientSerializer):
@@ -57,7 +58,53 @@ class RecipeItemSerializer(serializers.ModelSerializer):
         return obj.ingredient.unit_price * obj.quantity
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeIngredientsMixin:
+    """
+    Campos derivados de los ingredientes de la receta construidos una sola vez por receta
+    desde `recipeitem_set__ingredient__unit` precargado (ver RecipeSerializer.setup_eager_loading)
+    """
+
+    def _get_ingredients_data(self, obj):
+        cache = self.__dict__.setdefault('_ingredients_data', {})
+        if obj.pk not in cache:
+            recipe_items = list(obj.recipeitem_set.all())
+            cache[obj.pk] = {
+                'list': [
+                    {
+                        'id': item.ingredient.id,
+                        'name': item.ingredient.name,
+                        'quantity': str(item.quantity),
+                        'unit': item.ingredient.unit.name,
+                        'unit_price': str(item.ingredient.unit_price),
+                        'total_cost': str(item.ingredient.unit_price * item.quantity)
+                    }
+                    for item in recipe_items
+                ],
+                'has_stock': all(item.ingredient.current_stock >= item.quantity for item in recipe_items),
+            }
+        return cache[obj.pk]
+
+    def get_ingredients_count(self, obj):
+        return len(self._get_ingredients_data(obj)['list'])
+
+    def get_ingredients_list(self, obj):
+        """Retorna lista de ingredientes con sus cantidades"""
+        return self._get_ingredients_data(obj)['list']
+
+    def get_is_available_calculated(self, obj):
+        """Equivalente a Recipe.check_availability sin consultas adicionales"""
+        return obj.is_available and self._get_ingredients_data(obj)['has_stock']
+
+    def get_ingredients_cost(self, obj):
+        return obj.ingredients_cost
+
+    def get_profit_amount(self, obj):
+        if obj.profit_percentage > 0:
+            return obj.ingredients_cost * (obj.profit_percentage / 100)
+        return 0
+
+
+class RecipeSerializer(RecipeIngredientsMixin, serializers.ModelSerializer):
     group_name = serializers.SerializerMethodField()
     group = serializers.SerializerMethodField()  # Return full group object for frontend compatibility
     container_name = serializers.SerializerMethodField()
@@ -78,7 +125,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'group', 'group_name', 'container', 'container_id', 'container_name', 'printer', 'printer_name', 'name', 'version', 'base_price', 'price', 'unit_price', 'cost', 'profit_percentage',
             'ingredients_cost', 'profit_amount', 'is_available', 'is_active', 'is_available_calculated',
-            'preparation_time', 'ingredients_count', 'ingredients_list', 'ingredients', 'created_at', 'updated_at'
+            'portions_available', 'preparation_time', 'ingredients_count', 'ingredients_list', 'ingredients', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
@@ -100,40 +147,18 @@ class RecipeSerializer(serializers.ModelSerializer):
     def get_printer_name(self, obj):
         return obj.printer.name if obj.printer else None
     
-    def get_ingredients_count(self, obj):
-        return obj.recipeitem_set.count()
-    
-    def get_ingredients_list(self, obj):
-        """Retorna lista de ingredientes con sus cantidades"""
-        recipe_items = obj.recipeitem_set.all()
-        return [
-            {
-                'id': item.ingredient.id,
-                'name': item.ingredient.name,
-                'quantity': str(item.quantity),
-                'unit': item.ingredient.unit.name,
-                'unit_price': str(item.ingredient.unit_price),
-                'total_cost': str(item.ingredient.unit_price * item.quantity)
-            }
-            for item in recipe_items
-        ]
-    
-    def get_is_available_calculated(self, obj):
-        return obj.check_availability()
-    
-    def get_ingredients_cost(self, obj):
-        return obj.calculate_ingredients_cost()
-    
-    def get_profit_amount(self, obj):
-        ingredients_cost = obj.calculate_ingredients_cost()
-        if obj.profit_percentage > 0:
-            return ingredients_cost * (obj.profit_percentage / 100)
-        return 0
 
     def get_ingredients(self, obj):
         """Alias para ingredients_list - frontend compatibility"""
         return self.get_ingredients_list(obj)
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Carga en un número constante de consultas todo lo que usa el serializer"""
+        return queryset.select_related('group', 'container', 'printer').prefetch_related(
+            'recipeitem_set__ingredient__unit'
+        )
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     group_detail = GroupSerializer(source='group', read_only=True)
@@ -165,7 +190,20 @@ class RecipeItemCreateSerializer(serializers.ModelSerializer):
         return data
 
 
-class RecipeWithItemsCreateSerializer(serializers.ModelSerializer):
+class RecipeRepriceSerializer(serializers.Serializer):
+    """Parámetros de RecipeViewSet.bulk_reprice"""
+    recipe_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    group_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    all = serializers.BooleanField(required=False, default=False)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if not (data['all'] or data['recipe_ids'] or data['group_ids']):
+            raise serializers.ValidationError("Se requiere recipe_ids, group_ids o all")
+        return data
+
+
+class RecipeWithItemsCreateSerializer(RecipeIngredientsMixin, serializers.ModelSerializer):
     recipe_items = serializers.ListField(
         child=serializers.DictField(),
         write_only=True,
@@ -190,11 +228,12 @@ class RecipeWithItemsCreateSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'group', 'group_name', 'container', 'container_id', 'container_name', 'printer', 'printer_name', 'name', 'version', 'base_price', 'price', 'unit_price', 'cost', 'profit_percentage',
             'ingredients_cost', 'profit_amount', 'is_available', 'is_active', 'is_available_calculated',
-            'preparation_time', 'ingredients_count', 'ingredients_list', 'created_at', 'updated_at', 
-            'recipe_items'
+            'portions_available', 'preparation_time', 'ingredients_count', 'ingredients_list', 'created_at', 'updated_at', 
+            'recipe_items', 'recalculate_price'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    @transaction.atomic
     def create(self, validated_data):
         recipe_items_data = validated_data.pop('recipe_items', [])
         
@@ -215,6 +254,7 @@ class RecipeWithItemsCreateSerializer(serializers.ModelSerializer):
         
         return recipe
     
+    @transaction.atomic
     def update(self, instance, validated_data):
         recipe_items_data = validated_data.pop('recipe_items', None)
         recalculate_price = validated_data.pop('recalculate_price', False)
@@ -237,6 +277,10 @@ class RecipeWithItemsCreateSerializer(serializers.ModelSerializer):
                     quantity=item_data['quantity']
                 )
 
+            # El queryset del viewset precarga recipeitem_set: descartar los items anteriores
+            # para que el precio se calcule con los nuevos
+            getattr(instance, '_prefetched_objects_cache', {}).pop('recipeitem_set', None)
+
             # Actualizar precio base
             instance.update_base_price()
 
@@ -254,33 +298,3 @@ class RecipeWithItemsCreateSerializer(serializers.ModelSerializer):
     
     def get_printer_name(self, obj):
         return obj.printer.name if obj.printer else None
-    
-    def get_ingredients_count(self, obj):
-        return obj.recipeitem_set.count()
-    
-    def get_ingredients_list(self, obj):
-        """Retorna lista de ingredientes con sus cantidades"""
-        recipe_items = obj.recipeitem_set.all()
-        return [
-            {
-                'id': item.ingredient.id,
-                'name': item.ingredient.name,
-                'quantity': str(item.quantity),
-                'unit': item.ingredient.unit.name,
-                'unit_price': str(item.ingredient.unit_price),
-                'total_cost': str(item.ingredient.unit_price * item.quantity)
-            }
-            for item in recipe_items
-        ]
-    
-    def get_is_available_calculated(self, obj):
-        return obj.check_availability()
-    
-    def get_ingredients_cost(self, obj):
-        return obj.calculate_ingredients_cost()
-    
-    def get_profit_amount(self, obj):
-        ingredients_cost = obj.calculate_ingredients_cost()
-        if obj.profit_percentage > 0:
-            return ingredients_cost * (obj.profit_percentage / 100)
-        return 0
\ No newline at end of file
@@ -0,0 +1,262 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.models import Unit
+from inventory.menu_snapshot import MenuSnapshot
+from inventory.models import Group, Ingredient, Recipe, RecipeItem, StockMovement, StockSnapshot
+
+
+@pytest.fixture
+def api_client(db):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user('mesero'))
+    return client
+
+
+@pytest.fixture
+def ingredients(db, django_capture_on_commit_callbacks):
+    # Ejecutar los callbacks al commit: un lote diferido pendiente absorbería las marcas de la prueba
+    with django_capture_on_commit_callbacks(execute=True):
+        unit = Unit.objects.create(name='kg')
+        return [
+            Ingredient.objects.create(unit=unit, name=f'Ingrediente {number}', unit_price=Decimal('2.00'), current_stock=100)
+            for number in range(3)
+        ]
+
+
+def create_recipes(count, ingredients):
+    group = Group.objects.create(name='Fondos')
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            group=group, name=f'Plato {number}', base_price=Decimal('10.00'), preparation_time=10
+        )
+        for ingredient in ingredients:
+            RecipeItem.objects.create(recipe=recipe, ingredient=ingredient, quantity=Decimal('1.00'))
+
+
+@pytest.mark.parametrize('count', [1, 10])
+def test_recipe_list_query_count_is_constant(api_client, ingredients, django_assert_num_queries, count):
+    create_recipes(count, ingredients)
+
+    # ResourceVersion + recetas (con grupo, envase e impresora) + items, ingredientes y unidades precargados
+    with django_assert_num_queries(5):
+        response = api_client.get('/api/v1/recipes/', {'show_all': 1})
+
+    assert response.status_code == 200
+    assert len(response.data) == count
+    assert all(len(recipe['ingredients_list']) == len(ingredients) for recipe in response.data)
+
+
+def test_recipe_update_prices_new_items(api_client, ingredients):
+    create_recipes(1, ingredients[:1])
+    recipe = Recipe.objects.get()
+    expensive = ingredients[1]
+    expensive.unit_price = Decimal('7.00')
+    expensive.save()
+
+    response = api_client.put(f'/api/v1/recipes/{recipe.pk}/', {
+        'name': recipe.name,
+        'base_price': '10.00',
+        'preparation_time': 10,
+        'recipe_items': [{'ingredient': expensive.pk, 'quantity': '2.00'}],
+    }, format='json')
+
+    assert response.status_code == 200, response.data
+    assert Decimal(response.data['base_price']) == Decimal('14.00')
+    assert Decimal(str(response.data['ingredients_cost'])) == Decimal('14.00')
+
+
+def test_bulk_reprice_dry_run_false_string_updates_prices(api_client, ingredients):
+    create_recipes(2, ingredients)
+
+    response = api_client.post('/api/v1/recipes/bulk_reprice/', {
+        'recipe_ids': [recipe.pk for recipe in Recipe.objects.all()], 'dry_run': 'false',
+    }, format='json')
+
+    assert response.status_code == 200, response.data
+    assert response.data['dry_run'] is False and response.data['updated'] == 2
+    assert set(Recipe.objects.values_list('base_price', flat=True)) == {Decimal('6.00')}
+
+
+@pytest.mark.parametrize('payload', [
+    {},
+    {'recipe_ids': 'todas'},
+    {'recipe_ids': ['uno']},
+    {'group_ids': [1], 'dry_run': 'quizás'},
+])
+def test_bulk_reprice_rejects_bad_input(api_client, ingredients, payload):
+    create_recipes(1, ingredients)
+
+    response = api_client.post('/api/v1/recipes/bulk_reprice/', payload, format='json')
+
+    assert response.status_code == 400
+    assert Recipe.objects.get().base_price == Decimal('10.00')
+
+
+def test_adjust_stock_is_all_or_nothing_and_maintains_flags(ingredients):
+    rice, beans, _ = ingredients
+    Ingredient.objects.filter(pk=rice.pk).update(minimum_stock=Decimal('50.00'))
+    movements = StockMovement.objects.count()
+
+    with pytest.raises(ValidationError, match=beans.name):
+        Ingredient.adjust_stock({rice.pk: -10, beans.pk: -101})
+    assert list(Ingredient.objects.filter(pk__in=[rice.pk, beans.pk]).values_list('current_stock', flat=True)) == [
+        Decimal('100.00'), Decimal('100.00')
+    ]
+    assert StockMovement.objects.count() == movements
+
+    Ingredient.adjust_stock({rice.pk: -60, beans.pk: -100})
+    rice.refresh_from_db()
+    beans.refresh_from_db()
+    assert (rice.current_stock, rice.is_low_stock, rice.is_active) == (Decimal('40.00'), True, True)
+    assert (beans.current_stock, beans.is_active) == (Decimal('0.00'), False)
+
+    Ingredient.adjust_stock({rice.pk: 20, beans.pk: 5})
+    rice.refresh_from_db()
+    beans.refresh_from_db()
+    assert (rice.current_stock, rice.is_low_stock) == (Decimal('60.00'), False)
+    assert beans.is_active is True
+
+
+def test_recipe_list_answers_304_until_a_recipe_changes(
+    api_client, ingredients, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        create_recipes(2, ingredients)
+
+    response = api_client.get('/api/v1/recipes/', {'show_all': 1})
+    etag, last_modified = response['ETag'], response['Last-Modified']
+
+    # Solo la consulta de ResourceVersion: ni el queryset ni los serializers se ejecutan
+    with django_assert_num_queries(1):
+        assert api_client.get('/api/v1/recipes/', {'show_all': 1}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert api_client.get('/api/v1/recipes/', {'show_all': 1}, HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Recipe.objects.filter(name='Plato 0').get().update_base_price()
+
+    response = api_client.get('/api/v1/recipes/', {'show_all': 1}, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def test_menu_lists_only_active_recipes_with_portions(
+    api_client, ingredients, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        create_recipes(3, ingredients)
+        scarce = Ingredient.objects.create(
+            unit=ingredients[0].unit, name='Escaso', unit_price=Decimal('5.00'), current_stock=1
+        )
+        RecipeItem.objects.create(recipe=Recipe.objects.get(name='Plato 1'), ingredient=scarce, quantity=Decimal('2.00'))
+        Recipe.objects.filter(name='Plato 2').update(is_active=False)
+        Recipe.objects.create(group=Group.objects.get(), name='Sin ingredientes', base_price=Decimal('5.00'), preparation_time=5)
+
+    # El filtro de stock es una condición sobre portions_available: mismas consultas que el listado completo
+    with django_assert_num_queries(5):
+        response = api_client.get('/api/v1/recipes/')
+
+    assert response.status_code == 200
+    assert [recipe['name'] for recipe in response.data] == ['Plato 0', 'Sin ingredientes']
+
+
+def test_portions_available_follow_stock_and_recipe_item_changes(ingredients, django_capture_on_commit_callbacks):
+    rice, beans, oil = ingredients
+    with django_capture_on_commit_callbacks(execute=True):
+        create_recipes(1, [rice, beans])
+    recipe = Recipe.objects.get()
+
+    def portions():
+        recipe.refresh_from_db(fields=['portions_available'])
+        return recipe.portions_available
+
+    assert portions() == 100
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.adjust_stock({beans.pk: -75})
+    assert portions() == 25
+
+    with django_capture_on_commit_callbacks(execute=True):
+        rice.current_stock = Decimal('10.00')
+        rice.save()
+    assert portions() == 10
+
+    with django_capture_on_commit_callbacks(execute=True):
+        RecipeItem.objects.create(recipe=recipe, ingredient=oil, quantity=Decimal('40.00'))
+    assert portions() == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        RecipeItem.objects.filter(recipe=recipe, ingredient=oil).get().delete()
+    assert portions() == 10
+
+
+def test_stock_ledger_and_point_in_time_stock(ingredients):
+    rice = ingredients[0]
+    rice.current_stock = Decimal('80.00')
+    rice.save()
+    rice.unit_price = Decimal('3.00')
+    rice.save()
+    assert list(rice.stock_movements.order_by('id').values_list('kind', 'delta')) == [
+        (StockMovement.IMPORT, Decimal('100.00')), (StockMovement.ADJUST, Decimal('-20.00')),
+    ]
+
+    before_snapshot = timezone.now()
+    Ingredient.adjust_stock({rice.pk: -5}, StockMovement.CONSUME, 'order:1')
+    StockSnapshot.take()
+    after_snapshot = timezone.now()
+    Ingredient.adjust_stock({rice.pk: 3}, StockMovement.RESTORE, 'order:1')
+
+    assert StockSnapshot.stock_at(before_snapshot)[rice.pk] == Decimal('80.00')
+    assert StockSnapshot.stock_at(after_snapshot)[rice.pk] == Decimal('75.00')
+    assert StockSnapshot.stock_at(timezone.now())[rice.pk] == Decimal('78.00')
+
+
+def test_menu_snapshot_is_rebuilt_only_after_a_recipes_change(
+    api_client, ingredients, monkeypatch, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    # Instancia nueva: la del módulo conserva el menú de otras pruebas con la misma versión
+    monkeypatch.setattr('inventory.views.menu_snapshot', MenuSnapshot())
+    with django_capture_on_commit_callbacks(execute=True):
+        create_recipes(2, ingredients[:1])
+
+    first = api_client.get('/api/v1/recipes/menu_snapshot/').data
+    assert [(recipe['name'], recipe['available']) for recipe in first['recipes']] == [('Plato 0', True), ('Plato 1', True)]
+
+    # Sin cambios: solo la consulta de la versión
+    with django_assert_num_queries(1):
+        assert api_client.get('/api/v1/recipes/menu_snapshot/', {'version': first['version']}).data == {
+            'version': first['version'], 'unchanged': True,
+        }
+
+    with django_capture_on_commit_callbacks(execute=True):
+        group = Group.objects.get()
+        group.name = 'Segundos'
+        group.save()
+        Ingredient.adjust_stock({ingredients[0].pk: -100})
+
+    second = api_client.get('/api/v1/recipes/menu_snapshot/', {'version': first['version']}).data
+    assert second['unchanged'] is False and second['version'] != first['version']
+    assert {(recipe['group_name'], recipe['available']) for recipe in second['recipes']} == {('Segundos', False)}
+
+
+def test_low_stock_flag_follows_minimum_and_stock_changes(api_client, ingredients):
+    rice, beans, oil = ingredients
+    response = api_client.patch(f'/api/v1/ingredients/{rice.pk}/', {'minimum_stock': '120.00'}, format='json')
+    assert response.status_code == 200, response.data
+    assert response.data['is_low_stock'] is True
+    Ingredient.objects.filter(pk=beans.pk).update(minimum_stock=Decimal('30.00'))
+    Ingredient.adjust_stock({beans.pk: -80, oil.pk: -99})
+
+    response = api_client.get('/api/v1/ingredients/low_stock/')
+
+    assert response.status_code == 200
+    assert [(row['name'], row['shortage']) for row in response.data] == [
+        (rice.name, Decimal('20.00')), (beans.name, Decimal('10.00')),
+    ]
+    plan = Ingredient.objects.filter(is_low_stock=True).order_by('name').explain()
+    assert 'ingredient_low_stock_idx' in plan
@@ -3,12 +3,19 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 from backend.development_permissions import DevelopmentAwarePermission
-from .models import Group, Ingredient, Recipe, RecipeItem
+from backend.conditional_viewsets import ConditionalGetMixin
+from .menu_snapshot import menu_snapshot
+from .models import Group, Ingredient, Recipe, RecipeItem, StockMovement, StockSnapshot
 from .serializers import (
     GroupSerializer,
     IngredientSerializer, IngredientDetailSerializer,
-    RecipeSerializer, RecipeDetailSerializer, RecipeWithItemsCreateSerializer,
+    RecipeSerializer, RecipeDetailSerializer, RecipeWithItemsCreateSerializer, RecipeRepriceSerializer,
     RecipeItemSerializer, RecipeItemCreateSerializer
 )
 
@@ -23,9 +30,8 @@ class GroupViewSet(viewsets.ModelViewSet):
     def recipes(self, request, pk=None):
         """Obtener todas las recetas de un grupo"""
         group = self.get_object()
-        recipes = group.recipe_set.all().order_by('name')
+        recipes = RecipeSerializer.setup_eager_loading(group.recipe_set.all()).order_by('name')
         
-        from .serializers import RecipeSerializer
         serializer = RecipeSerializer(recipes, many=True)
         return Response(serializer.data)
 
@@ -91,6 +97,102 @@ class IngredientViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, 
                           status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'])
+    def low_stock(self, request):
+        """Ingredientes por debajo de su stock mínimo (índice parcial sobre is_low_stock)"""
+        ingredients = Ingredient.objects.select_related('unit').filter(is_low_stock=True).order_by('name')
+        return Response([
+            {
+                'id': ingredient.id,
+                'name': ingredient.name,
+                'unit': ingredient.unit.name,
+                'current_stock': ingredient.current_stock,
+                'minimum_stock': ingredient.minimum_stock,
+                'shortage': ingredient.minimum_stock - ingredient.current_stock,
+            }
+            for ingredient in ingredients
+        ])
+
+    @action(detail=False, methods=['post'])
+    def update_prices(self, request):
+        """
+        Actualizar precios de varios ingredientes (lista de {id, unit_price}) y recalcular
+        el costo de las recetas afectadas en una sola pasada
+        """
+        prices = request.data.get('prices')
+        if not prices:
+            return Response({'error': 'Se requiere la lista de precios'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            prices = {int(entry['id']): Decimal(str(entry['unit_price'])) for entry in prices}
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            return Response({'error': 'Cada precio requiere id y unit_price válidos'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if any(price < Decimal('0.01') for price in prices.values()):
+            return Response({'error': 'El precio unitario debe ser mayor a 0'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        missing = set(prices) - set(Ingredient.objects.filter(pk__in=prices).values_list('pk', flat=True))
+        if missing:
+            return Response({'error': f'Ingredientes no encontrados: {sorted(missing)}'},
+                          status=status.HTTP_404_NOT_FOUND)
+
+        updated = Ingredient.update_prices(prices)
+        return Response({'updated': updated})
+
+    @action(detail=False, methods=['get'])
+    def stock_at(self, request):
+        """Stock de cada ingrediente en un instante (?at=ISO 8601) a partir de foto + movimientos"""
+        moment = parse_datetime(request.query_params.get('at') or '')
+        if moment is None:
+            return Response({'error': 'Se requiere el parámetro at en formato ISO 8601'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+
+        stock = StockSnapshot.stock_at(moment)
+        ingredients = Ingredient.objects.select_related('unit').filter(pk__in=stock).order_by('name')
+        return Response({
+            'at': moment,
+            'ingredients': [
+                {
+                    'id': ingredient.id,
+                    'name': ingredient.name,
+                    'unit': ingredient.unit.name,
+                    'stock': stock[ingredient.id],
+                }
+                for ingredient in ingredients
+            ]
+        })
+
+    @action(detail=False, methods=['get'])
+    def consumption(self, request):
+        """Consumo neto por ingrediente entre ?start y ?end (YYYY-MM-DD, inclusive) desde el libro de movimientos"""
+        try:
+            start = datetime.strptime(request.query_params.get('start', ''), '%Y-%m-%d').date()
+            end = datetime.strptime(request.query_params.get('end', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'error': 'Se requieren start y end en formato YYYY-MM-DD'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        rows = StockMovement.consumption(
+            timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        )
+        return Response({
+            'start': start,
+            'end': end,
+            'ingredients': [
+                {
+                    'id': row['ingredient_id'],
+                    'name': row['ingredient__name'],
+                    'unit': row['ingredient__unit__name'],
+                    'consumed': row['consumed'],
+                }
+                for row in rows
+            ]
+        })
+
     def destroy(self, request, *args, **kwargs):
         """Override destroy para manejar errores de validación"""
         ingredient = self.get_object()
@@ -104,10 +206,11 @@ class IngredientViewSet(viewsets.ModelViewSet):
             )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [DevelopmentAwarePermission]  # Environment-aware authentication
-    queryset = Recipe.objects.select_related('group', 'container').prefetch_related('recipeitem_set__ingredient').order_by('name')
+    queryset = RecipeSerializer.setup_eager_loading(Recipe.objects.all()).order_by('name')
     pagination_class = None  # Deshabilitar paginación para recetas
+    version_resources = ('recipes',)
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -117,7 +220,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return RecipeSerializer
     
     def get_queryset(self):
-        queryset = Recipe.objects.select_related('group', 'container').all().order_by('name', '-version')
+        queryset = RecipeSerializer.setup_eager_loading(Recipe.objects.all()).order_by('name', '-version')
         is_available = self.request.query_params.get('is_available')
         is_active = self.request.query_params.get('is_active')
         group = self.request.query_params.get('group')
@@ -133,12 +236,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if self.request.path.endswith('/recipes/') and self.request.method == 'GET':
             show_all = self.request.query_params.get('show_all')
             if not show_all:
-                # Filtrar por recetas que están activas Y tienen stock suficiente
-                available_recipes = []
-                for recipe in queryset:
-                    if recipe.is_active and recipe.has_sufficient_stock():
-                        available_recipes.append(recipe.id)
-                queryset = queryset.filter(id__in=available_recipes)
+                # Filtrar por recetas que están activas Y tienen porciones disponibles
+                queryset = Recipe.in_stock(queryset.filter(is_active=True))
             
         return queryset
     
@@ -150,6 +249,58 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def menu_snapshot(self, request):
+        """
+        Menú compacto para tablets (id, nombre, grupo, precio, disponibilidad, impresora).
+        Con ?version=N igual a la versión actual responde solo {'version', 'unchanged': true}.
+        """
+        version, menu = menu_snapshot.get()
+        if request.query_params.get('version') == str(version):
+            return Response({'version': version, 'unchanged': True})
+        return Response({'version': version, 'unchanged': False, 'recipes': menu})
+
+    @action(detail=False, methods=['post'])
+    def bulk_reprice(self, request):
+        """
+        Recalcular el precio base de varias recetas en una sola pasada.
+        Body: recipe_ids, group_ids o all=true; dry_run=true solo devuelve las diferencias.
+        """
+        serializer = RecipeRepriceSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        dry_run = params['dry_run']
+
+        if params['all']:
+            recipes = Recipe.objects.all()
+        else:
+            recipes = Recipe.objects.none()
+            if params['recipe_ids']:
+                recipes = recipes | Recipe.objects.filter(pk__in=params['recipe_ids'])
+            if params['group_ids']:
+                recipes = recipes | Recipe.objects.filter(group_id__in=params['group_ids'])
+
+        with transaction.atomic():
+            changed = Recipe.reprice(recipes.order_by('name', '-version'), dry_run=dry_run)
+
+        return Response({
+            'dry_run': dry_run,
+            'updated': len(changed),
+            'changes': [
+                {
+                    'id': recipe.id,
+                    'name': recipe.name,
+                    'version': recipe.version,
+                    'old_ingredients_cost': recipe.old_ingredients_cost,
+                    'ingredients_cost': recipe.ingredients_cost,
+                    'old_price': recipe.old_base_price,
+                    'new_price': recipe.base_price,
+                }
+                for recipe in changed
+            ]
+        })
+    
     @action(detail=True, methods=['get'])
     def check_availability(self, request, pk=None):
         """Verificar disponibilidad de una receta según stock"""
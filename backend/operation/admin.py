@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem, Payment, PaymentItem, ContainerSale
+from .models import Order, OrderItem, Payment, PaymentItem, ContainerSale, PrintJob
 
 
 
@@ -63,3 +63,11 @@ class ContainerSaleAdmin(admin.ModelAdmin):
     list_filter = ['container', 'created_at']
     search_fields = ['order__id', 'container__name']
     readonly_fields = ['unit_price', 'total_price', 'created_at']
+
+
+@admin.register(PrintJob)
+class PrintJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'order_item', 'printer', 'status', 'attempts', 'next_attempt_at', 'printed_at']
+    list_filter = ['status', 'printer']
+    search_fields = ['order_item__id', 'order_item__order__id']
+    readonly_fields = ['created_at', 'printed_at', 'claim_token', 'last_error']
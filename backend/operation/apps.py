@@ -13,3 +13,8 @@ class OperationConfig(AppConfig):
         except ImportError:
             # SSE views no disponible
             pass
+
+        # Reanudar la cola de impresión al primer request del proceso web
+        from django.core.signals import request_started
+        from .print_dispatcher import print_dispatcher
+        request_started.connect(print_dispatcher.start_pending_workers, dispatch_uid='print_dispatcher_startup')
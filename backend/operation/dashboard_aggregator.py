@@ -0,0 +1,179 @@
+"""
+Agregador en una sola pasada de las filas de dashboard_item_view y dashboard_payment_view
+para el dashboard financiero (?source=view)
+
+Las filas (una por item y una por método de pago de cada orden) del período se recorren
+una única vez acumulando ventas, categorías y platos totales y por fecha operativa; las
+órdenes pagadas se deduplican con un conjunto, así el costo es lineal en el número de filas.
+El dashboard operativo agrega en SQL (ver dashboard_queries).
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+# Columnas en el orden en que el dashboard financiero las selecciona de cada vista
+ITEM_COLUMNS = (
+    'order_id', 'order_status', 'operational_date', 'item_id', 'quantity', 'unit_price',
+    'total_with_container', 'recipe_name', 'category_name',
+)
+PAYMENT_COLUMNS = ('order_status', 'payment_method', 'payment_amount', 'payment_count')
+
+ItemRow = namedtuple('ItemRow', ITEM_COLUMNS)
+PaymentRow = namedtuple('PaymentRow', PAYMENT_COLUMNS)
+
+
+def to_decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value or 0))
+
+
+def fetch_rows(cursor, chunk_size=2000):
+    """Itera las filas del cursor por bloques sin cargar todo el resultado en memoria"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+
+class StatsAccumulator:
+    """
+    Sumas agrupadas por clave: cada grupo nace con los valores por defecto dados
+    y `add` le suma los montos recibidos
+    """
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self.groups = {}
+
+    def __contains__(self, key):
+        return key in self.groups
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __getitem__(self, key):
+        return self.group(key)
+
+    def group(self, key):
+        stats = self.groups.get(key)
+        if stats is None:
+            stats = self.groups[key] = dict(self.defaults)
+        return stats
+
+    def add(self, key, **amounts):
+        stats = self.group(key)
+        for field, amount in amounts.items():
+            stats[field] += amount
+        return stats
+
+    def items(self):
+        return self.groups.items()
+
+    def keys(self):
+        return self.groups.keys()
+
+    def total(self, field):
+        return sum((stats[field] for stats in self.groups.values()), self.defaults[field])
+
+    def ranked(self, field, limit=None):
+        """Grupos ordenados de mayor a menor según `field`"""
+        ranked = sorted(self.groups.items(), key=lambda entry: entry[1][field], reverse=True)
+        return ranked[:limit] if limit is not None else ranked
+
+
+def dish_accumulator():
+    return StatsAccumulator(category='', quantity=0, revenue=Decimal('0'), unit_price=Decimal('0'))
+
+
+def category_accumulator():
+    return StatsAccumulator(revenue=Decimal('0'), quantity=0)
+
+
+class DashboardAggregator:
+    """
+    Consume filas de dashboard_item_view y dashboard_payment_view y acumula las métricas
+    del dashboard financiero: ventas, categorías y platos del período y por fecha operativa
+    """
+
+    def __init__(self):
+        self.rows = 0
+
+        # Ventas (solo órdenes PAID con items)
+        self.paid_orders = set()
+        self.total_items = 0
+        self.total_revenue = Decimal('0')
+        self.category_stats = category_accumulator()
+        self.dish_stats = dish_accumulator()
+        self.payment_stats = StatsAccumulator(amount=Decimal('0'), count=0)
+
+        # Desglose diario
+        self.daily_sales = StatsAccumulator(orders=0, revenue=Decimal('0'), items=0)
+        self.daily_category_stats = {}
+        self.daily_dish_stats = {}
+
+    def consume(self, item_rows):
+        for row in item_rows:
+            self.add_item(ItemRow._make(row))
+        return self
+
+    def consume_payments(self, payment_rows):
+        for row in payment_rows:
+            self.add_payment(PaymentRow._make(row))
+        return self
+
+    def add_item(self, row):
+        self.rows += 1
+        if row.order_status == 'PAID' and row.item_id:
+            self._add_paid_item(row)
+
+    def _add_paid_item(self, row):
+        order_id = row.order_id
+        quantity = row.quantity or 0
+        revenue = to_decimal(row.total_with_container)
+        unit_price = to_decimal(row.unit_price)
+        category = row.category_name or 'Sin Categoría'
+        day = str(row.operational_date)
+
+        new_order = order_id not in self.paid_orders
+        self.paid_orders.add(order_id)
+        self.total_items += 1
+        self.total_revenue += revenue
+
+        if row.category_name and row.recipe_name:
+            self.category_stats.add(category, revenue=revenue, quantity=quantity)
+
+        if row.recipe_name:
+            dish = self.dish_stats.add(row.recipe_name, quantity=quantity, revenue=revenue)
+            dish['category'] = category
+            dish['unit_price'] = unit_price
+
+        self.daily_sales.add(day, orders=1 if new_order else 0, revenue=revenue, items=quantity)
+        if day not in self.daily_category_stats:
+            self.daily_category_stats[day] = category_accumulator()
+            self.daily_dish_stats[day] = dish_accumulator()
+        if row.category_name and row.recipe_name:
+            self.daily_category_stats[day].add(category, revenue=revenue, quantity=quantity)
+        if row.recipe_name:
+            dish = self.daily_dish_stats[day].add(row.recipe_name, quantity=quantity, revenue=revenue)
+            dish['category'] = category
+            dish['unit_price'] = unit_price
+
+    def add_payment(self, row):
+        """Suma los pagos de órdenes pagadas por método"""
+        amount = to_decimal(row.payment_amount)
+        if row.order_status != 'PAID' or amount <= 0:
+            return
+        self.payment_stats.add(row.payment_method or 'UNKNOWN', amount=amount, count=row.payment_count or 0)
+
+    def payment_methods(self):
+        total_amount = self.payment_stats.total('amount')
+        return [
+            {
+                'method': method,
+                'amount': float(stats['amount']),
+                'percentage': float(stats['amount'] / total_amount * 100) if total_amount > 0 else 0.0,
+                'transaction_count': stats['count']
+            }
+            for method, stats in self.payment_stats.items()
+        ]
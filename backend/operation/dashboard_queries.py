@@ -0,0 +1,136 @@
+"""
+Consultas agregadas del dashboard operativo
+
+Cada desglose (categorías, platos, meseros, métodos de pago, estados de items) es un
+GROUP BY parametrizado sobre dashboard_item_view / dashboard_payment_view que devuelve
+solo filas ya agregadas, así la latencia no crece con el volumen de items del día.
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Avg, DurationField, ExpressionWrapper, F
+
+from .models import DailyOrderRollup, Order
+
+# Tiempos de servicio mayores a 7 días se consideran irreales
+MAX_SERVICE_MINUTES = 10080
+
+# Items de órdenes pagadas (base de todas las métricas de ventas)
+PAID_ITEMS = "operational_date = %s AND order_status = 'PAID' AND item_id IS NOT NULL"
+
+SUMMARY_SQL = """
+    SELECT
+        COUNT(*) AS row_count,
+        COUNT(DISTINCT CASE WHEN order_status = 'PAID' AND item_id IS NOT NULL THEN order_id END) AS total_orders,
+        COUNT(CASE WHEN order_status = 'PAID' AND item_id IS NOT NULL THEN 1 END) AS total_items,
+        COUNT(DISTINCT CASE WHEN order_status = 'PAID' AND item_id IS NOT NULL AND is_takeaway THEN order_id END) AS delivery_orders,
+        COUNT(DISTINCT CASE WHEN order_status = 'PAID' AND item_id IS NOT NULL AND NOT is_takeaway THEN order_id END) AS restaurant_orders,
+        COALESCE(SUM(CASE WHEN order_status = 'PAID' AND item_id IS NOT NULL AND is_takeaway THEN total_with_container END), 0) AS delivery_revenue,
+        COALESCE(SUM(CASE WHEN order_status = 'PAID' AND item_id IS NOT NULL AND NOT is_takeaway THEN total_with_container END), 0) AS restaurant_revenue,
+        COALESCE(SUM(CASE WHEN order_status = 'PAID' AND item_id IS NOT NULL AND is_takeaway THEN quantity END), 0) AS delivery_items,
+        COALESCE(SUM(CASE WHEN order_status = 'PAID' AND item_id IS NOT NULL AND NOT is_takeaway THEN quantity END), 0) AS restaurant_items,
+        COUNT(DISTINCT CASE WHEN order_status IN ('CREATED', 'SERVED') THEN order_id END) AS active_orders,
+        COUNT(CASE WHEN item_status = 'CREATED' THEN 1 END) AS pending_items,
+        COUNT(CASE WHEN item_status = 'PREPARING' THEN 1 END) AS preparing_items,
+        COUNT(CASE WHEN item_status = 'SERVED' THEN 1 END) AS served_items
+    FROM dashboard_item_view
+    WHERE operational_date = %s
+"""
+
+CATEGORY_SQL = f"""
+    SELECT category_name AS category, SUM(total_with_container) AS revenue, SUM(quantity) AS quantity
+    FROM dashboard_item_view
+    WHERE {PAID_ITEMS} AND recipe_name IS NOT NULL
+    GROUP BY category_name
+    ORDER BY revenue DESC
+"""
+
+DELIVERY_RECIPE_SQL = f"""
+    SELECT category_name AS category, recipe_name AS name,
+           SUM(total_with_container) AS revenue, SUM(quantity) AS quantity, MAX(unit_price) AS unit_price
+    FROM dashboard_item_view
+    WHERE {PAID_ITEMS} AND is_takeaway AND recipe_name IS NOT NULL
+    GROUP BY category_name, recipe_name
+    ORDER BY revenue DESC
+"""
+
+DISH_SQL = f"""
+    SELECT recipe_name AS name, MAX(category_name) AS category,
+           SUM(quantity) AS quantity, SUM(total_with_container) AS revenue, MAX(unit_price) AS unit_price
+    FROM dashboard_item_view
+    WHERE {PAID_ITEMS} AND recipe_name IS NOT NULL
+    GROUP BY recipe_name
+    ORDER BY quantity DESC
+"""
+
+WAITER_SQL = f"""
+    SELECT COALESCE(waiter, 'Sin Asignar') AS waiter,
+           SUM(total_with_container) AS revenue, COUNT(DISTINCT order_id) AS orders
+    FROM dashboard_item_view
+    WHERE {PAID_ITEMS}
+    GROUP BY COALESCE(waiter, 'Sin Asignar')
+    ORDER BY revenue DESC
+"""
+
+ITEM_STATUS_SQL = """
+    SELECT item_status AS status, COUNT(*) AS count,
+           COALESCE(SUM(CASE WHEN order_status = 'PAID' THEN total_with_container END), 0) AS amount
+    FROM dashboard_item_view
+    WHERE operational_date = %s AND item_id IS NOT NULL AND item_status IS NOT NULL
+    GROUP BY item_status
+"""
+
+PAYMENT_SQL = """
+    SELECT COALESCE(payment_method, 'UNKNOWN') AS method,
+           SUM(payment_amount) AS amount, SUM(payment_count) AS transaction_count
+    FROM dashboard_payment_view
+    WHERE operational_date = %s AND order_status = 'PAID' AND payment_amount > 0
+    GROUP BY COALESCE(payment_method, 'UNKNOWN')
+"""
+
+
+class OperationalDashboardQueries:
+    """Desgloses del dashboard operativo de un día operativo (DATE(created_at) en UTC)"""
+
+    def __init__(self, day):
+        self.day = day
+        self.params = [day.strftime('%Y-%m-%d')]
+
+    def _fetch(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, self.params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def summary(self):
+        return self._fetch(SUMMARY_SQL)[0]
+
+    def categories(self):
+        return self._fetch(CATEGORY_SQL)
+
+    def delivery_recipes(self):
+        return self._fetch(DELIVERY_RECIPE_SQL)
+
+    def dishes(self):
+        return self._fetch(DISH_SQL)
+
+    def waiters(self):
+        return self._fetch(WAITER_SQL)
+
+    def item_statuses(self):
+        return self._fetch(ITEM_STATUS_SQL)
+
+    def payment_methods(self):
+        return self._fetch(PAYMENT_SQL)
+
+    def average_service_time(self):
+        """Minutos promedio entre creación y pago de las órdenes pagadas del día"""
+        start, end = DailyOrderRollup.day_range(self.day)
+        average = Order.objects.filter(
+            status='PAID', created_at__gte=start, created_at__lt=end, paid_at__isnull=False
+        ).annotate(
+            service_time=ExpressionWrapper(F('paid_at') - F('created_at'), output_field=DurationField())
+        ).filter(
+            service_time__gt=timedelta(0), service_time__lt=timedelta(minutes=MAX_SERVICE_MINUTES)
+        ).aggregate(average=Avg('service_time'))['average']
+        return average.total_seconds() / 60 if average else 0
@@ -0,0 +1,183 @@
+"""
+Bus de cambios en proceso para el stream SSE (operation/sse_views.py)
+
+Los modelos publican eventos al commit de la transacción; cada conexión SSE abierta
+es una suscripción con su propia cola. El broker por defecto vive en memoria del
+proceso, así que solo alcanza a las conexiones atendidas por ese mismo proceso;
+EVENT_STREAM['BROKER'] permite reemplazarlo por otro con la misma interfaz
+(publish/subscribe/unsubscribe).
+"""
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BROKER': 'operation.events.InMemoryBroker',
+    'HEARTBEAT_SECONDS': 15,
+    'MAX_QUEUE_SIZE': 500,
+    # Bajo WSGI (runserver) cada conexión ocupa un hilo: se cierra y el cliente reconecta
+    'SYNC_MAX_SECONDS': 60,
+}
+
+# Eventos que recibe cada stream (None = todos)
+STREAM_EVENTS = {
+    'orders': None,
+    'kitchen': {'order_item_update', 'order_item_delete'},
+}
+
+
+def stream_setting(name):
+    return getattr(settings, 'EVENT_STREAM', {}).get(name, DEFAULTS[name])
+
+
+class Subscription(ABC):
+    """Cola de eventos de una conexión; `overflowed` indica que se perdieron eventos"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.event_types = STREAM_EVENTS[stream]
+        self.overflowed = False
+
+    def accepts(self, event):
+        return self.event_types is None or event['event'] in self.event_types
+
+    @abstractmethod
+    def deliver(self, event):
+        """Entrega el evento a la conexión sin bloquear al publicador"""
+
+
+class AsyncSubscription(Subscription):
+    """Suscripción consumida desde el event loop (ASGI)"""
+
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=stream_setting('MAX_QUEUE_SIZE'))
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ThreadSubscription(Subscription):
+    """Suscripción consumida desde un hilo (WSGI)"""
+
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.queue = queue.Queue(maxsize=stream_setting('MAX_QUEUE_SIZE'))
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class InMemoryBroker:
+    """Broker local del proceso; publish es seguro desde cualquier hilo"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def subscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event_type, data):
+        event = {'id': next(self._sequence), 'event': event_type, 'data': data}
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if s.accepts(event)]
+        for subscription in subscriptions:
+            subscription.deliver(event)
+        return event
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(stream_setting('BROKER'))()
+    return _broker
+
+
+def publish(event_type, data):
+    """Publica el evento cuando la transacción actual hace commit (inmediato en autocommit)"""
+    def send():
+        try:
+            get_broker().publish(event_type, data)
+        except Exception as e:
+            # Un fallo del bus nunca debe afectar a la operación que lo originó
+            logger.error(f"❌ EVENTS - Error publicando {event_type}: {e}")
+    transaction.on_commit(send)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def publish_order_item(item, action):
+    """order_item_update con el estado actual del item (action: created, status, printed)"""
+    publish('order_item_update', {
+        'action': action,
+        'id': item.id,
+        'order_id': item.order_id,
+        'recipe_id': item.recipe_id,
+        'recipe_name': item.recipe.name,
+        'quantity': item.quantity,
+        'status': item.status,
+        'print_confirmed': item.print_confirmed,
+        'updated_at': _isoformat(item.updated_at),
+    })
+
+
+def publish_order(order, action, **extra):
+    """order_update con el estado actual de la orden (action: status, payment)"""
+    publish('order_update', {
+        'action': action,
+        'id': order.id,
+        'table_id': order.table_id,
+        'status': order.status,
+        **extra,
+    })
@@ -0,0 +1,82 @@
+"""
+Management command para medir el agregador del dashboard financiero sobre un día sintético
+"""
+import random
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from operation.dashboard_aggregator import DashboardAggregator
+
+
+class Command(BaseCommand):
+    help = 'Mide DashboardAggregator con filas sintéticas de las vistas de dashboard (sin tocar la base de datos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=100000,
+            help='Filas sintéticas a generar (por defecto 100000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Repeticiones de la medición; se reporta la mejor (por defecto 3)'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Semilla del generador aleatorio')
+
+    def handle(self, *args, **options):
+        rows, payment_rows = self._synthetic_day(options['rows'], random.Random(options['seed']))
+        self.stdout.write(f'🧪 {len(rows)} items y {len(payment_rows)} pagos sintéticos generados')
+
+        timings = []
+        for _ in range(max(options['repeat'], 1)):
+            started = time.perf_counter()
+            aggregator = DashboardAggregator().consume(rows).consume_payments(payment_rows)
+            aggregator.payment_methods()
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        self.stdout.write(self.style.SUCCESS(
+            f'📊 financiero: {best * 1000:.1f} ms ({len(rows) / best:,.0f} filas/s), '
+            f'{len(aggregator.paid_orders)} órdenes pagadas, {aggregator.total_items} items'
+        ))
+
+    def _synthetic_day(self, total_rows, rng):
+        """Filas con la forma de dashboard_item_view y dashboard_payment_view; a veces dos pagos por orden"""
+        day = date.today()
+        categories = [f'Categoría {number}' for number in range(1, 9)]
+        recipes = [
+            (f'Plato {number}', categories[number % len(categories)], Decimal(rng.randint(800, 4500)) / 100)
+            for number in range(60)
+        ]
+
+        rows = []
+        payment_rows = []
+        order_id = 0
+        item_id = 0
+        while len(rows) < total_rows:
+            order_id += 1
+            status = rng.choices(['PAID', 'SERVED', 'CREATED'], weights=[85, 10, 5])[0]
+            payments = [rng.choice(['CASH', 'CARD', 'YAPE_PLIN'])]
+            if status == 'PAID' and rng.random() < 0.2:
+                payments.append(rng.choice(['CASH', 'CARD']))
+
+            items = []
+            for _ in range(rng.randint(1, 6)):
+                item_id += 1
+                name, category_name, price = rng.choice(recipes)
+                quantity = rng.randint(1, 3)
+                container = Decimal('1.00') if rng.random() < 0.15 else Decimal('0')
+                items.append((item_id, quantity, price, price * quantity + container, name, category_name))
+            order_total = sum(item[3] for item in items)
+
+            for item in items:
+                rows.append((order_id, status, day, *item))
+            if status == 'PAID':
+                for method in payments:
+                    payment_rows.append((status, method, order_total / len(payments), 1))
+        return rows[:total_rows], payment_rows
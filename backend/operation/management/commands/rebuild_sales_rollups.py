@@ -0,0 +1,48 @@
+"""
+Management command para reconstruir los rollups diarios del dashboard financiero (backfill del histórico)
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import TruncDate
+
+from operation.models import DailyOrderRollup, Order
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los rollups diarios de ventas, órdenes y pagos a partir de las órdenes pagadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Primer día a reconstruir (YYYY-MM-DD); por defecto el más antiguo')
+        parser.add_argument('--end', help='Último día a reconstruir (YYYY-MM-DD); por defecto hoy')
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=31,
+            help='Días reconstruidos por transacción (por defecto 31)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError:
+            raise CommandError('Las fechas deben tener formato YYYY-MM-DD')
+
+        days = Order.objects.annotate(
+            day=TruncDate('created_at', tzinfo=dt_timezone.utc)
+        ).values_list('day', flat=True).distinct().order_by('day')
+        if start:
+            days = days.filter(day__gte=start)
+        if end:
+            days = days.filter(day__lte=end)
+        days = list(days)
+
+        # Los días sin órdenes pagadas también se reconstruyen para limpiar rollups obsoletos
+        if days:
+            days = [days[0] + timedelta(days=offset) for offset in range((days[-1] - days[0]).days + 1)]
+
+        chunk = max(options['chunk_days'], 1)
+        for index in range(0, len(days), chunk):
+            DailyOrderRollup.rebuild_days(days[index:index + chunk])
+        self.stdout.write(self.style.SUCCESS(f'📊 Rollups reconstruidos para {len(days)} días'))
@@ -0,0 +1,54 @@
+"""
+Management command para procesar la cola de impresión fuera del proceso web
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from operation.models import PrintJob
+from operation.print_dispatcher import dispatcher_setting, print_dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Procesa los trabajos de impresión pendientes (usar con PRINT_DISPATCHER_THREADS=False)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesa los trabajos vencidos una vez y termina'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Segundos entre revisiones de la cola (por defecto 1)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🖨️ DESPACHADOR DE IMPRESIÓN INICIADO'))
+
+        while True:
+            processed = self._drain()
+            if processed:
+                self.stdout.write(f'✅ {processed} trabajos procesados')
+            if options['once']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def _drain(self):
+        """Procesa lotes de cada impresora con trabajos pendientes hasta vaciarlas"""
+        total = 0
+        printer_ids = set(
+            PrintJob.objects.filter(status__in=['PENDING', 'PRINTING'])
+            .values_list('printer_id', flat=True).distinct()
+        )
+        for printer_id in printer_ids:
+            while True:
+                processed = print_dispatcher.process_pending(printer_id)
+                total += processed
+                if processed < dispatcher_setting('BATCH_SIZE'):
+                    break
+        return total
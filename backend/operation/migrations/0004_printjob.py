@@ -0,0 +1,37 @@
+# Generated by Django 5.2.2 on 2026-10-16 20:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operation', '0003_auto_20250914_1418'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrintJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('PRINTING', 'Imprimiendo'), ('DONE', 'Impreso'), ('FAILED', 'Fallido'), ('CANCELED', 'Cancelado')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claim_token', models.CharField(blank=True, max_length=32)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('printed_at', models.DateTimeField(blank=True, null=True)),
+                ('order_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='print_jobs', to='operation.orderitem')),
+                ('printer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='print_jobs', to='operation.printerconfig')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Impresión',
+                'verbose_name_plural': 'Trabajos de Impresión',
+                'db_table': 'print_job',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['printer', 'status', 'next_attempt_at'], name='print_job_printer_1b8bcb_idx')],
+            },
+        ),
+    ]
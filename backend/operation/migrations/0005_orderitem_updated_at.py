@@ -0,0 +1,32 @@
+# Generated by Django 5.2.2 on 2026-10-16 20:48
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite reconstruye order_item al agregar la columna y falla si hay vistas que la
+# referencian: se eliminan las vistas de dashboard antes y se recrean después.
+dashboard_views = import_module('operation.migrations.0003_auto_20250914_1418')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('config', '0001_initial'),
+        ('inventory', '0002_initial'),
+        ('operation', '0004_printjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(dashboard_views.drop_dashboard_views, dashboard_views.create_dashboard_views),
+        migrations.AddField(
+            model_name='orderitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['status'], name='order_item_status_idx'),
+        ),
+        migrations.RunPython(dashboard_views.create_dashboard_views, dashboard_views.drop_dashboard_views),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.2 on 2026-10-17 09:30
+
+from django.db import migrations
+
+
+def create_fact_views(apps, schema_editor):
+    """
+    Vistas de hechos para los dashboards: una fila por item y una fila por método de pago
+    de cada orden. dashboard_operativo_view une items y pagos en la misma fila, así una
+    orden con 20 items y 3 pagos devuelve 60 filas; estas vistas no multiplican filas.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        # Una fila por item (o una sola fila con item_id NULL si la orden no tiene items)
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS dashboard_item_view AS
+            SELECT
+                o.id as order_id,
+                o.total_amount as order_total,
+                o.status as order_status,
+                o.waiter,
+                DATE(o.created_at) as operational_date,
+
+                oi.id as item_id,
+                oi.quantity,
+                oi.unit_price,
+                oi.total_price,
+                (oi.total_price * oi.quantity) as total_with_container,
+                oi.status as item_status,
+                oi.is_takeaway,
+
+                r.name as recipe_name,
+                COALESCE(g.name, 'Sin Categoría') as category_name,
+                COALESCE(g.id, 0) as category_id,
+
+                o.created_at,
+                o.paid_at
+
+            FROM "order" o
+            LEFT JOIN order_item oi ON o.id = oi.order_id
+            LEFT JOIN recipe r ON oi.recipe_id = r.id
+            LEFT JOIN "group" g ON r.group_id = g.id
+            WHERE o.status IS NOT NULL
+        """)
+
+        # Una fila por orden y método de pago con el monto y número de pagos
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS dashboard_payment_view AS
+            SELECT
+                o.id as order_id,
+                o.status as order_status,
+                DATE(o.created_at) as operational_date,
+                p.payment_method,
+                SUM(p.amount) as payment_amount,
+                COUNT(p.id) as payment_count
+
+            FROM payment p
+            INNER JOIN "order" o ON o.id = p.order_id
+            WHERE o.status IS NOT NULL
+            GROUP BY o.id, o.status, DATE(o.created_at), p.payment_method
+        """)
+
+
+def drop_fact_views(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP VIEW IF EXISTS dashboard_payment_view")
+        cursor.execute("DROP VIEW IF EXISTS dashboard_item_view")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operation', '0006_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_fact_views,
+            drop_fact_views,
+            hints={'operation': 'dashboard_views'}
+        ),
+    ]
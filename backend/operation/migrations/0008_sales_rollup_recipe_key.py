@@ -0,0 +1,103 @@
+# Generated by Django 5.2.2 on 2026-10-16 23:13
+
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, ExtractHour, TruncDate
+
+# SQLite reconstruye daily_sales_rollup al agregar la columna y la restricción, y falla
+# si hay vistas de dashboard en el esquema: se eliminan antes y se recrean después.
+from operation.migrations._views import around_table_rebuild
+
+
+def rebuild_rollups(apps, schema_editor):
+    """
+    Reconstruye los tres rollups desde las órdenes pagadas: 0006 creó las tablas vacías
+    y las filas de ventas existentes no tienen recipe_id (mismo GROUP BY que
+    DailyOrderRollup.rebuild_days, sobre todos los días)
+    """
+    OrderItem = apps.get_model('operation', 'OrderItem')
+    Payment = apps.get_model('operation', 'Payment')
+    DailyOrderRollup = apps.get_model('operation', 'DailyOrderRollup')
+    DailySalesRollup = apps.get_model('operation', 'DailySalesRollup')
+    DailyPaymentRollup = apps.get_model('operation', 'DailyPaymentRollup')
+
+    items = OrderItem.objects.filter(order__status='PAID').annotate(
+        day=TruncDate('order__created_at', tzinfo=dt_timezone.utc)
+    )
+    revenue = models.Sum(
+        models.F('total_price') * models.F('quantity'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2)
+    )
+    order_rows = items.values('day').annotate(
+        orders_count=models.Count('order_id', distinct=True),
+        items_count=models.Count('id'),
+        quantity_sum=models.Sum('quantity'),
+        revenue_sum=revenue,
+    ).order_by()
+    sales_rows = items.annotate(
+        hour=ExtractHour('order__created_at', tzinfo=dt_timezone.utc),
+        category=Coalesce('recipe__group__name', models.Value('Sin Categoría')),
+    ).values('day', 'hour', 'recipe_id', 'recipe__group_id', 'category', 'recipe__name').annotate(
+        items_count=models.Count('id'),
+        quantity_sum=models.Sum('quantity'),
+        revenue_sum=revenue,
+        last_unit_price=models.Max('unit_price'),
+    ).order_by()
+    payment_rows = Payment.objects.filter(order__status='PAID').annotate(
+        day=TruncDate('order__created_at', tzinfo=dt_timezone.utc)
+    ).values('day', 'payment_method').annotate(
+        amount_sum=models.Sum('amount'),
+        payments_count=models.Count('id'),
+    ).order_by()
+
+    DailyOrderRollup.objects.all().delete()
+    DailySalesRollup.objects.all().delete()
+    DailyPaymentRollup.objects.all().delete()
+    DailyOrderRollup.objects.bulk_create([
+        DailyOrderRollup(
+            day=row['day'], orders=row['orders_count'], items=row['items_count'],
+            quantity=row['quantity_sum'] or 0, revenue=row['revenue_sum'] or Decimal('0.00')
+        )
+        for row in order_rows
+    ], batch_size=500)
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(
+            day=row['day'], hour=row['hour'], recipe_id=row['recipe_id'],
+            category_id=row['recipe__group_id'] or 0,
+            category_name=row['category'], recipe_name=row['recipe__name'],
+            items=row['items_count'], quantity=row['quantity_sum'] or 0,
+            revenue=row['revenue_sum'] or Decimal('0.00'), unit_price=row['last_unit_price']
+        )
+        for row in sales_rows
+    ], batch_size=500)
+    DailyPaymentRollup.objects.bulk_create([
+        DailyPaymentRollup(
+            day=row['day'], payment_method=row['payment_method'],
+            amount=row['amount_sum'], count=row['payments_count']
+        )
+        for row in payment_rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operation', '0007_dashboard_fact_views'),
+    ]
+
+    operations = [
+        *around_table_rebuild(
+            migrations.AddField(
+                model_name='dailysalesrollup',
+                name='recipe_id',
+                field=models.PositiveIntegerField(default=0),
+            ),
+            migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+            migrations.AddConstraint(
+                model_name='dailysalesrollup',
+                constraint=models.UniqueConstraint(fields=('day', 'hour', 'recipe_id'), name='daily_sales_rollup_unique_recipe_hour'),
+            ),
+        ),
+    ]
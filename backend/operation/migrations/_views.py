@@ -0,0 +1,50 @@
+"""
+Eliminar y recrear las vistas de dashboard alrededor de migraciones que reconstruyen tablas
+
+SQLite reconstruye la tabla completa en varios cambios de esquema (AddField no nulo con
+default, AlterUniqueTogether...) y falla si alguna vista hace referencia a una columna
+inexistente, como dashboard_financiero_view. Las migraciones que reconstruyen tablas
+usadas por las vistas envuelven sus operaciones con `around_table_rebuild`.
+
+Solo se recrean las vistas cuya migración ya está aplicada, así el resultado no depende
+del orden en que se ejecuten las migraciones de distintas apps.
+(El loader de migraciones ignora los módulos que empiezan con "_")
+"""
+from importlib import import_module
+
+from django.db import migrations
+from django.db.migrations.recorder import MigrationRecorder
+
+# (migración que crea las vistas, función que las crea, función que las elimina)
+VIEW_MIGRATIONS = [
+    ('0003_auto_20250914_1418', 'create_dashboard_views', 'drop_dashboard_views'),
+    ('0007_dashboard_fact_views', 'create_fact_views', 'drop_fact_views'),
+]
+
+
+def _view_helpers():
+    for name, create, drop in VIEW_MIGRATIONS:
+        module = import_module(f'operation.migrations.{name}')
+        yield name, getattr(module, create), getattr(module, drop)
+
+
+def drop_all_views(apps, schema_editor):
+    # Las vistas de hechos primero (orden inverso de creación)
+    for _, _, drop in reversed(list(_view_helpers())):
+        drop(apps, schema_editor)
+
+
+def create_applied_views(apps, schema_editor):
+    applied = MigrationRecorder(schema_editor.connection).applied_migrations()
+    for name, create, _ in _view_helpers():
+        if ('operation', name) in applied:
+            create(apps, schema_editor)
+
+
+def around_table_rebuild(*operations):
+    """Operaciones envueltas entre la eliminación y la recreación de las vistas"""
+    return [
+        migrations.RunPython(drop_all_views, create_applied_views),
+        *operations,
+        migrations.RunPython(create_applied_views, drop_all_views),
+    ]
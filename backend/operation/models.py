@@ -1,16 +1,25 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.utils import timezone
-from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.apps import apps
+from django.db.models.functions import Coalesce, ExtractHour, TruncDate
 from decimal import Decimal
-from config.models import Table, Container
-from inventory.models import Recipe, Ingredient
+from datetime import datetime, timedelta, timezone as dt_timezone
+from contextlib import contextmanager
+from config.models import Table, Container, ResourceVersion
+from inventory.models import Recipe, Ingredient, RecipeItem
+from backend.unit_of_work import DeferredRecalculation
+from . import events, report_cache
+import threading
 import uuid
 
 
+KITCHEN_CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
 # Configuración de impresoras USB para múltiples etiquetadoras
 class PrinterConfig(models.Model):
     """Configuración de impresoras USB para RPi4"""
@@ -217,28 +226,38 @@ class Order(models.Model):
             import logging
             logger = logging.getLogger(__name__)
             
-            # Guardar estado original antes del refresh para evitar que se resetee
-            original_status = self.status
-            logger.info(f"🧮 BACKEND - calculate_total() ORDEN #{self.id}: Estado original: {original_status}")
-            
-            # Forzar refresh de la relación para evitar cache stale
-            self.refresh_from_db()
-            
-            # Restaurar el status original si fue modificado por el refresh
-            if self.status != original_status:
-                logger.warning(f"⚠️ BACKEND - refresh_from_db() cambió estado de {original_status} a {self.status}, restaurando...")
-                self.status = original_status
-            
-            # Total solo de items de comida
-            items_total = sum(item.total_price for item in self.orderitem_set.all())
+            # Un solo SUM en SQL y un UPDATE solo de total_amount (no toca status ni otros campos)
+            items_total = self.orderitem_set.aggregate(
+                total=models.Sum('total_price')
+            )['total'] or Decimal('0.00')
+            Order.objects.filter(pk=self.pk).update(total_amount=items_total)
+            ResourceVersion.bump('orders')
             
             # total_amount es solo la comida, los envases están separados
             self.total_amount = items_total
-            logger.info(f"🧮 BACKEND - calculate_total() ORDEN #{self.id}: Total calculado: {items_total}, Estado final: {self.status}")
-            super().save()  # Usar super() para evitar recursión
+            logger.info(f"🧮 BACKEND - calculate_total() ORDEN #{self.id}: Total calculado: {items_total}")
             return items_total
         return Decimal('0.00')
     
+    @staticmethod
+    def recalculate_totals(order_ids):
+        """Recalcula total_amount de varias órdenes con un único UPDATE agregado"""
+        items_total = OrderItem.objects.filter(
+            order_id=models.OuterRef('pk')
+        ).values('order_id').annotate(total=models.Sum('total_price')).values('total')
+        Order.objects.filter(pk__in=order_ids).update(
+            total_amount=Coalesce(
+                models.Subquery(items_total, output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+                models.Value(Decimal('0.00'))
+            )
+        )
+        ResourceVersion.bump('orders')
+    
+    @staticmethod
+    def mark_total_dirty(order_id):
+        """Marca la orden para recalcular su total una sola vez al commit de la transacción"""
+        pending_order_totals.mark(order_id)
+    
     def get_containers_total(self):
         """Obtiene el total de envases por separado"""
         if self.pk:
@@ -255,6 +274,141 @@ class Order(models.Model):
             for order_item in self.orderitem_set.all():
                 order_item.recipe.consume_ingredients()
 
+    @transaction.atomic
+    def add_items(self, items_data):
+        """
+        Crea en lote los items de un pedido (un OrderItem con quantity=1 por unidad).
+
+        Valida el pedido completo antes de escribir, inserta todos los items con
+        bulk_create, descuenta el stock una sola vez por ingrediente y por envase,
+        recalcula el total una vez y agenda la impresión al confirmar la transacción.
+
+        items_data: lista de dicts con recipe (instancia o id), quantity, notes,
+        is_takeaway, has_taper y selected_container (id opcional).
+        """
+        import logging
+        from collections import defaultdict
+        logger = logging.getLogger(__name__)
+
+        if not items_data:
+            raise ValidationError("La orden debe tener al menos un item")
+
+        lines = []
+        for item_data in items_data:
+            recipe = item_data.get('recipe')
+            try:
+                quantity = int(item_data.get('quantity') or 1)
+            except (TypeError, ValueError):
+                raise ValidationError("La cantidad debe ser un número entero")
+            if quantity < 1:
+                raise ValidationError("La cantidad debe ser mayor a 0")
+            lines.append({
+                'recipe_id': getattr(recipe, 'pk', recipe),
+                'quantity': quantity,
+                'notes': item_data.get('notes') or '',
+                'is_takeaway': bool(item_data.get('is_takeaway', False)),
+                'has_taper': bool(item_data.get('has_taper', False)),
+                'container_id': item_data.get('selected_container'),
+            })
+
+        # 1. Validar recetas y stock de ingredientes para el pedido completo
+        recipes = Recipe.objects.select_related('printer').prefetch_related(
+            'recipeitem_set__ingredient'
+        ).in_bulk({line['recipe_id'] for line in lines})
+
+        ingredients = {}
+        required_stock = defaultdict(Decimal)
+        for line in lines:
+            recipe = recipes.get(line['recipe_id'])
+            if recipe is None:
+                raise ValidationError(f"La receta {line['recipe_id']} no existe")
+            if not recipe.is_active:
+                raise ValidationError(f"La receta {recipe.name} no está disponible")
+            for recipe_item in recipe.recipeitem_set.all():
+                ingredients[recipe_item.ingredient_id] = recipe_item.ingredient
+                required_stock[recipe_item.ingredient_id] += recipe_item.quantity * line['quantity']
+
+        for ingredient_id, required in required_stock.items():
+            ingredient = ingredients[ingredient_id]
+            if ingredient.current_stock < required:
+                raise ValidationError(
+                    f"No hay suficiente stock de {ingredient.name}. "
+                    f"Disponible: {ingredient.current_stock}, Requerido: {required}"
+                )
+
+        # 2. Validar envases (SIEMPRE 1 envase por OrderItem para llevar)
+        containers = Container.objects.select_for_update().filter(is_active=True).in_bulk(
+            {line['container_id'] for line in lines if line['container_id']}
+        )
+        required_containers = defaultdict(int)
+        for line in lines:
+            if line['container_id'] and line['container_id'] not in containers:
+                raise ValidationError("El envase seleccionado no existe o no está disponible")
+            if line['has_taper'] and line['container_id']:
+                required_containers[line['container_id']] += line['quantity']
+
+        for container_id, required in required_containers.items():
+            container = containers[container_id]
+            if container.stock < required:
+                raise ValidationError(
+                    f"Stock insuficiente de {container.name}. "
+                    f"Disponible: {container.stock}, Requerido: {required}"
+                )
+
+        # 3. Insertar todos los items en una sola operación
+        new_items = []
+        container_sales = []
+        for line in lines:
+            recipe = recipes[line['recipe_id']]
+            container = containers.get(line['container_id'])
+            for _ in range(line['quantity']):
+                new_items.append(OrderItem(
+                    order=self,
+                    recipe=recipe,
+                    unit_price=recipe.base_price,
+                    total_price=recipe.base_price,
+                    quantity=1,  # Cada OrderItem tiene quantity=1
+                    notes=line['notes'],
+                    is_takeaway=line['is_takeaway'],
+                    has_taper=line['has_taper'],
+                    container=container,
+                    container_price=container.price if container else None,
+                ))
+                if container and line['has_taper']:
+                    container_sales.append(ContainerSale(
+                        order=self,
+                        container=container,
+                        quantity=1,
+                        unit_price=container.price,
+                        total_price=container.price,
+                    ))
+        OrderItem.objects.bulk_create(new_items)
+        if container_sales:
+            ContainerSale.objects.bulk_create(container_sales)
+        # bulk_create no emite signals
+        ResourceVersion.bump('orders')
+        report_cache.mark_day_dirty(self.created_at)
+
+        # 4. Descontar stock con un UPDATE condicional para ingredientes y otro para envases
+        Ingredient.adjust_stock(
+            {pk: -required for pk, required in required_stock.items()}, 'CONSUME', f"order:{self.pk}"
+        )
+        Container.adjust_stock({pk: -required for pk, required in required_containers.items()})
+
+        # 5. Recalcular el total una sola vez
+        self.calculate_total()
+
+        # 6. Encolar impresión de los items con impresora asignada
+        from .print_dispatcher import print_dispatcher
+        print_jobs = print_dispatcher.enqueue(new_items)
+        for item in new_items:
+            events.publish_order_item(item, 'created')
+
+        logger.info(f"🧾 BACKEND - Order #{self.id}: {len(new_items)} items creados en lote "
+                    f"({len(required_stock)} ingredientes, {len(container_sales)} envases, "
+                    f"{len(print_jobs)} por imprimir)")
+        return new_items
+
     def update_status(self, new_status, cancellation_reason=None):
         """Actualiza el estado de la orden y timestamps"""
         self.status = new_status
@@ -290,6 +444,7 @@ class Order(models.Model):
         
         # Save the order after updating status and timestamps
         self.save()
+        events.publish_order(self, 'status')
 
     def check_and_update_order_status(self):
         """Actualizar estado de Order basado en el estado de sus items activos"""
@@ -324,10 +479,13 @@ class Order(models.Model):
             logger.info(f"🔄 CHECK_ORDER_STATUS - Order #{self.id}: Cambiando de CREATED a PREPARING")
             self.status = 'PREPARING'
             self.save()
+            events.publish_order(self, 'status')
             logger.info(f"✅ CHECK_ORDER_STATUS - Order #{self.id}: Actualizado a PREPARING")
     
     def get_total_paid(self):
-        """Obtiene el total pagado de la orden"""
+        """Obtiene el total pagado de la orden (usa los payments precargados si existen)"""
+        if 'payments' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum((payment.amount for payment in self.payments.all()), Decimal('0.00'))
         return self.payments.aggregate(
             total=models.Sum('amount')
         )['total'] or Decimal('0.00')
@@ -339,12 +497,40 @@ class Order(models.Model):
     def is_fully_paid(self):
         """Verifica si la orden está completamente pagada"""
         return self.get_pending_amount() <= Decimal('0.00')
+
+    @classmethod
+    def table_active_orders_prefetch(cls):
+        """Precarga `table.active_orders` para el TableSerializer anidado sin una consulta por orden"""
+        return models.Prefetch(
+            'table__order_set',
+            queryset=cls.objects.filter(status__in=Table.ACTIVE_ORDER_STATUSES),
+            to_attr='active_orders'
+        )
+
+    def get_totals(self):
+        """
+        Totales de la orden calculados una sola vez: envases, total general, pagado y pendiente.
+        Con `container_sales` y `payments` precargados no ejecuta consultas.
+        """
+        containers_total = self.get_containers_total()
+        grand_total = self.total_amount + containers_total
+        total_paid = self.get_total_paid()
+        pending_amount = grand_total - total_paid
+        return {
+            'containers_total': containers_total,
+            'grand_total': grand_total,
+            'total_paid': total_paid,
+            'pending_amount': pending_amount,
+            'is_fully_paid': pending_amount <= Decimal('0.00'),
+        }
     
+    @transaction.atomic
     def delete(self, *args, **kwargs):
-        """Override delete para asegurar que el stock se restaure cuando se elimina la orden completa"""
-        # Los OrderItems se eliminan automáticamente por CASCADE, y cada uno restaura su stock
-        # No necesitamos hacer nada extra aquí, pero documentamos el comportamiento
-        super().delete(*args, **kwargs)
+        """Override delete para restaurar en lote el stock de todos los items de la orden"""
+        # Los OrderItems se eliminan por CASCADE; el signal por item queda desactivado
+        OrderItem.restore_stock(self.orderitem_set.all(), f"order:{self.pk}")
+        with bulk_stock_restore():
+            return super().delete(*args, **kwargs)
 
 
 class OrderItem(models.Model):
@@ -397,15 +583,40 @@ class OrderItem(models.Model):
     printed_at = models.DateTimeField(null=True, blank=True, verbose_name="Impreso en cocina")
     print_confirmed = models.BooleanField(default=False, help_text="Confirmación de que la impresión fue exitosa")
     cancellation_reason = models.TextField(blank=True, null=True, verbose_name="Motivo de cancelación")
+    # Último cambio del item; alimenta el cursor del tablero de cocina
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Estados visibles en el tablero de cocina
+    KITCHEN_ACTIVE_STATUSES = ['CREATED', 'PREPARING']
 
     class Meta:
         db_table = 'order_item'
         verbose_name = 'Item de Orden'
         verbose_name_plural = 'Items de Orden'
+        indexes = [
+            models.Index(fields=['status'], name='order_item_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.order} - {self.recipe.name}"
 
+    # Campos que determinan el total de la orden (ver Order.recalculate_totals)
+    ORDER_TOTAL_FIELDS = ('order_id', 'unit_price', 'quantity', 'container_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_total_fields = instance._order_total_fields()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._saved_total_fields = self._order_total_fields()
+
+    def _order_total_fields(self):
+        # __dict__ para no cargar campos diferidos
+        return tuple(self.__dict__.get(name) for name in self.ORDER_TOTAL_FIELDS)
+
     def save(self, *args, **kwargs):
         # Set unit price if not set
         if not self.unit_price:
@@ -421,8 +632,8 @@ class OrderItem(models.Model):
                 # SIEMPRE usar 1 envase por receta (independientemente de quantity)
                 container_quantity = 1
                 
-                # Descontar stock del container
-                self.container.update_stock(container_quantity, 'subtract')
+                # Descontar stock del container (UPDATE condicional, igual que add_items)
+                Container.adjust_stock({self.container_id: -container_quantity})
                 
                 # Crear ContainerSale correspondiente para tracking
                 # Usar una importación tardía para evitar circular
@@ -447,28 +658,43 @@ class OrderItem(models.Model):
         
         super().save(*args, **kwargs)
         
-        # IMPRESIÓN USB DIRECTA - Reemplaza PrintQueue
-        if is_creating and self.status == 'CREATED' and self.recipe.printer:
-            logger.info(f"🖨️ BACKEND - Impresión directa USB para OrderItem #{self.id}")
-            success = self._print_directly_to_usb()
-            if success:
-                # Si imprime exitosamente, confirmar impresión y cambiar automáticamente a PREPARING
-                self.print_confirmed = True
-                super().save(update_fields=['print_confirmed'])  # Solo guardar print_confirmed primero
-                # Usar update_status para cambiar a PREPARING con timestamp correcto
-                self.update_status('PREPARING')
-                logger.info(f"✅ BACKEND - OrderItem #{self.id} IMPRESO confirmado y cambiado a PREPARING")
-            else:
-                # Si falla la impresión, mantener en CREATED sin confirmar
-                self.print_confirmed = False
-                # Segundo save() SOLO para actualizar print_confirmed (sin force_insert)
-                super().save(update_fields=['print_confirmed'])
-                logger.warning(f"⚠️ BACKEND - OrderItem #{self.id} NO impreso, mantiene status CREATED")
+        # IMPRESIÓN ASÍNCRONA - Se encola y el hilo de la impresora la procesa tras el commit;
+        # al confirmarse la impresión el item pasa a PREPARING
+        if is_creating and self.status == 'CREATED' and self.recipe.printer_id:
+            from .print_dispatcher import print_dispatcher
+            print_dispatcher.enqueue([self])
+        if is_creating:
+            events.publish_order_item(self, 'created')
         
-        # Recalcular total de la orden después de guardar el item
-        if self.order_id:
-            logger.info(f"🧮 BACKEND - Recalculando total para Order #{self.order_id}")
-            self.order.calculate_total()
+        # Recalcular total de la orden al commit (una vez por transacción), solo en altas
+        # y cambios de precio, cantidad, envase u orden: los cambios de estado no lo afectan
+        previous = getattr(self, '_saved_total_fields', None)
+        self._saved_total_fields = self._order_total_fields()
+        if previous != self._saved_total_fields:
+            Order.mark_total_dirty(self.order_id)
+            if previous and previous[0] != self.order_id:
+                Order.mark_total_dirty(previous[0])
+
+    @classmethod
+    def kitchen_board_cursor(cls):
+        """
+        Cursor del tablero de cocina: último updated_at (µs desde epoch) y cantidad de
+        items activos. Cambia con cada alta, cambio de estado o eliminación de un item activo.
+        """
+        from django.db.models import Max
+        last_change = cls.objects.aggregate(last=Max('updated_at'))['last']
+        active_count = cls.objects.filter(status__in=cls.KITCHEN_ACTIVE_STATUSES).count()
+        micros = (last_change - KITCHEN_CURSOR_EPOCH) // timedelta(microseconds=1) if last_change else 0
+        return f"{micros}-{active_count}"
+
+    @staticmethod
+    def parse_kitchen_cursor(cursor):
+        """Devuelve el datetime del cursor, o None si el cursor no es válido"""
+        try:
+            micros = int(str(cursor).split('-')[0])
+        except (TypeError, ValueError):
+            return None
+        return KITCHEN_CURSOR_EPOCH + timedelta(microseconds=micros)
 
     def calculate_total_price(self):
         """Calcula el precio total del item basado en cantidad (sin guardar)"""
@@ -526,6 +752,7 @@ class OrderItem(models.Model):
             self._cancel_print_jobs()
         
         self.save()
+        events.publish_order_item(self, 'status')
         
         # Verificar si necesitamos actualizar el estado de la orden
         import logging
@@ -552,36 +779,105 @@ class OrderItem(models.Model):
         else:
             logger.warning(f"🔗 ORDERITEM_CHECK - Item #{self.id}: SIN ORDER ASOCIADO - No se puede actualizar")
     
+    def cancel(self, cancellation_reason=None):
+        """
+        Cancela el item al cancelar la orden completa (también si ya fue servido): descarta
+        sus impresiones pendientes y publica el cambio como OrderItem.update_status
+        """
+        self.status = 'CANCELED'
+        self.canceled_at = timezone.now()
+        if cancellation_reason:
+            self.cancellation_reason = cancellation_reason
+        self._cancel_print_jobs()
+        self.save()
+        events.publish_order_item(self, 'status')
+
     def _cancel_print_jobs(self):
         """Cancelar automáticamente trabajos de impresión cuando OrderItem se cancela"""
         import logging
         logger = logging.getLogger(__name__)
 
-        # NOTA: Con impresión USB directa, no hay cola de impresión (PrintJob) que cancelar
-        # Esta función se mantiene por compatibilidad pero no hace nada
-        logger.info(f"ℹ️ BACKEND - OrderItem #{self.id} cancelado - impresión USB directa no requiere cancelación de cola")
+        # Los trabajos ya tomados por el hilo (PRINTING) se descartan al verificar el estado del item
+        canceled = self.print_jobs.filter(status='PENDING').update(status='CANCELED')
+        logger.info(f"🚫 BACKEND - OrderItem #{self.id} cancelado - {canceled} trabajos de impresión cancelados")
     
     def delete(self, *args, **kwargs):
         """Override delete para recalcular el total de la orden"""
-        order = self.order
+        order_id = self.order_id
         
         # La restauración de stock se maneja por el signal pre_delete
         # para asegurar que funcione también con eliminaciones CASCADE
         
-        super().delete(*args, **kwargs)
-        # Recalcular total de la orden después de eliminar el item
-        if order and order.pk:  # Verificar que la orden aún existe
-            order.calculate_total()
+        result = super().delete(*args, **kwargs)
+        # Recalcular total de la orden al commit (si la orden ya no existe no actualiza nada)
+        Order.mark_total_dirty(order_id)
+        return result
     
+    @staticmethod
+    def restore_stock(queryset, reference=''):
+        """
+        Restaura el stock de todos los items del queryset: agrega en memoria las cantidades
+        por ingrediente y por envase y las aplica con un UPDATE condicional por modelo
+        """
+        from collections import Counter, defaultdict
+
+        recipe_quantities = Counter()
+        container_quantities = Counter()
+        for recipe_id, quantity, container_id in queryset.values_list('recipe_id', 'quantity', 'container_id'):
+            recipe_quantities[recipe_id] += quantity
+            if container_id:
+                # SIEMPRE restaurar 1 envase por receta (independientemente de quantity)
+                container_quantities[container_id] += 1
+
+        ingredient_quantities = defaultdict(Decimal)
+        for recipe_id, ingredient_id, quantity in RecipeItem.objects.filter(
+            recipe_id__in=recipe_quantities
+        ).values_list('recipe_id', 'ingredient_id', 'quantity'):
+            ingredient_quantities[ingredient_id] += quantity * recipe_quantities[recipe_id]
+
+        Ingredient.adjust_stock(ingredient_quantities, 'RESTORE', reference)
+        Container.adjust_stock(container_quantities)
+
+    @staticmethod
+    @transaction.atomic
+    def delete_restoring_stock(queryset, reference=''):
+        """Elimina los items del queryset restaurando el stock en lote en lugar de hacerlo por item"""
+        order_ids = set(queryset.values_list('order_id', flat=True))
+        OrderItem.restore_stock(queryset, reference)
+        with bulk_stock_restore():
+            result = queryset.delete()
+        # QuerySet.delete no llama a OrderItem.delete: recalcular los totales al commit
+        pending_order_totals.mark(*order_ids)
+        return result
+
     def restore_ingredients_stock(self):
         """Restaura el stock de ingredientes cuando se elimina el order item"""
-        for recipe_item in self.recipe.recipeitem_set.all():
-            # Restaurar stock multiplicado por la cantidad del order item
-            quantity_to_restore = recipe_item.quantity * self.quantity
-            recipe_item.ingredient.update_stock(quantity_to_restore, 'add')
+        # Restaurar stock multiplicado por la cantidad del order item
+        Ingredient.adjust_stock({
+            recipe_item.ingredient_id: recipe_item.quantity * self.quantity
+            for recipe_item in self.recipe.recipeitem_set.all()
+        }, 'RESTORE', f"order:{self.order_id}")
     
+    @staticmethod
+    def with_paid_amount(queryset):
+        """Anota `paid_amount_sum` (SUM de PaymentItem) en SQL para evitar una consulta por item"""
+        paid = PaymentItem.objects.filter(
+            order_item=models.OuterRef('pk')
+        ).values('order_item').annotate(total=models.Sum('amount')).values('total')
+        return queryset.annotate(paid_amount_sum=Coalesce(
+            models.Subquery(paid, output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+            models.Value(Decimal('0.00'))
+        ))
+
+    @classmethod
+    def serialization_queryset(cls):
+        """Queryset para OrderItemSerializer: relaciones usadas y monto pagado anotado"""
+        return cls.with_paid_amount(cls.objects.select_related('recipe__group', 'container'))
+
     def get_paid_amount(self):
         """Obtiene el monto pagado de este item"""
+        if hasattr(self, 'paid_amount_sum'):
+            return self.paid_amount_sum
         from django.db.models import Sum
         return PaymentItem.objects.filter(
             order_item=self
@@ -617,124 +913,101 @@ class OrderItem(models.Model):
         
         return item_total
     
-    def _print_directly_to_usb(self):
-        """Impresión directa a USB - Reemplaza PrintQueue"""
-        import logging
-        logger = logging.getLogger(__name__)
+    # Comandos ESC/POS para formateo de texto de restaurante
+    ESC_LARGE_TEXT = "\x1B\x21\x30"     # Texto grande (doble ancho y alto)
+    ESC_MEDIUM_TEXT = "\x1B\x21\x20"    # Texto mediano (doble alto)
+    ESC_NORMAL_TEXT = "\x1B\x21\x00"    # Texto normal
+    ESC_BOLD_ON = "\x1B\x45\x01"        # Negrita ON
+    ESC_BOLD_OFF = "\x1B\x45\x00"       # Negrita OFF
+    ESC_CENTER = "\x1B\x61\x01"         # Centrar texto
+    ESC_LEFT = "\x1B\x61\x00"           # Alinear izquierda
+    ESC_CUT = "\x1D\x56\x00"            # Comando de corte ESC/POS
+    LABEL_MAX_CHARS_PER_LINE = 25
 
-        try:
-            # NO imprimir items cancelados
-            if self.status == 'CANCELED':
-                logger.info(f"🚫 USB-PRINT - Skipping print for CANCELED OrderItem {self.id}")
-                return False
-
-            if not self.recipe.printer or not self.recipe.printer.usb_port:
-                logger.error(f"❌ USB-PRINT - OrderItem #{self.id}: Sin impresora o puerto USB configurado")
-                return False
-
-            logger.info(f"🖨️ USB-PRINT - Imprimiendo OrderItem #{self.id} ({self.recipe.name})")
-            logger.info(f"🖨️ USB-PRINT - Puerto: {self.recipe.printer.usb_port}")
+    def _generate_label_content(self):
+        """Genera el contenido de la etiqueta para imprimir en formato ticket profesional"""
+        return self.build_ticket_content([self])
 
-            # Generar contenido ESC/POS
-            content = self._generate_label_content()
+    @classmethod
+    def build_ticket_content(cls, items):
+        """
+        Genera un ticket por pedido con todos sus items: cabecera una sola vez,
+        un bloque por item y un único corte de papel al final
+        """
+        tickets = {}
+        for item in items:
+            tickets.setdefault(item.order_id, []).append(item)
 
-            # Escribir directamente al puerto USB
-            with open(self.recipe.printer.usb_port, 'wb') as printer:
-                printer.write(content.encode('utf-8'))
+        content = ""
+        for order_items in tickets.values():
+            # Espacio en blanco para el header (porta comanda) - más espacio
+            content += "\n\n"
+            content += order_items[0]._ticket_header()
+            for item in order_items:
+                content += item._ticket_item_block()
+            # Espacio adicional para el footer
+            content += "\n\n\n"
+            content += cls.ESC_CUT
+        return content
 
-            logger.info(f"✅ USB-PRINT - OrderItem #{self.id} impreso exitosamente a {self.recipe.printer.usb_port}")
-            return True
+    def _ticket_header(self):
+        """Cabecera del ticket: pedido, mesa, mozo y hora de creación"""
+        center_on = self.ESC_CENTER
+        medium_text, normal_text = self.ESC_MEDIUM_TEXT, self.ESC_NORMAL_TEXT
+        bold_on, bold_off = self.ESC_BOLD_ON, self.ESC_BOLD_OFF
 
-        except FileNotFoundError as e:
-            logger.error(f"❌ USB-PRINT - Puerto USB no encontrado para OrderItem #{self.id}: {self.recipe.printer.usb_port}")
-            logger.error(f"❌ USB-PRINT - Error: {e}")
-            return False
-        except PermissionError as e:
-            logger.error(f"❌ USB-PRINT - Sin permisos para escribir al puerto USB {self.recipe.printer.usb_port}")
-            logger.error(f"❌ USB-PRINT - Error: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"❌ USB-PRINT - Error imprimiendo OrderItem #{self.id}: {e}")
-            return False
-    
-    def _generate_label_content(self):
-        """Genera el contenido de la etiqueta para imprimir en formato ticket profesional"""
-        from django.utils import timezone
-        
-        # Comandos ESC/POS para formateo de texto de restaurante
-        # Tamaños de texto más grandes para tickets profesionales
-        large_text = "\x1B\x21\x30"         # Texto grande (doble ancho y alto)
-        medium_text = "\x1B\x21\x20"        # Texto mediano (doble alto)
-        double_width = "\x1B\x21\x20"       # Doble ancho
-        double_height = "\x1B\x21\x10"      # Doble altura
-        normal_text = "\x1B\x21\x00"        # Texto normal
-        
-        # Formateo adicional
-        bold_on = "\x1B\x45\x01"            # Negrita ON
-        bold_off = "\x1B\x45\x00"           # Negrita OFF
-        center_on = "\x1B\x61\x01"          # Centrar texto
-        left_align = "\x1B\x61\x00"         # Alinear izquierda
-        
-        # Obtener información del pedido
         # Usar la fecha/hora de creación del OrderItem convertida a zona horaria local
-        from django.utils import timezone
         local_tz = timezone.get_current_timezone()
         creation_time = self.created_at.astimezone(local_tz)
         table_number = self.order.table.table_number if self.order.table else 'LL'
         waiter_name = getattr(self.order, 'waiter', 'N/A') if hasattr(self.order, 'waiter') else 'N/A'
-        
-        # Construir el contenido del ticket con tamaños profesionales
-        # Espacio en blanco para el header (porta comanda) - más espacio
-        content = "\n\n"
-        
+
         # Título del pedido - MEDIANO y centrado
-        content += f"{center_on}{medium_text}{bold_on}PEDIDO {self.order.id}{bold_off}{normal_text}\n\n"
-        
+        content = f"{center_on}{medium_text}{bold_on}PEDIDO {self.order.id}{bold_off}{normal_text}\n\n"
+
         # Información de mesa y mozo - centrados
         content += f"{center_on}{medium_text}Principal - MESA {table_number}{normal_text}\n"
         content += f"{center_on}{medium_text}MOZO: {waiter_name}{normal_text}\n\n"
-        
+
         # Fecha y hora - centrado (formato consistente)
-        content += f"{center_on}{creation_time.strftime('%H:%M:%S')}      {creation_time.strftime('%d/%m/%Y')}\n{left_align}\n"
-        
+        content += f"{center_on}{creation_time.strftime('%H:%M:%S')}      {creation_time.strftime('%d/%m/%Y')}\n{self.ESC_LEFT}\n"
+
         # Línea separadora
         content += "================================\n\n"
-        
+        return content
+
+    def _ticket_item_block(self):
+        """Bloque del item: cantidad, receta, notas y extras en texto grande"""
+        large_text, normal_text = self.ESC_LARGE_TEXT, self.ESC_NORMAL_TEXT
+        bold_on, bold_off = self.ESC_BOLD_ON, self.ESC_BOLD_OFF
+        max_chars_per_line = self.LABEL_MAX_CHARS_PER_LINE
+
         # Item del pedido - tamaño GRANDE para máxima visibilidad
-        content += f"{large_text}{bold_on}X {self.quantity}{bold_off}{normal_text}\n"
-        
-        # Dividir nombre del recipe en palabras si es muy largo (máximo ~25 caracteres por línea)
-        recipe_name = self.recipe.name.upper()
-        max_chars_per_line = 25
-        recipe_lines = self._split_text_by_words(recipe_name, max_chars_per_line)
-        for line in recipe_lines:
+        content = f"{large_text}{bold_on}X {self.quantity}{bold_off}{normal_text}\n"
+
+        # Dividir nombre del recipe en palabras si es muy largo
+        for line in self._split_text_by_words(self.recipe.name.upper(), max_chars_per_line):
             content += f"{large_text}{bold_on}{line}{bold_off}{normal_text}\n"
         content += "\n"
-        
+
         # Notas si existen - tamaño GRANDE con división por palabras
         if self.notes:
             content += f"{large_text}NOTAS:{normal_text}\n"
-            notes_lines = self._split_text_by_words(self.notes.upper(), max_chars_per_line)
-            for line in notes_lines:
+            for line in self._split_text_by_words(self.notes.upper(), max_chars_per_line):
                 content += f"{large_text}{line}{normal_text}\n"
             content += "\n"
-        
+
         # Información adicional (takeaway, container, etc.) - tamaño GRANDE
         extras = []
         if self.is_takeaway:
             # Solo agregar DELIVERY si no está ya en las notas
             if not (self.notes and "delivery" in self.notes.lower()):
                 extras.append("DELIVERY")
-        if hasattr(self, 'container') and self.container:
+        if self.container_id:
             extras.append(f"ENVASE: {self.container.name.upper()}")
-        
+
         if extras:
             content += f"{large_text}{' | '.join(extras)}{normal_text}\n\n"
-        
-        # Espacio adicional para el footer
-        content += "\n\n\n"
-        content += "\x1D\x56\x00"  # Comando de corte ESC/POS
-        
         return content
     
     def _split_text_by_words(self, text, max_chars_per_line):
@@ -765,8 +1038,12 @@ class OrderItem(models.Model):
         return lines
 
     def retry_print(self):
-        """Método para reintentar impresión de un OrderItem"""
+        """
+        Reintenta la impresión de un OrderItem encolándolo de nuevo en el despachador;
+        el hilo de la impresora lo imprime y lo confirma (CREATED -> PREPARING)
+        """
         import logging
+        from .print_dispatcher import print_dispatcher
         logger = logging.getLogger(__name__)
 
         # Solo permitir reintento si no está confirmado o está en CREATED
@@ -778,25 +1055,15 @@ class OrderItem(models.Model):
             logger.warning(f"⚠️ RETRY-PRINT - OrderItem #{self.id} está cancelado, no se puede imprimir")
             return False, "Item cancelado"
 
-        logger.info(f"🔄 RETRY-PRINT - Reintentando impresión para OrderItem #{self.id}")
+        if not self.recipe.printer_id or not self.recipe.printer.usb_port:
+            logger.error(f"❌ RETRY-PRINT - OrderItem #{self.id}: Sin impresora o puerto USB configurado")
+            return False, "Sin impresora configurada"
 
-        # Intentar imprimir
-        success = self._print_directly_to_usb()
+        if not print_dispatcher.requeue(self):
+            return False, "El item se está imprimiendo"
 
-        if success:
-            # Marcar como impreso y cambiar a PREPARING si estaba en CREATED
-            self.print_confirmed = True
-            if self.status == 'CREATED':
-                self.status = 'PREPARING'
-                self.save(update_fields=['print_confirmed', 'status'])
-                logger.info(f"✅ RETRY-PRINT - OrderItem #{self.id} impreso y cambiado a PREPARING")
-            else:
-                self.save(update_fields=['print_confirmed'])
-                logger.info(f"✅ RETRY-PRINT - OrderItem #{self.id} impreso exitosamente")
-            return True, "Impresión exitosa"
-        else:
-            logger.error(f"❌ RETRY-PRINT - Falló reintento de impresión para OrderItem #{self.id}")
-            return False, "Error en la impresión"
+        logger.info(f"🔄 RETRY-PRINT - OrderItem #{self.id} encolado para reimpresión")
+        return True, "Impresión encolada"
 
 
 class Payment(models.Model):
@@ -839,7 +1106,11 @@ class Payment(models.Model):
         return f"Pago {self.order} - {self.payment_method} - {self.amount}"
 
     def save(self, *args, **kwargs):
+        is_creating = self.pk is None
         super().save(*args, **kwargs)
+        if is_creating:
+            events.publish_order(self.order, 'payment', payment_id=self.id,
+                                 payment_method=self.payment_method, amount=str(self.amount))
         # Verificar si la orden está completamente pagada
         self._check_order_fully_paid()
     
@@ -874,6 +1145,11 @@ class PaymentItem(models.Model):
     def __str__(self):
         return f"{self.payment} - {self.order_item}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # El monto pagado anotado en el item ya no es válido
+        self.order_item.__dict__.pop('paid_amount_sum', None)
+
 
 class ContainerSale(models.Model):
     """Venta de envases asociada a un pedido (separada del costo de los alimentos)"""
@@ -914,9 +1190,13 @@ class ContainerSale(models.Model):
         
         super().save(*args, **kwargs)
         
-        # Recalcular total de la orden incluyendo envases
-        if self.order:
-            self.order.calculate_total()
+        # Recalcular total de la orden al commit (una vez por transacción)
+        if self.order_id:
+            Order.mark_total_dirty(self.order_id)
+
+
+# Recálculo diferido de totales: una vez por transacción y por orden, al commit
+pending_order_totals = DeferredRecalculation(Order.recalculate_totals)
 
 
 # ELIMINADO: Modelos Cart y CartItem 
@@ -924,18 +1204,37 @@ class ContainerSale(models.Model):
 
 
 # Django Signals para manejo de stock
+_stock_restore_state = threading.local()
+
+
+@contextmanager
+def bulk_stock_restore():
+    """Desactiva restore_stock_signal mientras el stock se restaura en lote (OrderItem.restore_stock)"""
+    previous = getattr(_stock_restore_state, 'bulk', False)
+    _stock_restore_state.bulk = True
+    try:
+        yield
+    finally:
+        _stock_restore_state.bulk = previous
+
+
 @receiver(pre_delete, sender=OrderItem)
 def restore_stock_signal(sender, instance, **kwargs):
     """
     Signal que se ejecuta antes de eliminar un OrderItem.
     Restaura el stock de ingredientes y containers incluso cuando se elimina por CASCADE.
+    Es el camino de respaldo para eliminaciones individuales; los borrados de órdenes y
+    querysets restauran en lote (ver OrderItem.delete_restoring_stock).
     """
+    if getattr(_stock_restore_state, 'bulk', False):
+        return
     try:
         # 1. Restaurar stock de ingredientes
-        for recipe_item in instance.recipe.recipeitem_set.all():
-            # Restaurar stock multiplicado por la cantidad del order item
-            quantity_to_restore = recipe_item.quantity * instance.quantity
-            recipe_item.ingredient.update_stock(quantity_to_restore, 'add')
+        # Restaurar stock multiplicado por la cantidad del order item
+        Ingredient.adjust_stock({
+            recipe_item.ingredient_id: recipe_item.quantity * instance.quantity
+            for recipe_item in instance.recipe.recipeitem_set.all()
+        }, 'RESTORE', f"order:{instance.order_id}")
         
         # 2. Restaurar stock de container si el OrderItem lo tiene
         if instance.container:
@@ -960,6 +1259,322 @@ def restore_container_stock_signal(sender, instance, **kwargs):
     pass
 
 
-# Cola de impresión para arquitectura robusta
-# REMOVIDO: PrintQueue model - Ya no se usa con impresión USB directa
+# Cola de impresión persistente procesada por hilos por impresora (ver print_dispatcher)
+class PrintJob(models.Model):
+    """Trabajo de impresión de un OrderItem en su impresora"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pendiente'),
+        ('PRINTING', 'Imprimiendo'),
+        ('DONE', 'Impreso'),
+        ('FAILED', 'Fallido'),
+        ('CANCELED', 'Cancelado'),
+    ]
+
+    printer = models.ForeignKey(PrinterConfig, on_delete=models.CASCADE, related_name='print_jobs')
+    order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE, related_name='print_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    # Próximo intento (backoff) o, si está PRINTING, momento en que fue tomado por un hilo
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    printed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'print_job'
+        ordering = ['created_at', 'id']
+        verbose_name = 'Trabajo de Impresión'
+        verbose_name_plural = 'Trabajos de Impresión'
+        indexes = [
+            models.Index(fields=['printer', 'status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"PrintJob #{self.id} - OrderItem #{self.order_item_id} ({self.status})"
+
+
+# Rollups diarios de ventas pagadas para el dashboard financiero.
+# El día operativo es DATE(order.created_at) en UTC, igual que dashboard_operativo_view.
+class DailyOrderRollup(models.Model):
+    """Totales por día de las órdenes pagadas"""
+    day = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        db_table = 'daily_order_rollup'
+        ordering = ['day']
+        verbose_name = 'Resumen Diario de Órdenes'
+        verbose_name_plural = 'Resúmenes Diarios de Órdenes'
+
+    def __str__(self):
+        return f"{self.day}: {self.orders} órdenes - {self.revenue}"
+
+    @staticmethod
+    def day_range(day):
+        """Rango [inicio, fin) en UTC del día operativo"""
+        start = datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc)
+        return start, start + timedelta(days=1)
+
+    @staticmethod
+    def _aggregate(items, payments):
+        """
+        GROUP BY de los items y pagos dados con la forma de cada rollup:
+        (filas por día, filas por día × hora × categoría × plato, filas por día × método)
+        """
+        items = items.annotate(day=TruncDate('order__created_at', tzinfo=dt_timezone.utc))
+        revenue = models.Sum(
+            models.F('total_price') * models.F('quantity'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+        order_rows = items.values('day').annotate(
+            orders_count=models.Count('order_id', distinct=True),
+            items_count=models.Count('id'),
+            quantity_sum=models.Sum('quantity'),
+            revenue_sum=revenue,
+        ).order_by()
+        sales_rows = items.annotate(
+            hour=ExtractHour('order__created_at', tzinfo=dt_timezone.utc),
+            category=Coalesce('recipe__group__name', models.Value('Sin Categoría')),
+        ).values('day', 'hour', 'recipe_id', 'recipe__group_id', 'category', 'recipe__name').annotate(
+            items_count=models.Count('id'),
+            quantity_sum=models.Sum('quantity'),
+            revenue_sum=revenue,
+            last_unit_price=models.Max('unit_price'),
+        ).order_by()
+        payment_rows = payments.annotate(
+            day=TruncDate('order__created_at', tzinfo=dt_timezone.utc)
+        ).values('day', 'payment_method').annotate(
+            amount_sum=models.Sum('amount'),
+            payments_count=models.Count('id'),
+        ).order_by()
+        return order_rows, sales_rows, payment_rows
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild_days(days):
+        """
+        Recalcula los tres rollups (órdenes, ventas y pagos) de los días indicados con un
+        GROUP BY por tabla sobre las órdenes pagadas de esos días y reemplaza sus filas.
+        Lo usa rebuild_sales_rollups; los cambios de las órdenes se aplican con apply_orders
+        """
+        days = sorted(set(days))
+        if not days:
+            return
+        in_days = models.Q()
+        for day in days:
+            start, end = DailyOrderRollup.day_range(day)
+            in_days |= models.Q(order__created_at__gte=start, order__created_at__lt=end)
+
+        order_rows, sales_rows, payment_rows = DailyOrderRollup._aggregate(
+            OrderItem.objects.filter(in_days, order__status='PAID'),
+            Payment.objects.filter(in_days, order__status='PAID'),
+        )
+
+        DailyOrderRollup.objects.filter(day__in=days).delete()
+        DailySalesRollup.objects.filter(day__in=days).delete()
+        DailyPaymentRollup.objects.filter(day__in=days).delete()
+        DailyOrderRollup.objects.bulk_create([
+            DailyOrderRollup(
+                day=row['day'], orders=row['orders_count'], items=row['items_count'],
+                quantity=row['quantity_sum'] or 0, revenue=row['revenue_sum'] or Decimal('0.00')
+            )
+            for row in order_rows
+        ])
+        DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(
+                day=row['day'], hour=row['hour'], recipe_id=row['recipe_id'],
+                category_id=row['recipe__group_id'] or 0,
+                category_name=row['category'], recipe_name=row['recipe__name'],
+                items=row['items_count'], quantity=row['quantity_sum'] or 0,
+                revenue=row['revenue_sum'] or Decimal('0.00'), unit_price=row['last_unit_price']
+            )
+            for row in sales_rows
+        ], batch_size=500)
+        DailyPaymentRollup.objects.bulk_create([
+            DailyPaymentRollup(
+                day=row['day'], payment_method=row['payment_method'],
+                amount=row['amount_sum'], count=row['payments_count']
+            )
+            for row in payment_rows
+        ])
+        # Los reportes cacheados de estos días se leyeron de los rollups anteriores
+        transaction.on_commit(lambda: report_cache.invalidate_days(days))
+
+    @staticmethod
+    def _add_delta(model, key, sign, amounts, **defaults):
+        """
+        Suma (sign=1) o resta (sign=-1) `amounts` a la fila `key` del rollup con una
+        actualización atómica; al sumar crea la fila si no existe
+        """
+        updated = model.objects.filter(**key).update(**{
+            field: models.F(field) + sign * amount for field, amount in amounts.items()
+        }, **defaults)
+        if not updated and sign > 0:
+            model.objects.create(**key, **amounts, **defaults)
+
+    @staticmethod
+    @transaction.atomic
+    def apply_orders(order_ids, sign, include_payments=True):
+        """
+        Suma (sign=1, la orden pasó a PAID) o resta (sign=-1, dejó de estar PAID) a los
+        rollups de su día la contribución de las órdenes indicadas: el mismo GROUP BY de
+        rebuild_days restringido a esas órdenes, sin recorrer el resto del día
+        """
+        order_rows, sales_rows, payment_rows = DailyOrderRollup._aggregate(
+            OrderItem.objects.filter(order_id__in=order_ids),
+            Payment.objects.filter(order_id__in=order_ids),
+        )
+        days = set()
+        for row in order_rows:
+            days.add(row['day'])
+            DailyOrderRollup._add_delta(DailyOrderRollup, {'day': row['day']}, sign, {
+                'orders': row['orders_count'], 'items': row['items_count'],
+                'quantity': row['quantity_sum'] or 0, 'revenue': row['revenue_sum'] or Decimal('0.00'),
+            })
+        for row in sales_rows:
+            # La fila se identifica por la receta: los nombres solo se muestran y se
+            # actualizan con cada delta, así renombrar no deja restas sin su fila
+            DailyOrderRollup._add_delta(DailySalesRollup, {
+                'day': row['day'], 'hour': row['hour'], 'recipe_id': row['recipe_id'],
+            }, sign, {
+                'items': row['items_count'], 'quantity': row['quantity_sum'] or 0,
+                'revenue': row['revenue_sum'] or Decimal('0.00'),
+            }, category_id=row['recipe__group_id'] or 0, category_name=row['category'],
+                recipe_name=row['recipe__name'], unit_price=row['last_unit_price'])
+        if include_payments:
+            for row in payment_rows:
+                days.add(row['day'])
+                DailyPaymentRollup.apply_delta(row['day'], row['payment_method'], sign, row['amount_sum'], row['payments_count'])
+        DailyOrderRollup.discard_empty(days)
+
+    @staticmethod
+    def discard_empty(days):
+        """Elimina las filas que quedaron en cero tras restar (como si nunca hubieran existido)"""
+        DailyOrderRollup.objects.filter(day__in=days, orders__lte=0).delete()
+        DailySalesRollup.objects.filter(day__in=days, items__lte=0).delete()
+        DailyPaymentRollup.objects.filter(day__in=days, count__lte=0).delete()
+
+
+class DailySalesRollup(models.Model):
+    """Ventas pagadas por día × hora × plato (con su categoría)"""
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    # Id de la receta sin FK: el rollup no debe impedir eliminar recetas
+    recipe_id = models.PositiveIntegerField(default=0)
+    category_id = models.PositiveIntegerField(default=0)
+    category_name = models.CharField(max_length=100)
+    recipe_name = models.CharField(max_length=100)
+    items = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        db_table = 'daily_sales_rollup'
+        verbose_name = 'Resumen Diario de Ventas'
+        verbose_name_plural = 'Resúmenes Diarios de Ventas'
+        indexes = [
+            models.Index(fields=['day', 'category_name']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'hour', 'recipe_id'], name='daily_sales_rollup_unique_recipe_hour'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.hour}h {self.recipe_name}: {self.quantity}"
+
+
+class DailyPaymentRollup(models.Model):
+    """Pagos de órdenes pagadas por día × método de pago"""
+    day = models.DateField()
+    payment_method = models.CharField(max_length=10, choices=Payment.PAYMENT_METHOD_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'daily_payment_rollup'
+        verbose_name = 'Resumen Diario de Pagos'
+        verbose_name_plural = 'Resúmenes Diarios de Pagos'
+        unique_together = ['day', 'payment_method']
+
+    def __str__(self):
+        return f"{self.day} {self.payment_method}: {self.amount}"
+
+    @staticmethod
+    def apply_delta(day, payment_method, sign, amount, count=1):
+        DailyOrderRollup._add_delta(
+            DailyPaymentRollup, {'day': day, 'payment_method': payment_method}, sign,
+            {'amount': amount, 'count': count}
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def apply_payment(payment, sign):
+        """
+        Pagos agregados o eliminados sobre órdenes ya pagadas. El pago que completa la orden
+        se guarda antes de que pase a PAID y entra con el resto de la orden
+        """
+        created_at = Order.objects.filter(
+            pk=payment.order_id, status='PAID'
+        ).values_list('created_at', flat=True).first()
+        if created_at:
+            day = created_at.astimezone(dt_timezone.utc).date()
+            DailyPaymentRollup.apply_delta(day, payment.payment_method, sign, payment.amount)
+            DailyOrderRollup.discard_empty([day])
+
+
+# Mantenimiento incremental de rollups: cada orden que entra o sale de PAID suma o resta
+# su contribución dentro de la misma transacción (si se revierte, el delta también)
+@receiver(pre_save, sender=Order)
+def remember_status_for_rollup(sender, instance, **kwargs):
+    instance._rollup_previous_status = Order.objects.filter(
+        pk=instance.pk
+    ).values_list('status', flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Order)
+def apply_rollup_on_order_save(sender, instance, **kwargs):
+    """Las órdenes que pasan a PAID suman a los rollups de su día; las que lo dejan (cancelación) restan"""
+    was_paid = getattr(instance, '_rollup_previous_status', None) == 'PAID'
+    is_paid = instance.status == 'PAID'
+    instance._rollup_previous_status = instance.status
+    if is_paid != was_paid:
+        DailyOrderRollup.apply_orders([instance.pk], 1 if is_paid else -1)
+
+
+@receiver(pre_delete, sender=Order)
+def apply_rollup_on_order_delete(sender, instance, **kwargs):
+    # Los pagos se eliminan en cascada antes que la orden y restan por su cuenta
+    if instance.status == 'PAID':
+        DailyOrderRollup.apply_orders([instance.pk], -1, include_payments=False)
+
+
+@receiver(post_save, sender=Payment)
+def apply_rollup_on_payment_save(sender, instance, created, **kwargs):
+    if created:
+        DailyPaymentRollup.apply_payment(instance, 1)
+
+
+@receiver(post_delete, sender=Payment)
+def apply_rollup_on_payment_delete(sender, instance, **kwargs):
+    DailyPaymentRollup.apply_payment(instance, -1)
+
+
+# Invalidación de la caché de reportes de dashboards (operation/report_cache.py):
+# cualquier cambio de estado, pago o cancelación afecta el día operativo de la orden
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_reports_on_order_change(sender, instance, **kwargs):
+    report_cache.mark_day_dirty(instance.created_at)
+
 
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_reports_on_order_detail_change(sender, instance, **kwargs):
+    report_cache.pending_report_orders.mark(instance.order_id)
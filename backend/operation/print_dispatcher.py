@@ -0,0 +1,311 @@
+"""
+Despachador asíncrono de impresión USB
+
+Los OrderItem con impresora asignada se encolan como PrintJob dentro de la misma
+transacción que los crea. Tras el commit se despierta un hilo por PrinterConfig
+que toma los trabajos pendientes, agrupa los items en un solo ticket por pedido,
+escribe al puerto (/dev/usb/lp*, o un archivo/FIFO en pruebas) y confirma la
+impresión pasando los items a PREPARING. Si la escritura falla el trabajo se
+reintenta con backoff exponencial hasta PRINT_DISPATCHER['MAX_ATTEMPTS']; el
+reintento manual (OrderItem.retry_print) vuelve a encolarlo.
+
+Un trabajo que quedó en PRINTING más de STALE_SECONDS (el proceso cayó a mitad de la
+escritura) pudo haber salido impreso: no se reenvía, queda FAILED para reintento manual.
+Al primer request del proceso web se inician los hilos de las impresoras con trabajos
+PENDING (encolados antes de un reinicio).
+
+Con PRINT_DISPATCHER['THREADS'] = False no se inician hilos en el proceso web;
+los trabajos se procesan con `python manage.py run_print_dispatcher`.
+"""
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'THREADS': True,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 2,
+    'MAX_BACKOFF_SECONDS': 60,
+    'BATCH_SIZE': 20,
+    'POLL_SECONDS': 30,
+    # Un trabajo en PRINTING más antiguo que esto se considera abandonado (proceso caído)
+    'STALE_SECONDS': 120,
+}
+
+
+def dispatcher_setting(name):
+    return getattr(settings, 'PRINT_DISPATCHER', {}).get(name, DEFAULTS[name])
+
+
+class PrinterWorker(threading.Thread):
+    """Hilo dedicado a una impresora: procesa su cola hasta vaciarla y espera"""
+
+    def __init__(self, dispatcher, printer_id):
+        super().__init__(name=f'print-worker-{printer_id}', daemon=True)
+        self.dispatcher = dispatcher
+        self.printer_id = printer_id
+        self.wakeup = threading.Event()
+
+    def run(self):
+        logger.info(f"🖨️ PRINT-DISPATCHER - Hilo iniciado para impresora #{self.printer_id}")
+        while True:
+            self.wakeup.clear()
+            try:
+                processed = self.dispatcher.process_pending(self.printer_id)
+                wait = 0 if processed else self.dispatcher.seconds_until_next_job(self.printer_id)
+            except Exception as e:
+                logger.error(f"❌ PRINT-DISPATCHER - Error en hilo de impresora #{self.printer_id}: {e}")
+                wait = dispatcher_setting('POLL_SECONDS')
+            finally:
+                close_old_connections()
+            if wait:
+                self.wakeup.wait(wait)
+
+
+class PrintDispatcher:
+    """Cola de impresión persistente con un hilo por impresora"""
+
+    def __init__(self):
+        self._workers = {}
+        self._workers_lock = threading.Lock()
+        self._device_locks = {}
+
+    # ------------------------------------------------------------------ encolado
+
+    def enqueue(self, order_items):
+        """
+        Crea un PrintJob por cada item con impresora y despierta los hilos al commit.
+        Los items deben traer `recipe` cargada. Devuelve los trabajos creados.
+        """
+        from .models import PrintJob
+
+        jobs = [
+            PrintJob(printer_id=item.recipe.printer_id, order_item=item)
+            for item in order_items
+            if item.recipe.printer_id and item.status == 'CREATED'
+        ]
+        if not jobs:
+            return []
+        PrintJob.objects.bulk_create(jobs)
+
+        printer_ids = {job.printer_id for job in jobs}
+        transaction.on_commit(lambda: self.notify(printer_ids))
+        return jobs
+
+    def requeue(self, order_item):
+        """
+        Reintento manual: vuelve a PENDING, sin backoff ni intentos acumulados, los trabajos
+        PENDING o FAILED del item (o crea uno si no tiene) y despierta el hilo al commit.
+        La impresión la hace el hilo de la impresora, nunca el request. Devuelve False si
+        el item ya se está imprimiendo
+        """
+        from .models import PrintJob
+
+        printer_id = order_item.recipe.printer_id
+        jobs = order_item.print_jobs.filter(printer_id=printer_id)
+        if jobs.filter(status='PRINTING').exists():
+            return False
+        requeued = jobs.filter(status__in=['PENDING', 'FAILED']).update(
+            status='PENDING', attempts=0, next_attempt_at=timezone.now(), claim_token='', last_error=''
+        )
+        if not requeued:
+            PrintJob.objects.create(printer_id=printer_id, order_item=order_item)
+        transaction.on_commit(lambda: self.notify({printer_id}))
+        return True
+
+    def notify(self, printer_ids):
+        """Despierta (o inicia) el hilo de cada impresora indicada"""
+        if not dispatcher_setting('THREADS'):
+            return
+        for printer_id in printer_ids:
+            self._get_worker(printer_id).wakeup.set()
+
+    def start_pending_workers(self, **kwargs):
+        """
+        Inicia el hilo de cada impresora con trabajos PENDING; sin esto esperarían al
+        próximo trabajo encolado para esa impresora. Se ejecuta una vez por proceso, en su
+        primer request (ver OperationConfig.ready): ni AppConfig.ready ni los management
+        commands deben consultar la base de datos
+        """
+        from .models import PrintJob
+
+        request_started.disconnect(self.start_pending_workers, dispatch_uid='print_dispatcher_startup')
+        if not dispatcher_setting('THREADS'):
+            return
+        printer_ids = set(
+            PrintJob.objects.filter(status='PENDING').values_list('printer_id', flat=True).distinct()
+        )
+        if printer_ids:
+            logger.info(f"🖨️ PRINT-DISPATCHER - Reanudando {len(printer_ids)} impresoras con trabajos pendientes")
+            self.notify(printer_ids)
+
+    def _get_worker(self, printer_id):
+        with self._workers_lock:
+            worker = self._workers.get(printer_id)
+            if worker is None or not worker.is_alive():
+                worker = self._workers[printer_id] = PrinterWorker(self, printer_id)
+                worker.start()
+            return worker
+
+    # --------------------------------------------------------------- procesamiento
+
+    def _due_jobs(self, printer_id, now):
+        from .models import PrintJob
+
+        return PrintJob.objects.filter(printer_id=printer_id, status='PENDING', next_attempt_at__lte=now)
+
+    def fail_stale(self, printer_id, now):
+        """
+        Trabajos en PRINTING abandonados: el ticket pudo haber salido, así que no se
+        reenvían; quedan FAILED para reintento manual. Devuelve cuántos marcó
+        """
+        from .models import PrintJob
+
+        stale_before = now - timedelta(seconds=dispatcher_setting('STALE_SECONDS'))
+        failed = PrintJob.objects.filter(
+            printer_id=printer_id, status='PRINTING', next_attempt_at__lte=stale_before
+        ).update(
+            status='FAILED', claim_token='',
+            last_error='Impresión interrumpida: verificar el ticket y reintentar manualmente'
+        )
+        if failed:
+            logger.warning(f"⚠️ PRINT-DISPATCHER - Impresora #{printer_id}: {failed} trabajos interrumpidos "
+                           f"marcados como FAILED")
+        return failed
+
+    def process_pending(self, printer_id):
+        """
+        Procesa un lote de trabajos vencidos de la impresora. Seguro entre procesos:
+        cada lote se reclama con un token antes de imprimir. Devuelve cuántos trabajos tomó.
+        """
+        from .models import PrintJob
+
+        now = timezone.now()
+        stale = self.fail_stale(printer_id, now)
+        due_ids = list(
+            self._due_jobs(printer_id, now).order_by('created_at', 'id')
+            .values_list('id', flat=True)[:dispatcher_setting('BATCH_SIZE')]
+        )
+        if not due_ids:
+            return stale
+
+        token = uuid.uuid4().hex
+        self._due_jobs(printer_id, now).filter(id__in=due_ids).update(
+            status='PRINTING', claim_token=token, next_attempt_at=now
+        )
+        jobs = list(
+            PrintJob.objects.filter(claim_token=token, status='PRINTING')
+            .select_related('printer', 'order_item__recipe', 'order_item__order__table', 'order_item__container')
+            .order_by('created_at', 'id')
+        )
+        if not jobs:
+            return stale
+
+        # Items cancelados mientras esperaban en cola no se imprimen
+        canceled = [job.id for job in jobs if job.order_item.status == 'CANCELED']
+        if canceled:
+            PrintJob.objects.filter(id__in=canceled).update(status='CANCELED')
+        jobs = [job for job in jobs if job.id not in canceled]
+        if not jobs:
+            return stale + len(canceled)
+
+        printer = jobs[0].printer
+        items = [job.order_item for job in jobs]
+        try:
+            from .models import OrderItem
+            self.write_to_device(printer, OrderItem.build_ticket_content(items))
+        except Exception as e:
+            self._schedule_retry(jobs, e)
+        else:
+            self._confirm_printed(printer, jobs, items)
+        return stale + len(jobs) + len(canceled)
+
+    def seconds_until_next_job(self, printer_id):
+        """Tiempo de espera hasta el próximo reintento programado (acotado por POLL_SECONDS)"""
+        from .models import PrintJob
+
+        poll = dispatcher_setting('POLL_SECONDS')
+        next_attempt = PrintJob.objects.filter(
+            printer_id=printer_id, status='PENDING'
+        ).order_by('next_attempt_at').values_list('next_attempt_at', flat=True).first()
+        if next_attempt is None:
+            return poll
+        return min(poll, max((next_attempt - timezone.now()).total_seconds(), 0.1))
+
+    def write_to_device(self, printer, content):
+        """Escribe al puerto de la impresora; un solo escritor por dispositivo"""
+        with self._device_lock(printer.id):
+            with open(printer.usb_port, 'wb') as device:
+                device.write(content.encode('utf-8'))
+
+    def _device_lock(self, printer_id):
+        with self._workers_lock:
+            return self._device_locks.setdefault(printer_id, threading.Lock())
+
+    def _schedule_retry(self, jobs, error):
+        from .models import PrintJob
+
+        now = timezone.now()
+        max_attempts = dispatcher_setting('MAX_ATTEMPTS')
+        base = dispatcher_setting('BACKOFF_SECONDS')
+        cap = dispatcher_setting('MAX_BACKOFF_SECONDS')
+        for job in jobs:
+            job.attempts += 1
+            job.last_error = str(error)
+            job.claim_token = ''
+            if job.attempts >= max_attempts:
+                job.status = 'FAILED'
+            else:
+                job.status = 'PENDING'
+                job.next_attempt_at = now + timedelta(seconds=min(base * 2 ** (job.attempts - 1), cap))
+        PrintJob.objects.bulk_update(jobs, ['attempts', 'last_error', 'claim_token', 'status', 'next_attempt_at'])
+
+        failed = sum(1 for job in jobs if job.status == 'FAILED')
+        logger.error(f"❌ PRINT-DISPATCHER - {printer_label(jobs[0].printer)}: error imprimiendo "
+                     f"{len(jobs)} items ({failed} agotaron reintentos): {error}")
+
+    def _confirm_printed(self, printer, jobs, items):
+        """Confirma la impresión: trabajos DONE e items CREATED -> PREPARING"""
+        from .models import Order, OrderItem, PrintJob
+
+        now = timezone.now()
+        item_ids = [item.id for item in items]
+        PrintJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status='DONE', printed_at=now, claim_token='', last_error=''
+        )
+        OrderItem.objects.filter(id__in=item_ids).update(print_confirmed=True, printed_at=now, updated_at=now)
+        OrderItem.objects.filter(id__in=item_ids, status='CREATED').update(
+            status='PREPARING', preparing_at=now, updated_at=now
+        )
+        printer.update_last_used()
+
+        from config.models import ResourceVersion
+        ResourceVersion.bump('orders')
+
+        # Los update() no emiten señales: invalidar los reportes del día de estas órdenes
+        from .report_cache import pending_report_orders
+        pending_report_orders.mark(*{item.order_id for item in items})
+
+        from . import events
+        for item in OrderItem.objects.filter(id__in=item_ids).select_related('recipe'):
+            events.publish_order_item(item, 'printed')
+
+        for order in Order.objects.filter(id__in={item.order_id for item in items}):
+            order.check_and_update_order_status()
+        logger.info(f"✅ PRINT-DISPATCHER - {printer_label(printer)}: {len(items)} items impresos "
+                    f"y cambiados a PREPARING")
+
+
+def printer_label(printer):
+    return f"{printer.name} ({printer.usb_port})"
+
+
+print_dispatcher = PrintDispatcher()
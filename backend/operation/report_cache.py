@@ -0,0 +1,109 @@
+"""
+Caché de reportes de dashboards con invalidación por día operativo
+
+Cada reporte se guarda en django.core.cache bajo una clave (dashboard, parámetros) más
+el token de versión de cada día operativo que cubre (DATE(order.created_at) en UTC, igual
+que las vistas de dashboard). Los cambios de órdenes, items y pagos renuevan al commit el
+token de su día, así solo dejan de servirse los reportes que incluyen ese día.
+
+Los días ya cerrados no cambian salvo por esos eventos y se guardan sin expiración; los
+reportes que incluyen el día en curso expiran tras DASHBOARD_CACHE['TODAY_SECONDS'].
+
+La caché es el alias DASHBOARD_CACHE['CACHE'] (en disco por defecto, compartida por los
+procesos web del mismo host; con varios hosts usar una caché de red). Las escrituras que no
+pasan por save()/delete() ni por los lotes que marcan sus días (QuerySet.update, SQL directo)
+no invalidan nada: un día en curso se corrige al expirar TODAY_SECONDS, uno cerrado solo con
+un PAST_SECONDS finito.
+"""
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+
+from backend.unit_of_work import DeferredRecalculation
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TODAY_SECONDS': 30,
+    'PAST_SECONDS': None,  # None: sin expiración
+}
+
+KEY_PREFIX = 'dashboard_report'
+
+
+def cache_setting(name):
+    return getattr(settings, 'DASHBOARD_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[cache_setting('CACHE')]
+
+
+def _day_key(day):
+    return f'{KEY_PREFIX}:day:{day.isoformat()}'
+
+
+def day_tokens(days):
+    """
+    Tokens de versión de los días indicados. Un día sin token (nuevo o expulsado de la
+    caché) recibe uno nuevo, así nunca coincide con un reporte guardado antes.
+    """
+    cache = get_cache()
+    keys = [_day_key(day) for day in days]
+    tokens = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in tokens}
+    if missing:
+        for key, token in missing.items():
+            cache.add(key, token, None)
+        tokens = {**missing, **cache.get_many(list(missing)), **tokens}
+    return [tokens[key] for key in keys]
+
+
+def invalidate_days(days):
+    """Renueva el token de los días: los reportes que los incluyen dejan de servirse"""
+    get_cache().set_many({_day_key(day): uuid.uuid4().hex for day in days}, None)
+
+
+def invalidate_orders(order_ids):
+    from .models import Order
+
+    invalidate_days({
+        created_at.astimezone(dt_timezone.utc).date()
+        for created_at in Order.objects.filter(pk__in=order_ids).values_list('created_at', flat=True)
+    })
+
+
+# Invalidación diferida: una vez por transacción, al commit (los datos ya son visibles)
+pending_report_days = DeferredRecalculation(invalidate_days)
+pending_report_orders = DeferredRecalculation(invalidate_orders)
+
+
+def mark_day_dirty(created_at):
+    """Marca el día operativo de una orden para invalidar sus reportes al commit"""
+    if created_at:
+        pending_report_days.mark(created_at.astimezone(dt_timezone.utc).date())
+
+
+def cached_report(dashboard, params, start_date, end_date, build):
+    """
+    Devuelve el reporte de `dashboard` para `params` desde la caché o lo construye con
+    `build()` y lo guarda. `start_date`/`end_date` delimitan los días operativos que cubre.
+    """
+    if not cache_setting('ENABLED'):
+        return build()
+
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    versions = hashlib.md5(':'.join(day_tokens(days)).encode()).hexdigest()
+    key = f"{KEY_PREFIX}:{dashboard}:{':'.join(str(value) for value in params)}:{versions}"
+
+    cache = get_cache()
+    report = cache.get(key)
+    if report is None:
+        report = build()
+        today = datetime.now(dt_timezone.utc).date()
+        timeout = cache_setting('TODAY_SECONDS') if end_date >= today else cache_setting('PAST_SECONDS')
+        cache.set(key, report, timeout)
+    return report
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from django.db import transaction
+from django.db.models import Prefetch
+from django.core.exceptions import ValidationError as DjangoValidationError
 from .models import Order, OrderItem, Payment, PaymentItem, ContainerSale
 from config.serializers import TableSerializer, ContainerSerializer
 from inventory.serializers import RecipeSerializer, IngredientSerializer
@@ -40,19 +42,26 @@ class OrderItemSerializer(serializers.ModelSerializer):
     
     # get_customizations_count removed - OrderItemIngredient functionality deprecated
     
+    def _get_oldest_pending_item_id(self):
+        """
+        Id del item más antiguo que aún está CREATED (globalmente). Se consulta una vez
+        por serialización: el contexto es compartido por todos los serializers anidados.
+        """
+        from operation.models import OrderItem
+
+        if 'oldest_pending_item_id' not in self.context:
+            self.context['oldest_pending_item_id'] = OrderItem.objects.filter(
+                status='CREATED'
+            ).order_by('created_at').values_list('id', flat=True).first()
+        return self.context['oldest_pending_item_id']
+
     def get_elapsed_time_minutes(self, obj):
         from django.utils import timezone
-        from operation.models import OrderItem
         
         now = timezone.now()
         
-        # Buscar el item más antiguo que aún está CREATED (globalmente)
-        oldest_pending_item = OrderItem.objects.filter(
-            status='CREATED'
-        ).order_by('created_at').first()
-        
-        # Solo el item más antiguo debe contar tiempo
-        if oldest_pending_item and oldest_pending_item.id == obj.id:
+        # Solo el item más antiguo que aún está CREATED debe contar tiempo
+        if self._get_oldest_pending_item_id() == obj.id:
             elapsed = now - obj.created_at
             return int(elapsed.total_seconds() / 60)
         
@@ -111,7 +120,56 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return float(obj.get_total_with_container())
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class KitchenBoardItemSerializer(serializers.ModelSerializer):
+    """Item del tablero de cocina - solo campos directos, sin consultas por item"""
+    recipe_name = serializers.CharField(source='recipe.name', read_only=True)
+    recipe_preparation_time = serializers.IntegerField(source='recipe.preparation_time', read_only=True)
+    order_id = serializers.IntegerField(read_only=True)
+    order_table = serializers.CharField(source='order.table.table_number', read_only=True)
+    order_zone = serializers.CharField(source='order.table.zone.name', read_only=True)
+    waiter = serializers.CharField(source='order.waiter', read_only=True)
+    container_name = serializers.CharField(source='container.name', read_only=True, default=None)
+
+    class Meta:
+        model = OrderItem
+        fields = [
+            'id', 'order_id', 'order_table', 'order_zone', 'waiter',
+            'recipe', 'recipe_name', 'recipe_preparation_time', 'quantity', 'notes', 'status',
+            'is_takeaway', 'has_taper', 'container_name', 'print_confirmed',
+            'created_at', 'preparing_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class OrderTotalsMixin:
+    """
+    Campos de totales de la orden calculados una sola vez por orden (Order.get_totals)
+    en lugar de una consulta por campo
+    """
+
+    def _get_order_totals(self, obj):
+        cache = self.__dict__.setdefault('_order_totals', {})
+        if obj.pk not in cache:
+            cache[obj.pk] = obj.get_totals()
+        return cache[obj.pk]
+
+    def get_total_paid(self, obj):
+        return self._get_order_totals(obj)['total_paid']
+
+    def get_pending_amount(self, obj):
+        return self._get_order_totals(obj)['pending_amount']
+
+    def get_is_fully_paid(self, obj):
+        return self._get_order_totals(obj)['is_fully_paid']
+
+    def get_containers_total(self, obj):
+        return self._get_order_totals(obj)['containers_total']
+
+    def get_grand_total(self, obj):
+        return self._get_order_totals(obj)['grand_total']
+
+
+class OrderSerializer(OrderTotalsMixin, serializers.ModelSerializer):
     table_number = serializers.CharField(source='table.table_number', read_only=True)
     zone_name = serializers.CharField(source='table.zone.name', read_only=True)
     waiter_name = serializers.CharField(source='waiter', read_only=True)
@@ -138,22 +196,9 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
     
     def get_items_count(self, obj):
+        if 'orderitem_set' in getattr(obj, '_prefetched_objects_cache', {}):
+            return len(obj.orderitem_set.all())
         return obj.orderitem_set.count()
-    
-    def get_total_paid(self, obj):
-        return obj.get_total_paid()
-    
-    def get_pending_amount(self, obj):
-        return obj.get_pending_amount()
-    
-    def get_is_fully_paid(self, obj):
-        return obj.is_fully_paid()
-    
-    def get_containers_total(self, obj):
-        return obj.get_containers_total()
-    
-    def get_grand_total(self, obj):
-        return obj.get_grand_total()
 
 
 class ContainerSaleSerializer(serializers.ModelSerializer):
@@ -192,8 +237,8 @@ class OrderDetailSerializerV1(OrderSerializer):
             'table',
             'table__zone'
         ).prefetch_related(
-            'orderitem_set__recipe',
-            'orderitem_set__recipe__group',
+            Prefetch('orderitem_set', queryset=OrderItem.serialization_queryset()),
+            Order.table_active_orders_prefetch(),
             'container_sales__container',
             'payments__payment_items__order_item'
         )
@@ -229,77 +274,32 @@ class OrderItemCreateSerializer(serializers.ModelSerializer):
         return data
     
     def validate_recipe(self, value):
+        # El stock se valida para el pedido completo en Order.add_items()
         if not value.is_active:
             raise serializers.ValidationError("Esta receta no está disponible")
         
-        if not value.has_sufficient_stock():
-            raise serializers.ValidationError("No hay suficiente stock para esta receta")
-        
+        return value
+
+    def validate_quantity(self, value):
+        if value < 1:
+            raise serializers.ValidationError("La cantidad debe ser mayor a 0")
         return value
     
     @transaction.atomic
     def create(self, validated_data):
         """
-        Crear UN OrderItem con la quantity original especificada.
-        Mantiene la quantity como está en el frontend (1 item con quantity=N).
+        Crea un OrderItem individual (quantity=1) por cada unidad solicitada
+        usando la creación en lote de Order.add_items().
         """
-        print(f"🔧 OrderItemCreateSerializer.create() INICIADO")
-        print(f"🔧 validated_data recibido: {validated_data}")
-        
-        selected_container_id = validated_data.pop('selected_container', None)
-        quantity = validated_data.pop('quantity', 1)  # Remover quantity del validated_data
-        
-        print(f"🔧 quantity extraído: {quantity}")
-        print(f"🔧 selected_container_id extraído: {selected_container_id}")
-        
-        # Obtener order del contexto
         order = self.context.get('order')
         if not order:
             raise serializers.ValidationError("Order not found in context")
         
-        # Pre-validar stock de container si aplica
-        container = None
-        container_price = None
-        if validated_data.get('has_taper', False) and selected_container_id:
-            from config.models import Container
-            try:
-                container = Container.objects.select_for_update().get(
-                    id=selected_container_id, is_active=True
-                )
-                if container.stock < quantity:
-                    raise serializers.ValidationError(
-                        f"Stock insuficiente de {container.name}. "
-                        f"Disponible: {container.stock}, Requerido: {quantity}"
-                    )
-                container_price = container.price
-            except Container.DoesNotExist:
-                raise serializers.ValidationError(
-                    "El envase seleccionado no existe o no está disponible"
-                )
-        
-        # Crear OrderItems individuales para cada cantidad solicitada
-        print(f"🔧 CREANDO {quantity} OrderItems individuales para recipe={validated_data.get('recipe', 'Unknown')}")
-        print(f"🔧 Order: {order}, Container: {container}, Container_price: {container_price}")
-        
-        created_items = []
-        for i in range(quantity):
-            order_item = OrderItem.objects.create(
-                order=order,
-                container=container,
-                container_price=container_price,
-                quantity=1,  # Cada OrderItem tiene quantity=1
-                **validated_data
-            )
-            created_items.append(order_item)
-            print(f"🔧 OrderItem {i+1}/{quantity} creado: ID={order_item.id}, quantity={order_item.quantity}")
-            
-            # Calcular el precio total para este item
-            order_item.calculate_total_price()
-            
-            # Consumir ingredientes para este item
-            validated_data['recipe'].consume_ingredients()
+        try:
+            created_items = order.add_items([validated_data])
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
         
-        print(f"🔧 OrderItemCreateSerializer.create() COMPLETADO - Creados {len(created_items)} OrderItems")
         # Retornar el primer item (aunque se crearon varios)
         return created_items[0] if created_items else None
 
@@ -313,12 +313,15 @@ class OrderItemForCreateSerializer(serializers.ModelSerializer):
         fields = ['recipe', 'notes', 'quantity', 'is_takeaway', 'has_taper', 'selected_container']
     
     def validate_recipe(self, value):
+        # El stock se valida para el pedido completo en Order.add_items()
         if not value.is_active:
             raise serializers.ValidationError("Esta receta no está disponible")
         
-        if not value.has_sufficient_stock():
-            raise serializers.ValidationError("No hay suficiente stock para esta receta")
-        
+        return value
+
+    def validate_quantity(self, value):
+        if value < 1:
+            raise serializers.ValidationError("La cantidad debe ser mayor a 0")
         return value
 
 
@@ -351,90 +354,20 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         """
         Crear orden con transacción atómica para garantizar consistencia.
         Si cualquier operación falla, toda la transacción se revierte.
+        Los items se crean en lote con Order.add_items().
         """
         items_data = validated_data.pop('items')
         
-        # DEBUG: Log before creating order
-        print(f"🔍 DEBUG ORDER CREATE - validated_data: {validated_data}")
-        print(f"🔍 DEBUG ORDER CREATE - items count: {len(items_data)}")
-        
-        # Crear orden
         order = Order.objects.create(**validated_data)
-        
-        # DEBUG: Log after creating order
-        print(f"🔍 DEBUG ORDER CREATED - Order ID: {order.id}, Status: {order.status}, Table: {order.table_id}")
-        
-        # Pre-validar stock de containers antes de crear items
-        containers_to_reduce = []
-        for item_data in items_data:
-            selected_container_id = item_data.get('selected_container')
-            quantity = item_data.get('quantity', 1)
-            has_taper = item_data.get('has_taper', False)
-            
-            if has_taper and selected_container_id:
-                from config.models import Container
-                try:
-                    container = Container.objects.select_for_update().get(
-                        id=selected_container_id, is_active=True
-                    )
-                    if container.stock < quantity:
-                        raise serializers.ValidationError(
-                            f"Stock insuficiente de {container.name}. "
-                            f"Disponible: {container.stock}, Requerido: {quantity}"
-                        )
-                    containers_to_reduce.append((container, quantity))
-                except Container.DoesNotExist:
-                    raise serializers.ValidationError(
-                        f"El envase seleccionado no existe o no está disponible"
-                    )
-        
-        # Crear items y containers (ya validado el stock)
-        for item_data in items_data:
-            selected_container_id = item_data.pop('selected_container', None)
-            quantity = item_data.pop('quantity', 1)  # Remover quantity del item_data
-            
-            # Obtener información del container para este item
-            container = None
-            container_price = None
-            if selected_container_id:
-                # Buscar container usando Django ORM
-                try:
-                    from config.models import Container
-                    container = Container.objects.get(id=selected_container_id, is_active=True)
-                    container_price = container.price
-                except Container.DoesNotExist:
-                    container = None
-                    container_price = None
-            
-            # Crear OrderItems individuales (uno por cada cantidad)
-            created_items = []
-            for i in range(quantity):
-                order_item = OrderItem.objects.create(
-                    order=order, 
-                    container=container,
-                    container_price=container_price,
-                    quantity=1,  # Cada OrderItem tiene quantity=1
-                    **item_data
-                )
-                created_items.append(order_item)
-            
-            # Crear ContainerSale si aplica (usar el primer item como referencia)
-            first_item = created_items[0] if created_items else None
-            if first_item and first_item.has_taper and selected_container_id:
-                container = next(
-                    (c for c, q in containers_to_reduce if c.id == selected_container_id), 
-                    None
-                )
-                # DESHABILITADO: El descuento de stock y ContainerSale ahora se maneja automáticamente en OrderItem.save()
-                pass
-        
-        # Consumir ingredientes
-        order.consume_ingredients_on_creation()
+        try:
+            order.add_items(items_data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
         
         return order
 
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderDetailSerializer(OrderTotalsMixin, serializers.ModelSerializer):
     """Serializer detallado para GET y UPDATE de órdenes"""
     table = TableSerializer(read_only=True)
     items = serializers.SerializerMethodField()
@@ -465,7 +398,7 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'preparing_at', 'served_at', 'paid_at']
     
     def get_items(self, obj):
-        return OrderItemSerializer(obj.orderitem_set.all(), many=True).data
+        return OrderItemSerializer(obj.orderitem_set.all(), many=True, context=self.context).data
     
     def get_payments(self, obj):
         # Retornar datos básicos de payments sin usar PaymentSerializer
@@ -480,25 +413,11 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             for payment in obj.payments.all()
         ]
     
-    def get_total_paid(self, obj):
-        return obj.get_total_paid()
-    
-    def get_pending_amount(self, obj):
-        return obj.get_pending_amount()
-    
-    def get_is_fully_paid(self, obj):
-        return obj.is_fully_paid()
-    
-    def get_containers_total(self, obj):
-        return obj.get_containers_total()
-    
-    def get_grand_total(self, obj):
-        return obj.get_grand_total()
-    
     @staticmethod
     def setup_eager_loading(queryset):
         return queryset.select_related('table__zone').prefetch_related(
-            'orderitem_set__recipe__group',
+            Prefetch('orderitem_set', queryset=OrderItem.serialization_queryset()),
+            Order.table_active_orders_prefetch(),
             'container_sales__container',
             'payments__payment_items__order_item__recipe'
         )
@@ -521,7 +440,7 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         
         if items_data is not None:
             # Eliminar items existentes
-            instance.orderitem_set.all().delete()
+            OrderItem.delete_restoring_stock(instance.orderitem_set.all(), f"order:{instance.pk}")
             instance.container_sales.all().delete()
             
             # Crear nuevos items
@@ -0,0 +1,103 @@
+"""
+Server-Sent Events: /api/v1/sse/<stream>/ empuja los cambios publicados en el bus
+(operation/events.py) a las pantallas de cocina y mozos.
+
+Servido por ASGI (backend/asgi.py) cada conexión es una corrutina en el event loop.
+Bajo WSGI (runserver) funciona igual pero ocupa un hilo por conexión, por eso el
+stream se cierra tras EVENT_STREAM['SYNC_MAX_SECONDS'] y el cliente reconecta.
+"""
+import json
+import logging
+import time
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models.signals import post_delete
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .events import (
+    STREAM_EVENTS, AsyncSubscription, ThreadSubscription, get_broker, publish, stream_setting,
+)
+
+logger = logging.getLogger(__name__)
+
+RETRY_MS = 3000
+
+
+def _format_event(event_type, data, event_id=None):
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{message}event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def _heartbeat():
+    return _format_event('heartbeat', {'timestamp': timezone.now().isoformat()})
+
+
+async def _async_stream(stream_type):
+    broker = get_broker()
+    subscription = broker.subscribe(AsyncSubscription(stream_type))
+    heartbeat = stream_setting('HEARTBEAT_SECONDS')
+    try:
+        yield f"retry: {RETRY_MS}\n\n" + _heartbeat()
+        while not subscription.overflowed:
+            event = await subscription.get(heartbeat)
+            if event is None:
+                yield _heartbeat()
+            else:
+                yield _format_event(event['event'], event['data'], event['id'])
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def _sync_stream(stream_type):
+    broker = get_broker()
+    subscription = broker.subscribe(ThreadSubscription(stream_type))
+    heartbeat = stream_setting('HEARTBEAT_SECONDS')
+    deadline = time.monotonic() + stream_setting('SYNC_MAX_SECONDS')
+    try:
+        yield f"retry: {RETRY_MS}\n\n" + _heartbeat()
+        while not subscription.overflowed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = subscription.get(min(heartbeat, remaining))
+            if event is None:
+                yield _heartbeat()
+            else:
+                yield _format_event(event['event'], event['data'], event['id'])
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@require_GET
+def sse_stream(request, stream_type):
+    """Stream SSE de cambios de órdenes ('orders') o solo de items de cocina ('kitchen')"""
+    if stream_type not in STREAM_EVENTS:
+        return JsonResponse({'error': f'Stream no válido: {stream_type}'}, status=404)
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Autenticación requerida'}, status=401)
+
+    logger.info(f"📡 SSE - Conexión '{stream_type}' de {request.user.username} "
+                f"(user_id={request.GET.get('user_id', 'anonymous')})")
+    stream = _async_stream(stream_type) if isinstance(request, ASGIRequest) else _sync_stream(stream_type)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Evitar buffering en Nginx
+    return response
+
+
+def _order_item_deleted(sender, instance, **kwargs):
+    publish('order_item_delete', {'id': instance.id, 'order_id': instance.order_id})
+
+
+def _order_deleted(sender, instance, **kwargs):
+    publish('order_delete', {'id': instance.id, 'table_id': instance.table_id})
+
+
+def setup_signals():
+    """Publica las eliminaciones (incluidas las CASCADE) en el bus de eventos"""
+    from .models import Order, OrderItem
+
+    post_delete.connect(_order_item_deleted, sender=OrderItem, dispatch_uid='sse_order_item_delete')
+    post_delete.connect(_order_deleted, sender=Order, dispatch_uid='sse_order_delete')
@@ -0,0 +1,472 @@
+import os
+import threading
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.signals import request_started
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.unit_of_work import DeferredRecalculation
+from config.models import Container, Table, Unit, Zone
+from inventory.models import Group, Ingredient, Recipe, RecipeItem
+from operation.models import (
+    DailyOrderRollup, DailyPaymentRollup, DailySalesRollup, Order, OrderItem, Payment, PaymentItem, PrinterConfig, PrintJob,
+)
+from operation.dashboard_aggregator import DashboardAggregator
+from operation.events import ThreadSubscription, get_broker
+from operation.print_dispatcher import dispatcher_setting, print_dispatcher
+
+
+@pytest.fixture
+def api_client(db):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user('mesero'))
+    return client
+
+
+@pytest.fixture
+def recipe(db):
+    unit = Unit.objects.create(name='kg')
+    ingredient = Ingredient.objects.create(
+        unit=unit, name='Arroz', unit_price=Decimal('2.00'), current_stock=1000
+    )
+    recipe = Recipe.objects.create(
+        group=Group.objects.create(name='Fondos'), name='Arroz chaufa',
+        base_price=Decimal('10.00'), preparation_time=10
+    )
+    RecipeItem.objects.create(recipe=recipe, ingredient=ingredient, quantity=Decimal('1.00'))
+    return recipe
+
+
+def create_orders(count, recipe, items_per_order=3):
+    zone = Zone.objects.create(name='Salón')
+    for number in range(count):
+        order = Order.objects.create(table=Table.objects.create(zone=zone, table_number=f'M{number}'), waiter='mesero')
+        for _ in range(items_per_order):
+            OrderItem.objects.create(order=order, recipe=recipe)
+
+
+@pytest.mark.parametrize('url', ['/api/v1/orders/', '/api/v1/order-items/'])
+@pytest.mark.parametrize('count', [1, 10])
+def test_oldest_pending_item_is_queried_once_per_response(api_client, recipe, url, count):
+    create_orders(count, recipe)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url)
+
+    assert response.status_code == 200
+    oldest_pending_lookups = [
+        query['sql'] for query in queries
+        if '"status" = \'CREATED\'' in query['sql'] and 'ORDER BY' in query['sql'] and 'LIMIT 1' in query['sql']
+    ]
+    assert len(oldest_pending_lookups) == 1
+
+
+
+@pytest.mark.parametrize('count', [1, 10])
+def test_order_item_list_annotates_paid_amounts(api_client, recipe, django_assert_num_queries, count):
+    create_orders(count, recipe)
+    item = OrderItem.objects.order_by('pk').first()
+    payment = Payment.objects.create(order=item.order, payment_method='CASH', amount=Decimal('4.00'))
+    PaymentItem.objects.create(payment=payment, order_item=item, amount=Decimal('4.00'))
+
+    # Items con receta, grupo, envase y monto pagado anotado + item pendiente más antiguo
+    with django_assert_num_queries(2):
+        response = api_client.get('/api/v1/order-items/')
+
+    assert response.status_code == 200
+    paid = {row['id']: (row['paid_amount'], row['pending_amount'], row['is_fully_paid']) for row in response.data}
+    assert len(paid) == count * 3
+    assert paid.pop(item.pk) == (Decimal('4.00'), Decimal('6.00'), False)
+    assert set(paid.values()) == {(Decimal('0.00'), Decimal('10.00'), False)}
+
+
+@pytest.mark.parametrize('count', [1, 10])
+def test_order_list_computes_totals_once_per_order(
+    api_client, recipe, django_assert_num_queries, django_capture_on_commit_callbacks, monkeypatch, count
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        create_orders(count, recipe)
+    order = Order.objects.order_by('pk').first()
+    Payment.objects.create(order=order, payment_method='CASH', amount=Decimal('12.00'))
+    get_totals = Order.get_totals
+    calls = []
+    monkeypatch.setattr(Order, 'get_totals', lambda self: calls.append(self.pk) or get_totals(self))
+
+    # ResourceVersion + órdenes + items, envases y pagos precargados + item pendiente más antiguo
+    with django_assert_num_queries(6):
+        response = api_client.get('/api/v1/orders/')
+
+    assert response.status_code == 200
+    assert sorted(calls) == sorted(row['id'] for row in response.data)
+    totals = {
+        row['id']: (row['grand_total'], row['total_paid'], row['pending_amount'], row['is_fully_paid'], row['items_count'])
+        for row in response.data
+    }
+    assert totals.pop(order.pk) == (Decimal('30.00'), Decimal('12.00'), Decimal('18.00'), False, 3)
+    assert set(totals.values()) <= {(Decimal('30.00'), Decimal('0.00'), Decimal('30.00'), False, 3)}
+
+
+@pytest.mark.parametrize('quantity', [-3, 0, 'dos'])
+def test_invalid_item_quantity_is_rejected_without_touching_stock(api_client, recipe, quantity):
+    create_orders(1, recipe, items_per_order=1)
+    order = Order.objects.get()
+    ingredient = recipe.recipeitem_set.get().ingredient
+    ingredient.refresh_from_db()
+    stock = ingredient.current_stock
+
+    for table in (order.table, Table.objects.create(zone=order.table.zone, table_number='M99')):
+        response = api_client.post('/api/v1/orders/', {
+            'table': table.pk, 'waiter': 'mesero', 'customer_name': 'Ana', 'party_size': 2,
+            'items': [{'recipe': recipe.pk, 'quantity': quantity}],
+        }, format='json')
+        assert response.status_code == 400, response.data
+
+    ingredient.refresh_from_db()
+    assert ingredient.current_stock == stock
+    assert OrderItem.objects.count() == 1
+
+
+def test_kitchen_board_since_cursor_returns_only_changes(api_client, recipe):
+    create_orders(1, recipe)
+    preparing, canceled, unchanged = OrderItem.objects.order_by('pk')
+    cursor = api_client.get('/api/v1/orders/kitchen_board/')['X-Kitchen-Cursor']
+
+    preparing.update_status('PREPARING')
+    response = api_client.post(f'/api/v1/order-items/{canceled.pk}/cancel/', {'cancellation_reason': 'Sin insumos'})
+    assert response.status_code == 200, response.data
+    delta = api_client.get('/api/v1/orders/kitchen_board/', {'since': cursor}).data
+
+    assert delta['changed'] is True
+    assert [item['id'] for group in delta['groups'] for item in group['items']] == [preparing.pk]
+    assert delta['removed_ids'] == [canceled.pk]
+    assert sorted(delta['active_ids']) == [preparing.pk, unchanged.pk]
+    assert api_client.get('/api/v1/orders/kitchen_board/', {'since': delta['cursor']}).data['changed'] is False
+
+
+def test_deferred_recalculation_runs_once_per_commit_and_drops_rolled_back_ids(db, django_capture_on_commit_callbacks):
+    flushed = []
+    pending = DeferredRecalculation(flushed.append)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        with pytest.raises(RuntimeError), transaction.atomic():
+            pending.mark(1)
+            raise RuntimeError
+        pending.mark(2, None)
+        pending.mark(3, 2)
+
+    assert len(callbacks) == 1
+    assert flushed == [{2, 3}]
+
+
+def test_order_total_is_recalculated_only_when_item_prices_change(recipe, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        create_orders(1, recipe, items_per_order=2)
+    order = Order.objects.get()
+    item = order.orderitem_set.first()
+    Order.objects.filter(pk=order.pk).update(total_amount=Decimal('99.00'))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        item.update_status('PREPARING')
+    order.refresh_from_db()
+    assert order.total_amount == Decimal('99.00')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        item.quantity = 3
+        item.save()
+    order.refresh_from_db()
+    assert order.total_amount == Decimal('40.00')
+
+def pay_order(order, *amounts):
+    """Paga la orden con un pago por monto (el último la deja PAID)"""
+    for method, amount in zip(['CASH', 'CARD', 'YAPE_PLIN'], amounts):
+        Payment.objects.create(order=order, payment_method=method, amount=Decimal(amount))
+    order.refresh_from_db()
+
+
+@pytest.mark.parametrize('source', ['view', 'rollups'])
+def test_financial_report_from_views_and_rollups(api_client, recipe, django_capture_on_commit_callbacks, source):
+    with django_capture_on_commit_callbacks(execute=True):
+        create_orders(2, recipe, items_per_order=2)
+        paid, unpaid = Order.objects.order_by('pk')
+        pay_order(paid, '5.00', '15.00')
+
+    assert paid.status == 'PAID'
+    response = api_client.get('/api/v1/dashboard-financiero/report/', {
+        'period': 'today', 'date': paid.created_at.astimezone(dt_timezone.utc).date().isoformat(), 'source': source,
+    })
+
+    assert response.status_code == 200, response.data
+    assert response.data['summary'] == {
+        'total_orders': 1, 'total_revenue': 20.0, 'average_ticket': 20.0, 'total_items': 2,
+    }
+    assert response.data['category_breakdown'][0]['category'] == 'Fondos'
+    assert response.data['top_dishes'][0]['quantity'] == 2
+    assert {method['method']: method['amount'] for method in response.data['payment_methods']} == {
+        'CASH': 5.0, 'CARD': 15.0,
+    }
+
+
+def test_split_payments_count_in_every_dashboard(api_client, recipe):
+    create_orders(1, recipe, items_per_order=3)
+    order = Order.objects.get()
+    pay_order(order, '10.00', '12.50', '7.50')
+    day = order.created_at.astimezone(dt_timezone.utc).date()
+
+    operational = api_client.get('/api/v1/dashboard-operativo/report/', {'date': day.isoformat()})
+    financial = api_client.get('/api/v1/dashboard-financiero/report/', {
+        'period': 'today', 'date': day.isoformat(), 'source': 'view',
+    })
+    aggregator = DashboardAggregator().consume_payments([
+        ('PAID', 'CASH', Decimal('10.00'), 1), ('PAID', 'CARD', Decimal('12.50'), 1), ('PAID', 'CARD', Decimal('2.00'), 1),
+    ])
+
+    expected = {'CASH': (10.0, 1), 'CARD': (12.5, 1), 'YAPE_PLIN': (7.5, 1)}
+    for response in (operational, financial):
+        assert response.status_code == 200, response.data
+        assert {
+            method['method']: (method['amount'], method['transaction_count'])
+            for method in response.data['payment_methods']
+        } == expected
+    assert {method['method']: method['amount'] for method in aggregator.payment_methods()} == {'CASH': 10.0, 'CARD': 14.5}
+
+
+def test_split_payments_do_not_multiply_item_rows(api_client, recipe):
+    create_orders(1, recipe, items_per_order=3)
+    order = Order.objects.get()
+    pay_order(order, '10.00', '12.50', '7.50')
+
+    response = api_client.get('/api/v1/dashboard-financiero/report/', {
+        'period': 'today', 'date': order.created_at.astimezone(dt_timezone.utc).date().isoformat(), 'source': 'view',
+    })
+
+    assert response.status_code == 200, response.data
+    assert response.data['summary']['total_items'] == 3
+    assert response.data['summary']['total_revenue'] == 30.0
+    assert response.data['top_dishes'][0]['quantity'] == 3
+
+
+def test_report_cache_is_served_until_a_write_renews_its_day(api_client, recipe, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        create_orders(2, recipe, items_per_order=1)
+        first, second = Order.objects.order_by('pk')
+        pay_order(first, '10.00')
+    params = {'period': 'today', 'date': first.created_at.astimezone(dt_timezone.utc).date().isoformat(), 'source': 'view'}
+
+    assert api_client.get('/api/v1/dashboard-financiero/report/', params).data['summary']['total_orders'] == 1
+    with CaptureQueriesContext(connection) as queries:
+        assert api_client.get('/api/v1/dashboard-financiero/report/', params).data['summary']['total_orders'] == 1
+    assert not any('dashboard' in query['sql'] for query in queries.captured_queries)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        pay_order(second, '10.00')
+
+    summary = api_client.get('/api/v1/dashboard-financiero/report/', params).data['summary']
+    assert (summary['total_orders'], summary['total_revenue']) == (2, 20.0)
+
+
+def rollup_snapshot():
+    return (
+        list(DailyOrderRollup.objects.order_by('day').values('day', 'orders', 'items', 'quantity', 'revenue')),
+        sorted(DailySalesRollup.objects.values_list(
+            'day', 'hour', 'recipe_id', 'category_name', 'recipe_name', 'items', 'quantity', 'revenue'
+        )),
+        sorted(DailyPaymentRollup.objects.values_list('day', 'payment_method', 'amount', 'count')),
+    )
+
+
+def assert_rollups_match_rebuild():
+    """Los deltas por orden dejan los rollups igual que una reconstrucción completa del día"""
+    incremental = rollup_snapshot()
+    DailyOrderRollup.rebuild_days(Order.objects.dates('created_at', 'day'))
+    assert incremental == rollup_snapshot()
+    return incremental
+
+
+def test_rollups_follow_paid_and_canceled_transitions(recipe):
+    create_orders(3, recipe, items_per_order=2)
+    first, second, third = Order.objects.order_by('pk')
+    pay_order(first, '20.00')
+    pay_order(second, '5.00', '15.00')
+
+    orders, sales, payments = assert_rollups_match_rebuild()
+    assert orders[0]['orders'] == 2 and orders[0]['revenue'] == Decimal('40.00')
+    assert [(method, count) for _, method, _, count in payments] == [('CARD', 1), ('CASH', 2)]
+
+    # Pago extra sobre una orden ya pagada y cancelación de una orden pagada
+    Payment.objects.create(order=first, payment_method='YAPE_PLIN', amount=Decimal('3.00'))
+    second.update_status('CANCELED')
+    orders, sales, payments = assert_rollups_match_rebuild()
+    assert orders[0]['orders'] == 1 and orders[0]['revenue'] == Decimal('20.00')
+
+    # Órdenes canceladas sin pagar y órdenes pagadas eliminadas
+    third.update_status('CANCELED')
+    first.delete()
+    assert assert_rollups_match_rebuild() == ([], [], [])
+
+
+
+def test_rollup_rows_survive_recipe_and_group_renames(recipe):
+    create_orders(1, recipe, items_per_order=2)
+    order = Order.objects.get()
+    pay_order(order, '20.00')
+
+    recipe.name = 'Arroz chaufa especial'
+    recipe.save()
+    recipe.group.name = 'Platos de fondo'
+    recipe.group.save()
+    order.update_status('CANCELED')
+
+    assert rollup_snapshot() == ([], [], [])
+
+def test_rollup_delta_is_rolled_back_with_the_transaction(recipe):
+    create_orders(1, recipe)
+    order = Order.objects.get()
+
+    with pytest.raises(RuntimeError), transaction.atomic():
+        pay_order(order, '30.00')
+        assert DailyOrderRollup.objects.get().orders == 1
+        raise RuntimeError
+
+    assert not DailyOrderRollup.objects.exists()
+
+
+def test_deleting_items_and_orders_restores_stock_once(recipe):
+    rice = Ingredient.objects.get(name='Arroz')
+    taper = Container.objects.create(name='Taper', price=Decimal('1.00'), stock=10)
+    order = Order.objects.create(table=Table.objects.create(zone=Zone.objects.create(name='Salón'), table_number='M1'), waiter='mesero')
+    to_go = OrderItem.objects.create(order=order, recipe=recipe, quantity=2, container=taper, has_taper=True)
+    OrderItem.objects.create(order=order, recipe=recipe, quantity=3)
+    rice_stock = Ingredient.objects.get(pk=rice.pk).current_stock
+    taper_stock = Container.objects.get(pk=taper.pk).stock
+
+    OrderItem.delete_restoring_stock(OrderItem.objects.filter(pk=to_go.pk), f"order:{order.pk}")
+    assert Ingredient.objects.get(pk=rice.pk).current_stock == rice_stock + 2
+    assert Container.objects.get(pk=taper.pk).stock == taper_stock + 1
+
+    order.delete()
+    assert Ingredient.objects.get(pk=rice.pk).current_stock == rice_stock + 5
+    assert Container.objects.get(pk=taper.pk).stock == taper_stock + 1
+    assert not OrderItem.objects.exists()
+
+
+@pytest.fixture
+def printer_job(recipe):
+    printer = PrinterConfig.objects.create(name='Cocina', usb_port='/tmp/cocina-lp0')
+    create_orders(1, recipe, items_per_order=1)
+    return PrintJob.objects.create(printer=printer, order_item=OrderItem.objects.get())
+
+
+def test_stale_printing_jobs_fail_instead_of_reprinting(printer_job, monkeypatch):
+    printer_job.status = 'PRINTING'
+    printer_job.claim_token = 'abandonado'
+    printer_job.next_attempt_at = timezone.now() - timedelta(seconds=dispatcher_setting('STALE_SECONDS') + 1)
+    printer_job.save()
+    written = []
+    monkeypatch.setattr(print_dispatcher, 'write_to_device', lambda printer, content: written.append(content))
+
+    assert print_dispatcher.process_pending(printer_job.printer_id) == 1
+
+    printer_job.refresh_from_db()
+    assert printer_job.status == 'FAILED' and printer_job.claim_token == ''
+    assert written == []
+
+
+def test_first_request_starts_workers_for_pending_jobs(printer_job, settings, monkeypatch):
+    settings.PRINT_DISPATCHER = {**settings.PRINT_DISPATCHER, 'THREADS': True}
+    notified = []
+    monkeypatch.setattr(print_dispatcher, 'notify', notified.append)
+
+    request_started.connect(print_dispatcher.start_pending_workers, dispatch_uid='print_dispatcher_startup')
+    request_started.send(sender=None)
+    request_started.send(sender=None)
+
+    assert notified == [{printer_job.printer_id}]
+
+
+
+@pytest.fixture
+def kitchen_printer(recipe, tmp_path):
+    printer = PrinterConfig.objects.create(name='Cocina', usb_port=str(tmp_path / 'lp0'))
+    recipe.printer = printer
+    recipe.save()
+    return printer
+
+
+def test_pending_jobs_of_an_order_print_as_one_ticket(kitchen_printer, recipe):
+    # FIFO como puerto: el ticket llega a un lector igual que a /dev/usb/lp0
+    os.mkfifo(kitchen_printer.usb_port)
+    received = []
+    reader = threading.Thread(target=lambda: received.append(open(kitchen_printer.usb_port, 'rb').read()), daemon=True)
+    reader.start()
+    create_orders(1, recipe)
+
+    assert print_dispatcher.process_pending(kitchen_printer.id) == 3
+    reader.join(timeout=5)
+
+    ticket = received[0].decode('utf-8')
+    assert ticket.count(OrderItem.ESC_CUT) == 1
+    assert ticket.count(recipe.name.upper()) == 3
+    assert set(PrintJob.objects.values_list('status', flat=True)) == {'DONE'}
+    assert set(OrderItem.objects.values_list('status', 'print_confirmed')) == {('PREPARING', True)}
+
+
+def test_failed_print_backs_off_and_manual_retry_requeues_it(api_client, kitchen_printer, recipe, settings, tmp_path):
+    settings.PRINT_DISPATCHER = {**settings.PRINT_DISPATCHER, 'MAX_ATTEMPTS': 2, 'BACKOFF_SECONDS': 30}
+    port = tmp_path / 'usb' / 'lp0'
+    kitchen_printer.usb_port = str(port)
+    kitchen_printer.save()
+    create_orders(1, recipe, items_per_order=1)
+    job = PrintJob.objects.get()
+
+    # Puerto inexistente: reintento programado con backoff
+    assert print_dispatcher.process_pending(kitchen_printer.id) == 1
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == ('PENDING', 1)
+    assert job.next_attempt_at - timezone.now() > timedelta(seconds=25)
+    assert print_dispatcher.process_pending(kitchen_printer.id) == 0
+
+    PrintJob.objects.update(next_attempt_at=timezone.now())
+    print_dispatcher.process_pending(kitchen_printer.id)
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == ('FAILED', 2)
+
+    # El reintento manual solo reencola: el request no escribe al puerto
+    port.parent.mkdir()
+    response = api_client.post(f'/api/v1/order-items/{job.order_item_id}/retry_print/')
+    assert response.status_code == 202, response.data
+    assert not port.exists()
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == ('PENDING', 0)
+
+    assert print_dispatcher.process_pending(kitchen_printer.id) == 1
+    assert recipe.name.upper() in port.read_text()
+    job.refresh_from_db()
+    assert job.status == 'DONE'
+    assert OrderItem.objects.get().status == 'PREPARING'
+
+
+def test_order_cancel_reaches_the_kitchen_stream(api_client, printer_job, django_capture_on_commit_callbacks):
+    order = printer_job.order_item.order
+    subscription = get_broker().subscribe(ThreadSubscription('kitchen'))
+    try:
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(f'/api/v1/orders/{order.pk}/cancel/', {'cancellation_reason': 'Cliente se retiró'})
+        events = []
+        while (event := subscription.get(timeout=0)) is not None:
+            events.append(event)
+    finally:
+        get_broker().unsubscribe(subscription)
+
+    assert response.status_code == 200, response.data
+    assert [(event['event'], event['data']['id'], event['data']['status']) for event in events] == [
+        ('order_item_update', printer_job.order_item_id, 'CANCELED'),
+    ]
+    printer_job.refresh_from_db()
+    assert printer_job.status == 'CANCELED'
+    assert OrderItem.objects.get().cancellation_reason == 'Cliente se retiró'
@@ -2,29 +2,34 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError as DRFValidationError
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Prefetch
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from backend.conditional_viewsets import ConditionalGetMixin
 from backend.development_permissions import IsAuthenticatedPermission, IsAdminPermission, DevelopmentAwarePermission, DevelopmentAwareAdminPermission
 # Rate limiting moved to Nginx - no longer using Django decorators
 from .models import Order, OrderItem, Payment, PaymentItem, ContainerSale, PrinterConfig
 from .serializers import (
     OrderSerializer, OrderDetailSerializer, OrderCreateSerializer,
-    OrderItemSerializer, OrderItemCreateSerializer,
+    OrderItemSerializer, OrderItemCreateSerializer, OrderItemForCreateSerializer, KitchenBoardItemSerializer,
     # OrderItemIngredient serializers removed - functionality deprecated
     PaymentSerializer, OrderStatusUpdateSerializer, SplitPaymentSerializer,
     ContainerSaleSerializer
 )
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.select_related('table__zone').prefetch_related(
-        'orderitem_set__recipe__group',
+        Prefetch('orderitem_set', queryset=OrderItem.serialization_queryset()),
         'container_sales__container',
         'payments'
     ).order_by('-created_at')
     pagination_class = None  # Deshabilitar paginación para órdenes
+    version_resources = ('orders',)
+    version_bucket_seconds = 60  # elapsed_time_minutes cambia cada minuto
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -34,16 +39,16 @@ class OrderViewSet(viewsets.ModelViewSet):
         return OrderSerializer
     
     def get_queryset(self):
-        # Base queryset with common optimizations
-        queryset = Order.objects.select_related('table__zone').prefetch_related(
-            'orderitem_set__recipe__group',
-            'container_sales__container',
-            'payments'
-        ).order_by('-created_at')
-        
-        # Further optimize if using detail serializer (retrieve, update)
+        # Detail serializer (retrieve, update) has its own eager loading
         if self.action in ['retrieve', 'update', 'partial_update']:
-            queryset = OrderDetailSerializer.setup_eager_loading(queryset)
+            queryset = OrderDetailSerializer.setup_eager_loading(Order.objects.all()).order_by('-created_at')
+        else:
+            # Base queryset with common optimizations
+            queryset = Order.objects.select_related('table__zone').prefetch_related(
+                Prefetch('orderitem_set', queryset=OrderItem.serialization_queryset()),
+                'container_sales__container',
+                'payments'
+            ).order_by('-created_at')
         
         status_filter = self.request.query_params.get('status')
         table = self.request.query_params.get('table')
@@ -93,6 +98,8 @@ class OrderViewSet(viewsets.ModelViewSet):
                         {'error': 'La orden debe tener al menos un item'},
                         status=status.HTTP_400_BAD_REQUEST
                     )
+                items_serializer = OrderItemForCreateSerializer(data=items, many=True)
+                items_serializer.is_valid(raise_exception=True)
                 
                 # Actualizar información del cliente si se proporciona
                 customer_name = request.data.get('customer_name')
@@ -102,43 +109,22 @@ class OrderViewSet(viewsets.ModelViewSet):
                     active_order.customer_name = customer_name
                 if party_size:
                     active_order.party_size = party_size
-                active_order.save()
-                
-                # Agregar items al pedido existente - crear individuales
-                for item_data in items:
-                    quantity = item_data.get('quantity', 1)
-                    # Crear OrderItems individuales (uno por cada cantidad)
-                    for i in range(quantity):
-                        new_item = OrderItem.objects.create(
-                            order=active_order,
-                            recipe_id=item_data.get('recipe'),
-                            quantity=1,  # Cada OrderItem tiene quantity=1
-                            notes=item_data.get('notes', ''),
-                            is_takeaway=item_data.get('is_takeaway', False),
-                            has_taper=item_data.get('has_taper', False),
-                            container_id=item_data.get('selected_container')
-                        )
-                        logger.info(f"🟦 BACKEND - OrderItem creado: ID={new_item.id}, quantity={new_item.quantity}")
                 
-                # Verificar total de items después de agregar
-                total_items = active_order.orderitem_set.count()
-                logger.info(f"🟦 BACKEND - Total items en orden {active_order.id}: {total_items}")
-                
-                # Recalcular total del pedido
-                active_order.calculate_total()
+                # Agregar items al pedido existente en lote (un OrderItem por unidad)
+                try:
+                    with transaction.atomic():
+                        active_order.save()
+                        new_items = active_order.add_items(items_serializer.validated_data)
+                except ValidationError as e:
+                    return Response(
+                        {'error': ' '.join(e.messages)},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
                 
                 # MANTENER el estado actual del Order al agregar nuevos items
                 # Un Order en PREPARING debe permanecer en PREPARING aunque se agreguen nuevos items CREATED
                 # Solo los nuevos items necesitan ser procesados individualmente
-                logger.info(f"🟦 BACKEND - Orden {active_order.id} mantiene estado {active_order.status} (nuevos items agregados: {new_items_count})")
-                
-                # LOG DETALLADO: Estado de la orden después de agregar items
-                logger.info(f"📊 BACKEND - ORDEN #{active_order.id} DESPUÉS DE AGREGAR ITEMS:")
-                logger.info(f"   • Estado Order: {active_order.status}")
-                logger.info(f"   • Total items: {active_order.orderitem_set.count()}")
-                all_items = active_order.orderitem_set.all()
-                for item in all_items:
-                    logger.info(f"   • Item #{item.id}: {item.recipe.name} - Estado: {item.status}")
+                logger.info(f"🟦 BACKEND - Orden {active_order.id} mantiene estado {active_order.status} (nuevos items agregados: {len(new_items)})")
                 
                 # Devolver el pedido actualizado con detalles completos
                 serializer = OrderDetailSerializer(active_order, context={'request': request})
@@ -203,15 +189,13 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
         
         # Cancelar el pedido y todos sus items
-        order.update_status('CANCELED', cancellation_reason=cancellation_reason)
-        
-        # Cancelar todos los items del pedido
-        for item in order.orderitem_set.all():
-            if item.status not in ['PAID', 'CANCELED']:
-                item.status = 'CANCELED'
-                item.cancellation_reason = cancellation_reason
-                item.canceled_at = timezone.now()
-                item.save()
+        with transaction.atomic():
+            order.update_status('CANCELED', cancellation_reason=cancellation_reason)
+            
+            # Cancelar todos los items del pedido (cocina recibe order_item_update)
+            for item in order.orderitem_set.all():
+                if item.status not in ['PAID', 'CANCELED']:
+                    item.cancel(cancellation_reason)
         
         response_serializer = OrderDetailSerializer(order)
         return Response(response_serializer.data)
@@ -238,13 +222,17 @@ class OrderViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             try:
                 order_item = serializer.save()
-                order.calculate_total()
                 
                 # Mantener el status actual de la orden (CREATED o PREPARING)
                 # Los nuevos items se crean con status CREATED y aparecerán para ser enviados a cocina
                 
                 response_serializer = OrderItemSerializer(order_item)
                 return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+            except DRFValidationError as e:
+                return Response({
+                    'error': 'Datos inválidos',
+                    'details': e.detail
+                }, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 logger.error(f"ADD_ITEM DEBUG - Exception during save: {str(e)}")
                 return Response({
@@ -265,12 +253,75 @@ class OrderViewSet(viewsets.ModelViewSet):
         """Obtener todas las órdenes activas (no pagadas ni canceladas)"""
         orders = Order.objects.filter(
             status__in=['CREATED', 'SERVED']
+        ).select_related('table__zone').prefetch_related(
+            Prefetch('orderitem_set', queryset=OrderItem.serialization_queryset()),
+            'container_sales__container',
+            'payments'
         ).order_by('-created_at')
         
         serializer = OrderSerializer(orders, many=True)
         return Response(serializer.data)
     
-    # REMOVIDO: Kitchen endpoints - Ya no se usan, solo gestión de pedidos
+    @action(detail=False, methods=['get'])
+    def kitchen_board(self, request):
+        """
+        Tablero de cocina: items activos (CREATED/PREPARING) agrupados por impresora/estación.
+
+        Sin `since` devuelve la lista completa de grupos. Con `since` (el cursor devuelto en
+        el header X-Kitchen-Cursor o en la respuesta anterior) devuelve solo el delta:
+        vacío si nada cambió, o los items activos modificados, los ids que dejaron el
+        tablero y los ids activos actuales para reconciliar eliminaciones.
+        """
+        cursor = OrderItem.kitchen_board_cursor()
+        since = request.query_params.get('since')
+        active_items = OrderItem.objects.filter(status__in=OrderItem.KITCHEN_ACTIVE_STATUSES)
+
+        if since is None:
+            response = Response(self._kitchen_board_groups(active_items))
+        elif since == cursor:
+            # Poll sin cambios: solo las dos consultas del cursor
+            response = Response({'cursor': cursor, 'changed': False, 'groups': [], 'removed_ids': []})
+        else:
+            since_at = OrderItem.parse_kitchen_cursor(since)
+            changed_items = active_items
+            removed_ids = []
+            if since_at is not None:
+                changed_items = active_items.filter(updated_at__gt=since_at)
+                removed_ids = list(
+                    OrderItem.objects.filter(updated_at__gt=since_at)
+                    .exclude(status__in=OrderItem.KITCHEN_ACTIVE_STATUSES)
+                    .values_list('id', flat=True)
+                )
+            response = Response({
+                'cursor': cursor,
+                'changed': True,
+                'groups': self._kitchen_board_groups(changed_items),
+                'removed_ids': removed_ids,
+                'active_ids': list(active_items.values_list('id', flat=True)),
+            })
+
+        response['X-Kitchen-Cursor'] = cursor
+        return response
+
+    def _kitchen_board_groups(self, items):
+        """Agrupa items por impresora (estación) en una sola consulta"""
+        items = items.select_related(
+            'order__table__zone', 'recipe__printer', 'container'
+        ).order_by('created_at', 'id')
+
+        groups = {}
+        for item in items:
+            printer = item.recipe.printer
+            group = groups.get(item.recipe.printer_id)
+            if group is None:
+                group = groups[item.recipe.printer_id] = {
+                    'printer_id': item.recipe.printer_id,
+                    'printer_name': printer.name if printer else 'Sin impresora',
+                    'items': [],
+                }
+            group['items'].append(KitchenBoardItemSerializer(item).data)
+        return list(groups.values())
+
     
     @action(detail=True, methods=['post'])
     def process_payment(self, request, pk=None):
@@ -388,7 +439,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             PaymentItem.objects.all().delete()
             Payment.objects.all().delete()
             ContainerSale.objects.all().delete()
-            OrderItem.objects.all().delete()
+            OrderItem.delete_restoring_stock(OrderItem.objects.all())
             Order.objects.all().delete()
             
             # Note: Print functionality has been removed from this project
@@ -473,12 +524,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         # 1. Órdenes en estado SERVED (cerradas por mesero)
         # 2. Órdenes que tienen items en estado PREPARING o SERVED (pueden pagarse directamente)
         from django.db.models import Q
-        orders = Order.objects.filter(
+        orders = OrderDetailSerializer.setup_eager_loading(Order.objects.filter(
             Q(status='SERVED') |  # Órdenes cerradas
             Q(orderitem__status__in=['PREPARING', 'SERVED'])  # O con items procesables
-        ).distinct().order_by('-created_at')
+        ).distinct()).order_by('-created_at')
         
-        serializer = OrderDetailSerializer(orders, many=True)
+        serializer = OrderDetailSerializer(orders, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
@@ -533,7 +584,7 @@ class OrderItemViewSet(viewsets.ModelViewSet):
         return OrderItemSerializer
     
     def get_queryset(self):
-        queryset = OrderItem.objects.all().order_by('-created_at')
+        queryset = OrderItem.serialization_queryset().select_related('order__table__zone').order_by('-created_at')
         order = self.request.query_params.get('order')
         status_filter = self.request.query_params.get('status')
         recipe = self.request.query_params.get('recipe')
@@ -632,13 +683,13 @@ class OrderItemViewSet(viewsets.ModelViewSet):
         success, message = order_item.retry_print()
 
         if success:
-            # Devolver el item actualizado
+            # La impresión queda encolada: el item se confirma cuando el hilo la imprime
             serializer = OrderItemSerializer(order_item)
             return Response({
                 'success': True,
                 'message': message,
                 'item': serializer.data
-            }, status=status.HTTP_200_OK)
+            }, status=status.HTTP_202_ACCEPTED)
         else:
             return Response({
                 'success': False,
@@ -4,11 +4,14 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from backend.development_permissions import DevelopmentAwarePermission
 from django.utils import timezone
-from django.db.models import Sum, Count, Q, F
+from django.db.models import Sum, Count, Q, F, Max
 from django.db import connection
 from datetime import datetime, timedelta
 from decimal import Decimal
-from .models import Order, OrderItem, Payment
+from collections import defaultdict
+from .models import Order, OrderItem, Payment, DailyOrderRollup, DailySalesRollup, DailyPaymentRollup
+from .report_cache import cached_report
+from .dashboard_aggregator import ITEM_COLUMNS, PAYMENT_COLUMNS, DashboardAggregator, fetch_rows
 from inventory.models import Recipe
 
 
@@ -76,8 +79,14 @@ class DashboardFinancieroViewSet(viewsets.ViewSet):
             # Calcular fechas según el período
             period_info = self._calculate_period_dates(period, date_param)
             
-            # Consultar la vista de BD optimizada
-            financial_data = self._query_dashboard_view(period_info)
+            # Consultar los rollups diarios (?source=view recorre la vista completa)
+            source = 'view' if query_params.get('source') == 'view' else 'rollups'
+            query = self._query_dashboard_view if source == 'view' else self._query_rollups
+            financial_data = cached_report(
+                'financiero', [period, period_info['start_date'], period_info['end_date'], source],
+                period_info['start_date'], period_info['end_date'],
+                lambda: query(period_info)
+            )
             
             # Agregar información del período
             financial_data['period_info'] = {
@@ -186,170 +195,223 @@ class DashboardFinancieroViewSet(viewsets.ViewSet):
                 'total_days': 30
             }
     
+    def _query_rollups(self, period_info):
+        """
+        Dashboard financiero a partir de los rollups diarios (DailyOrderRollup, DailySalesRollup,
+        DailyPaymentRollup): pequeños GROUP BY sobre filas ya agregadas por día
+        """
+        day_filter = {}
+        if period_info['start_date'] and period_info['end_date']:
+            day_filter = {'day__range': (period_info['start_date'], period_info['end_date'])}
+
+        days = list(DailyOrderRollup.objects.filter(**day_filter).order_by('day'))
+        if not days:
+            return self._empty_report()
+
+        sales = DailySalesRollup.objects.filter(**day_filter)
+        category_rows = sales.values('category_name').annotate(
+            revenue_sum=Sum('revenue'), quantity_sum=Sum('quantity')
+        ).order_by('-revenue_sum')
+        dish_rows = sales.values('recipe_name').annotate(
+            category=Max('category_name'), quantity_sum=Sum('quantity'),
+            revenue_sum=Sum('revenue'), price=Max('unit_price')
+        ).order_by('-quantity_sum')
+        daily_category_rows = sales.values('day', 'category_name').annotate(
+            revenue_sum=Sum('revenue'), quantity_sum=Sum('quantity')
+        ).order_by('day')
+        daily_dish_rows = sales.values('day', 'recipe_name').annotate(
+            category=Max('category_name'), quantity_sum=Sum('quantity'),
+            revenue_sum=Sum('revenue'), price=Max('unit_price')
+        ).order_by('day', '-quantity_sum')
+        hour_rows = sales.values('hour').annotate(
+            revenue_sum=Sum('revenue'), quantity_sum=Sum('quantity')
+        ).order_by('hour')
+        payment_rows = DailyPaymentRollup.objects.filter(**day_filter).values('payment_method').annotate(
+            amount_sum=Sum('amount'), count_sum=Sum('count')
+        ).order_by('-amount_sum')
+
+        def dish_entry(row):
+            return {
+                'name': row['recipe_name'],
+                'category': row['category'],
+                'quantity': row['quantity_sum'],
+                'revenue': float(row['revenue_sum']),
+                'unit_price': float(row['price'])
+            }
+
+        day_categories = defaultdict(list)
+        for row in daily_category_rows:
+            day_categories[row['day']].append({
+                'category': row['category_name'],
+                'revenue': float(row['revenue_sum']),
+                'quantity': row['quantity_sum']
+            })
+        day_dishes = defaultdict(list)
+        for row in daily_dish_rows:
+            day_dishes[row['day']].append(dish_entry(row))
+
+        total_orders = sum(day.orders for day in days)
+        total_revenue = sum((day.revenue for day in days), Decimal('0'))
+        average_ticket = total_revenue / total_orders if total_orders > 0 else Decimal('0')
+
+        total_category_revenue = sum((row['revenue_sum'] for row in category_rows), Decimal('0'))
+        category_breakdown = [
+            {
+                'category': row['category_name'],
+                'revenue': float(row['revenue_sum']),
+                'quantity': row['quantity_sum'],
+                'percentage': float(row['revenue_sum'] / total_category_revenue * 100) if total_category_revenue > 0 else 0
+            }
+            for row in category_rows
+        ]
+
+        sales_by_day = [
+            {
+                'date': str(day.day),
+                'orders': day.orders,
+                'revenue': float(day.revenue),
+                'items': day.quantity,
+                'category_breakdown': day_categories[day.day],
+                'top_dishes': day_dishes[day.day]
+            }
+            for day in days
+        ]
+
+        total_payment_amount = sum((row['amount_sum'] for row in payment_rows), Decimal('0'))
+        payment_methods = [
+            {
+                'method': row['payment_method'],
+                'amount': float(row['amount_sum']),
+                'percentage': float(row['amount_sum'] / total_payment_amount * 100) if total_payment_amount > 0 else 0,
+                'transaction_count': row['count_sum']
+            }
+            for row in payment_rows
+        ]
+
+        report = self._build_report(
+            summary={
+                'total_orders': total_orders,
+                'total_revenue': float(total_revenue),
+                'average_ticket': float(average_ticket),
+                'total_items': sum(day.items for day in days)
+            },
+            category_breakdown=category_breakdown,
+            top_dishes=[dish_entry(row) for row in dish_rows],
+            payment_methods=payment_methods,
+            sales_by_day=sales_by_day,
+        )
+        report['sales_by_hour'] = [
+            {'hour': row['hour'], 'revenue': float(row['revenue_sum']), 'quantity': row['quantity_sum']}
+            for row in hour_rows
+        ]
+        return report
+
+    def _empty_report(self):
+        """Respuesta para un período sin órdenes pagadas"""
+        return {
+            'summary': {
+                'total_orders': 0,
+                'total_revenue': 0.0,
+                'average_ticket': 0.0,
+                'total_items': 0
+            },
+            'category_breakdown': [],
+            'top_dishes': [],
+            'payment_methods': [],
+            'sales_by_day': [],
+            'revenue_trends': {
+                'daily_average': 0,
+                'daily_maximum': 0
+            },
+            'production_trends': {
+                'daily_average': 0,
+                'daily_maximum': 0
+            }
+        }
+
+    def _build_report(self, summary, category_breakdown, top_dishes, payment_methods, sales_by_day):
+        """Agrega tendencias y metas dinámicas calculadas a partir de las ventas por día"""
+        revenue_values = [day['revenue'] for day in sales_by_day if day['revenue'] > 0]
+        items_values = [day['items'] for day in sales_by_day if day['items'] > 0]
+        
+        revenue_average = sum(revenue_values) / len(revenue_values) if revenue_values else 0
+        revenue_maximum = max(revenue_values) if revenue_values else 0
+        items_average = sum(items_values) / len(items_values) if items_values else 0
+        items_maximum = max(items_values) if items_values else 0
+        
+        return {
+            'summary': summary,
+            'category_breakdown': category_breakdown,
+            'top_dishes': top_dishes,
+            'payment_methods': payment_methods,
+            'sales_by_day': sales_by_day,
+            'revenue_trends': {
+                'daily_average': revenue_average,
+                'daily_maximum': revenue_maximum,
+                'items_average': items_average,
+                'items_maximum': items_maximum
+            },
+            'goals': {
+                'sales': {
+                    'meta300': revenue_average,
+                    'meta500': revenue_maximum
+                },
+                'production': {
+                    'meta300': int(items_average),
+                    'meta500': int(items_maximum)
+                }
+            }
+        }
+
     def _query_dashboard_view(self, period_info):
         """
-        USA dashboard_operativo_view para estandarización completa del sistema
-        Filtrada por período para análisis financiero
+        USA las vistas de hechos dashboard_item_view y dashboard_payment_view (las mismas del
+        dashboard operativo) filtradas por período; las filas se agregan en una sola pasada
         """
         from django.db import connection
-        from decimal import Decimal
-        from collections import defaultdict
         
         cursor = connection.cursor()
+        aggregator = DashboardAggregator()
         
-        # USAR dashboard_operativo_view para consistencia con dashboard operativo
         try:
-            # Construir consulta con filtro de fechas usando la vista consolidada
+            # Construir filtro de fechas común a ambas vistas
             if period_info['start_date'] and period_info['end_date']:
                 date_where = f"WHERE operational_date BETWEEN '{period_info['start_date']}' AND '{period_info['end_date']}'"
             else:
                 date_where = ""
                 
-            query = f"""
-                SELECT 
-                    order_id, 
-                    order_total, 
-                    order_status, 
-                    waiter, 
-                    operational_date,
-                    item_id, 
-                    quantity, 
-                    unit_price, 
-                    total_price, 
-                    total_with_container, 
-                    item_status, 
-                    is_takeaway,
-                    recipe_name, 
-                    category_name, 
-                    category_id,
-                    payment_method,
-                    payment_amount,
-                    created_at,
-                    paid_at
-                FROM dashboard_operativo_view
+            cursor.execute(f"""
+                SELECT {', '.join(ITEM_COLUMNS)}
+                FROM dashboard_item_view
                 {date_where}
                 ORDER BY operational_date DESC, order_id, item_id
-            """
+            """)
+            aggregator.consume(fetch_rows(cursor))
             
-            cursor.execute(query)
+            cursor.execute(f"""
+                SELECT {', '.join(PAYMENT_COLUMNS)}
+                FROM dashboard_payment_view
+                {date_where}
+            """)
+            aggregator.consume_payments(fetch_rows(cursor))
         except Exception as db_error:
-            cursor.close()
             raise Exception(f"Error en consulta de tablas directas: {str(db_error)}")
+        finally:
+            cursor.close()
         
-        all_data = cursor.fetchall()
-        cursor.close()
-        
-        if not all_data:
+        if not aggregator.rows:
             # Retorno vacío para período sin datos
-            return {
-                'summary': {
-                    'total_orders': 0,
-                    'total_revenue': 0.0,
-                    'average_ticket': 0.0,
-                    'total_items': 0
-                },
-                'category_breakdown': [],
-                'top_dishes': [],
-                'payment_methods': [],
-                'sales_by_day': [],
-                'revenue_trends': {
-                    'daily_average': 0,
-                    'daily_maximum': 0
-                },
-                'production_trends': {
-                    'daily_average': 0,
-                    'daily_maximum': 0
-                }
-            }
-        
-        # Inicializar estructuras de datos
-        paid_orders = set()
-        paid_orders_totals = {}
-        category_stats = defaultdict(lambda: {'revenue': Decimal('0'), 'quantity': 0})
-        dish_stats = defaultdict(lambda: {'category': '', 'quantity': 0, 'revenue': Decimal('0'), 'unit_price': Decimal('0')})
-        payment_stats = defaultdict(lambda: {'amount': Decimal('0'), 'count': 0})
-        daily_sales = defaultdict(lambda: {'orders': 0, 'revenue': Decimal('0'), 'items': 0})
-        daily_category_stats = defaultdict(lambda: defaultdict(lambda: {'revenue': Decimal('0'), 'quantity': 0}))
-        daily_dish_stats = defaultdict(lambda: defaultdict(lambda: {'category': '', 'quantity': 0, 'revenue': Decimal('0'), 'unit_price': Decimal('0')}))
-        
-        # PROCESAR DATOS DE dashboard_operativo_view - INCLUIR total_with_container para consistencia
-        for row in all_data:
-            (order_id, order_total, order_status, waiter, operational_date,
-             item_id, quantity, unit_price, total_price, total_with_container, item_status, is_takeaway,
-             recipe_name, category_name, category_id,
-             payment_method, payment_amount, created_at, paid_at) = row
-            
-            # Solo órdenes PAID
-            if order_status == 'PAID' and item_id:
-                paid_orders.add(order_id)
-                
-                if order_id not in paid_orders_totals:
-                    # Calcular el total real con containers para esta orden
-                    order_real_total = Decimal('0')
-                    for check_row in all_data:
-                        if check_row[0] == order_id and check_row[2] == 'PAID' and check_row[5] is not None:  # order_id, order_status, item_id
-                            order_real_total += Decimal(str(check_row[9] or 0))  # total_with_container
-                    
-                    paid_orders_totals[order_id] = order_real_total
-                    # Agregar a daily_sales una sola vez por orden - USAR total real con containers
-                    date_str = str(operational_date)
-                    daily_sales[date_str]['orders'] += 1
-                    daily_sales[date_str]['revenue'] += order_real_total
-                
-                # Stats por categoría - USAR total_with_container para consistencia
-                if category_name and recipe_name:
-                    category = category_name or 'Sin Categoría'
-                    category_stats[category]['revenue'] += Decimal(str(total_with_container or 0))
-                    category_stats[category]['quantity'] += quantity or 0
-                    
-                    # Stats por día y categoría
-                    date_str = str(operational_date)
-                    daily_category_stats[date_str][category]['revenue'] += Decimal(str(total_with_container or 0))
-                    daily_category_stats[date_str][category]['quantity'] += quantity or 0
-                
-                # Stats por receta (top dishes) - USAR total_with_container para consistencia
-                if recipe_name:
-                    dish_stats[recipe_name]['category'] = category_name or 'Sin Categoría'
-                    dish_stats[recipe_name]['quantity'] += quantity or 0
-                    dish_stats[recipe_name]['revenue'] += Decimal(str(total_with_container or 0))
-                    dish_stats[recipe_name]['unit_price'] = Decimal(str(unit_price or 0))
-                    
-                    # Stats por día y receta (para tooltips específicos por fecha)
-                    date_str = str(operational_date)
-                    daily_dish_stats[date_str][recipe_name]['category'] = category_name or 'Sin Categoría'
-                    daily_dish_stats[date_str][recipe_name]['quantity'] += quantity or 0
-                    daily_dish_stats[date_str][recipe_name]['revenue'] += Decimal(str(total_with_container or 0))
-                    daily_dish_stats[date_str][recipe_name]['unit_price'] = Decimal(str(unit_price or 0))
-                
-                # Stats de pagos - USAR payment_method y payment_amount de la vista
-                if payment_method and payment_amount and order_id not in [order_id for stat in payment_stats.values() for order_id in stat.get('processed_orders', [])]:
-                    # Usar payment_method y payment_amount directamente
-                    if payment_method and payment_method != 'Sin pagos':
-                        try:
-                            amount = Decimal(str(payment_amount or 0))
-                            if amount > 0:
-                                if 'processed_orders' not in payment_stats[payment_method]:
-                                    payment_stats[payment_method]['processed_orders'] = []
-                                payment_stats[payment_method]['amount'] += amount
-                                payment_stats[payment_method]['count'] += 1
-                                payment_stats[payment_method]['processed_orders'].append(order_id)
-                        except (ValueError, TypeError):
-                            continue
-                
-                # Items por día
-                date_str = str(operational_date)
-                daily_sales[date_str]['items'] += quantity or 0
+            return self._empty_report()
         
         # Calcular métricas principales
-        total_orders = len(paid_orders)
-        total_revenue = sum(paid_orders_totals.values())
+        total_orders = len(aggregator.paid_orders)
+        total_revenue = aggregator.total_revenue
         average_ticket = total_revenue / total_orders if total_orders > 0 else Decimal('0')
-        total_items = len([row for row in all_data if row[2] == 'PAID' and row[5] is not None])
         
         # Formatear category_breakdown
-        total_category_revenue = sum(cat['revenue'] for cat in category_stats.values())
+        total_category_revenue = aggregator.category_stats.total('revenue')
         category_breakdown = []
-        for category, stats in sorted(category_stats.items(), key=lambda x: x[1]['revenue'], reverse=True):
+        for category, stats in aggregator.category_stats.ranked('revenue'):
             percentage = (stats['revenue'] / total_category_revenue * 100) if total_category_revenue > 0 else 0
             category_breakdown.append({
                 'category': category,
@@ -359,23 +421,15 @@ class DashboardFinancieroViewSet(viewsets.ViewSet):
             })
         
         # Top dishes - incluir TODOS los platos para que el tooltip funcione correctamente
-        top_dishes = []
-        for dish, stats in sorted(dish_stats.items(), key=lambda x: x[1]['quantity'], reverse=True):
-            top_dishes.append({
-                'name': dish,
-                'category': stats['category'],
-                'quantity': stats['quantity'],
-                'revenue': float(stats['revenue']),
-                'unit_price': float(stats['unit_price'])
-            })
+        top_dishes = [self._dish_entry(dish, stats) for dish, stats in aggregator.dish_stats.ranked('quantity')]
         
         # Ventas por día CON breakdown por categoría
         sales_by_day = []
-        for day, stats in sorted(daily_sales.items()):
+        for day, stats in sorted(aggregator.daily_sales.items()):
             # Category breakdown para este día específico
             day_category_breakdown = []
-            if day in daily_category_stats:
-                for category, cat_stats in daily_category_stats[day].items():
+            if day in aggregator.daily_category_stats:
+                for category, cat_stats in aggregator.daily_category_stats[day].items():
                     day_category_breakdown.append({
                         'category': category,
                         'revenue': float(cat_stats['revenue']),
@@ -384,15 +438,11 @@ class DashboardFinancieroViewSet(viewsets.ViewSet):
             
             # Top dishes para este día específico (para tooltips)
             day_top_dishes = []
-            if day in daily_dish_stats:
-                for dish_name, dish_stat in sorted(daily_dish_stats[day].items(), key=lambda x: x[1]['quantity'], reverse=True):
-                    day_top_dishes.append({
-                        'name': dish_name,
-                        'category': dish_stat['category'],
-                        'quantity': dish_stat['quantity'],
-                        'revenue': float(dish_stat['revenue']),
-                        'unit_price': float(dish_stat['unit_price'])
-                    })
+            if day in aggregator.daily_dish_stats:
+                day_top_dishes = [
+                    self._dish_entry(dish, dish_stat)
+                    for dish, dish_stat in aggregator.daily_dish_stats[day].ranked('quantity')
+                ]
             
             sales_by_day.append({
                 'date': day,
@@ -403,63 +453,27 @@ class DashboardFinancieroViewSet(viewsets.ViewSet):
                 'top_dishes': day_top_dishes  # ✅ AGREGADO: top_dishes específicos del día
             })
         
-        # Metas dinámicas
-        revenue_values = [day['revenue'] for day in sales_by_day if day['revenue'] > 0]
-        items_values = [day['items'] for day in sales_by_day if day['items'] > 0]
-        
-        revenue_average = sum(revenue_values) / len(revenue_values) if revenue_values else 0
-        revenue_maximum = max(revenue_values) if revenue_values else 0
-        items_average = sum(items_values) / len(items_values) if items_values else 0
-        items_maximum = max(items_values) if items_values else 0
-        
-        return {
-            'summary': {
+        return self._build_report(
+            summary={
                 'total_orders': total_orders,
                 'total_revenue': float(total_revenue),
                 'average_ticket': float(average_ticket),
-                'total_items': total_items
-            },
-            'category_breakdown': category_breakdown,
-            'top_dishes': top_dishes,
-            'payment_methods': self._format_payment_methods(payment_stats),
-            'sales_by_day': sales_by_day,
-            'revenue_trends': {
-                'daily_average': revenue_average,
-                'daily_maximum': revenue_maximum,
-                'items_average': items_average,
-                'items_maximum': items_maximum
+                'total_items': aggregator.total_items
             },
-            'goals': {
-                'sales': {
-                    'meta300': revenue_average,
-                    'meta500': revenue_maximum
-                },
-                'production': {
-                    'meta300': int(items_average),
-                    'meta500': int(items_maximum)
-                }
-            }
-        }
+            category_breakdown=category_breakdown,
+            top_dishes=top_dishes,
+            payment_methods=aggregator.payment_methods(),
+            sales_by_day=sales_by_day,
+        )
     
-    def _format_payment_methods(self, payment_stats):
-        """
-        Formatea los payment methods limpiando processed_orders y calculando percentages
-        """
-        total_payment_amount = sum(stat['amount'] for stat in payment_stats.values())
-        payment_methods = []
-        
-        for method, stats in payment_stats.items():
-            percentage = (stats['amount'] / total_payment_amount * 100) if total_payment_amount > 0 else 0
-            # Limpiar stats para el frontend (remover processed_orders)
-            clean_stats = {k: v for k, v in stats.items() if k != 'processed_orders'}
-            payment_methods.append({
-                'method': method,
-                'amount': float(clean_stats['amount']),
-                'percentage': float(percentage),
-                'transaction_count': clean_stats['count']
-            })
-        
-        return payment_methods
+    def _dish_entry(self, name, stats):
+        return {
+            'name': name,
+            'category': stats['category'],
+            'quantity': stats['quantity'],
+            'revenue': float(stats['revenue']),
+            'unit_price': float(stats['unit_price'])
+        }
     
     def _query_fallback_data(self, period_info):
         """
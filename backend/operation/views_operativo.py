@@ -10,6 +10,9 @@ from django.db import connection
 from datetime import datetime, timedelta
 from decimal import Decimal
 from .models import Order, OrderItem, Payment
+from .dashboard_queries import OperationalDashboardQueries
+from .report_cache import cached_report
+from config.models import ResourceVersion
 from inventory.models import Recipe
 
 
@@ -40,8 +43,12 @@ class DashboardOperativoViewSet(viewsets.ViewSet):
             else:
                 selected_date = timezone.now().date()
             
-            # Usar método completo de dashboard con vista
-            operational_data = self._query_dashboard_view(selected_date)
+            # Reporte desde la caché por día operativo; unsold_recipes depende además del menú
+            recipes_version = ResourceVersion.current(['recipes'])[0]
+            operational_data = cached_report(
+                'operativo', [selected_date, *recipes_version], selected_date, selected_date,
+                lambda: self._query_dashboard_view(selected_date)
+            )
             
             # Agregar información de la fecha
             operational_data['date'] = selected_date.isoformat()
@@ -149,67 +156,13 @@ class DashboardOperativoViewSet(viewsets.ViewSet):
     
     def _query_dashboard_view(self, selected_date):
         """
-        Usa EXCLUSIVAMENTE dashboard_operativo_view para todos los datos del dashboard operativo
-        Arquitectura consolidada: Una sola fuente de verdad para máximo rendimiento y consistencia
+        Construye el dashboard operativo con consultas GROUP BY parametrizadas sobre las vistas
+        de hechos (ver OperationalDashboardQueries): solo se transfieren filas ya agregadas
         """
-        from django.db import connection
-        from decimal import Decimal
-        from collections import defaultdict
-        
-        # CONSULTA DIRECTA SIN PARÁMETROS PROBLEMÁTICOS
-        from django.db import connection
-        import logging
-        
-        # Deshabilitar temporalmente el logging SQL de Django para evitar string formatting issues
-        django_db_logger = logging.getLogger('django.db.backends')
-        original_level = django_db_logger.level
-        django_db_logger.setLevel(logging.ERROR)
+        queries = OperationalDashboardQueries(selected_date)
+        summary = queries.summary()
         
-        cursor = connection.cursor()
-        
-        try:
-            # Query con parámetros seguros usando ? placeholder
-            date_str = selected_date.strftime('%Y-%m-%d')
-            
-            # Query completamente literal - sin parámetros para evitar string formatting issues
-            query = f"""
-                SELECT 
-                    order_id, 
-                    order_total, 
-                    order_status, 
-                    waiter, 
-                    operational_date,
-                    item_id, 
-                    quantity, 
-                    unit_price, 
-                    total_price, 
-                    total_with_container, 
-                    item_status, 
-                    is_takeaway,
-                    recipe_name, 
-                    category_name, 
-                    category_id,
-                    payment_method,
-                    payment_amount,
-                    created_at,
-                    paid_at
-                FROM dashboard_operativo_view
-                WHERE operational_date = '{date_str}'
-                ORDER BY order_id, item_id
-            """
-            
-            cursor.execute(query)
-            all_data = cursor.fetchall()
-            
-        except Exception as e:
-            cursor.close()
-            raise Exception(f"Error en consulta dashboard: {str(e)}")
-        finally:
-            cursor.close()
-            # Restaurar el logging SQL de Django
-            django_db_logger.setLevel(original_level)
-        
-        if not all_data:
+        if not summary['row_count']:
             # Sin datos para la fecha
             return {
                 'summary': {
@@ -229,292 +182,106 @@ class DashboardOperativoViewSet(viewsets.ViewSet):
                 'unsold_recipes': []
             }
         
-        # Inicializar estructuras de datos
-        paid_orders = set()
-        paid_orders_totals = {}
-        category_stats = defaultdict(lambda: {'revenue': Decimal('0'), 'quantity': 0})
-        delivery_category_stats = defaultdict(lambda: {'revenue': Decimal('0'), 'quantity': 0, 'recipes': {}})
-        dish_stats = defaultdict(lambda: {'category': '', 'quantity': 0, 'revenue': Decimal('0'), 'unit_price': Decimal('0')})
-        waiter_stats = defaultdict(lambda: {'revenue': Decimal('0'), 'orders': 0})
-        item_status_stats = defaultdict(lambda: {'count': 0, 'amount': Decimal('0')})
-        payment_stats = defaultdict(lambda: {'amount': Decimal('0'), 'count': 0})
-        
-        # Estadísticas de delivery/takeaway
-        delivery_stats = {
-            'total_delivery_orders': 0,
-            'total_delivery_revenue': Decimal('0'),
-            'total_restaurant_orders': 0, 
-            'total_restaurant_revenue': Decimal('0'),
-            'delivery_items': 0,
-            'restaurant_items': 0
-        }
-        
-        # Métricas operativas
-        active_orders = set()
-        pending_items = 0
-        preparing_items = 0
-        served_items = 0
-        service_times = []
-        
-        # PROCESAR TODOS LOS DATOS DE LA VISTA CONSOLIDADA
-        for row in all_data:
-            # Desempaquetar con manejo de errores - exactamente 19 campos del SELECT
-            try:
-                (order_id, order_total, order_status, waiter, operational_date,
-                 item_id, quantity, unit_price, total_price, total_with_container, item_status, is_takeaway,
-                 recipe_name, category_name, category_id,
-                 payment_method, payment_amount, created_at, paid_at) = row
-            except ValueError as e:
-                # Debug: imprimir la estructura de datos recibida
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Error desempaquetando fila de datos: {e}. Fila: {row}")
-                continue
-            
-            # Procesar solo órdenes PAID para métricas financieras
-            if order_status == 'PAID' and item_id:
-                paid_orders.add(order_id)
-                
-                # Guardar total de la orden una sola vez
-                if order_id not in paid_orders_totals:
-                    paid_orders_totals[order_id] = Decimal(str(order_total or 0))
-                
-                # Stats por categoría (solo órdenes PAID) - USAR total_with_container para consistencia
-                if category_name and recipe_name:
-                    category = category_name or 'Sin Categoría'
-                    category_stats[category]['revenue'] += Decimal(str(total_with_container or 0))
-                    category_stats[category]['quantity'] += quantity or 0
-                
-                # Stats por receta (solo órdenes PAID) - USAR total_with_container para consistencia
-                if recipe_name:
-                    dish_stats[recipe_name]['category'] = category_name or 'Sin Categoría'
-                    dish_stats[recipe_name]['quantity'] += quantity or 0
-                    dish_stats[recipe_name]['revenue'] += Decimal(str(total_with_container or 0))
-                    dish_stats[recipe_name]['unit_price'] = Decimal(str(unit_price or 0))
-                
-                # Stats por delivery/takeaway (solo órdenes PAID)
-                if is_takeaway:
-                    delivery_stats['delivery_items'] += quantity or 0
-                    
-                    # Stats específicos de delivery por categoría - USAR total_with_container para consistencia
-                    if category_name and recipe_name:
-                        category = category_name or 'Sin Categoría'
-                        delivery_category_stats[category]['revenue'] += Decimal(str(total_with_container or 0))
-                        delivery_category_stats[category]['quantity'] += quantity or 0
-                        
-                        # Agregar recipe a la categoría delivery
-                        if recipe_name not in delivery_category_stats[category]['recipes']:
-                            delivery_category_stats[category]['recipes'][recipe_name] = {
-                                'quantity': 0,
-                                'revenue': Decimal('0'),
-                                'unit_price': Decimal(str(unit_price or 0))
-                            }
-                        
-                        delivery_category_stats[category]['recipes'][recipe_name]['quantity'] += quantity or 0
-                        delivery_category_stats[category]['recipes'][recipe_name]['revenue'] += Decimal(str(total_with_container or 0))
-                else:
-                    delivery_stats['restaurant_items'] += quantity or 0
-                
-                # Stats por mesero (solo órdenes PAID) - ACUMULAR por items para consistencia con total_with_container
-                waiter_name = waiter or 'Sin Asignar'
-                waiter_stats[waiter_name]['revenue'] += Decimal(str(total_with_container or 0))
-                
-                # Contar órdenes únicas por mesero
-                if order_id not in [w['order_id'] for w in waiter_stats[waiter_name].get('processed_orders', [])]:
-                    if 'processed_orders' not in waiter_stats[waiter_name]:
-                        waiter_stats[waiter_name]['processed_orders'] = []
-                    waiter_stats[waiter_name]['processed_orders'].append({'order_id': order_id})
-                    waiter_stats[waiter_name]['orders'] += 1
-            
-            # Calcular delivery/restaurant por item individual - USAR total_with_container para consistencia
-            if order_status == 'PAID' and item_id:
-                if is_takeaway:
-                    delivery_stats['total_delivery_revenue'] += Decimal(str(total_with_container or 0))
-                else:
-                    delivery_stats['total_restaurant_revenue'] += Decimal(str(total_with_container or 0))
-            
-            # Estado de items: TODOS los items del día (no solo PAID) - USAR total_with_container para consistencia
-            if item_id and item_status:
-                item_status_stats[item_status]['count'] += 1
-                if order_status == 'PAID':
-                    item_status_stats[item_status]['amount'] += Decimal(str(total_with_container or 0))
-            
-            # Métricas operativas: todas las órdenes activas
-            if order_status in ('CREATED', 'SERVED'):
-                active_orders.add(order_id)
-            
-            if item_status == 'CREATED':
-                pending_items += 1
-            elif item_status == 'PREPARING':
-                preparing_items += 1
-            elif item_status == 'SERVED':
-                served_items += 1
-            
-            # Stats de pagos (solo órdenes PAID) - USAR payment_method y payment_amount para análisis simplificado
-            if payment_method and payment_amount and order_status == 'PAID' and order_id not in [order_id for stat in payment_stats.values() for order_id in stat.get('processed_orders', [])]:
-                # El payment_method viene directamente de la tabla payment
-                if payment_method and payment_method != 'Sin pagos':
-                    try:
-                        amount = Decimal(str(payment_amount or 0))
-                        if amount > 0:
-                            payment_stats[payment_method]['amount'] += amount
-                            payment_stats[payment_method]['count'] += 1
-                            if 'processed_orders' not in payment_stats[payment_method]:
-                                payment_stats[payment_method]['processed_orders'] = []
-                            payment_stats[payment_method]['processed_orders'].append(order_id)
-                    except (ValueError, TypeError):
-                        continue
-                
-                # Si no hay payment_method pero sí payment_amount, usar método genérico
-                elif payment_amount and payment_amount > 0:
-                    payment_stats['UNKNOWN']['amount'] += Decimal(str(payment_amount))
-                    payment_stats['UNKNOWN']['count'] += 1
-                    if 'processed_orders' not in payment_stats['UNKNOWN']:
-                        payment_stats['UNKNOWN']['processed_orders'] = []
-                    payment_stats['UNKNOWN']['processed_orders'].append(order_id)
-            
-            # Calcular tiempo de servicio para órdenes completadas
-            if order_status == 'PAID' and order_id not in [entry['order_id'] for entry in service_times]:
-                # Usar datos directos de la fila actual
-                if created_at and paid_at:
-                    # Calcular diferencia en minutos - USAR TIEMPO REAL
-                    time_diff = (paid_at - created_at).total_seconds() / 60
-                    
-                    # Usar el tiempo REAL siempre (sin estimaciones)
-                    # Solo filtrar tiempos completamente irreales (> 7 días)
-                    if 0 < time_diff < 10080:  # Entre 0 minutos y 7 días
-                        service_times.append({
-                            'order_id': order_id,
-                            'service_time': time_diff
-                        })
-        
-        # Contar órdenes únicas por tipo
-        order_has_delivery_items = set()
-        order_has_local_items = set()
-        
-        for row in all_data:
-            # Use the same unpacking as the main loop (19 fields) - INCLUIR created_at, paid_at
-            (order_id, order_total, order_status, waiter, operational_date,
-             item_id, quantity, unit_price, total_price, total_with_container, item_status, is_takeaway,
-             recipe_name, category_name, category_id,
-             payment_method, payment_amount, created_at, paid_at) = row
-            
-            if order_status == 'PAID' and item_id:
-                if is_takeaway:
-                    order_has_delivery_items.add(order_id)
-                else:
-                    order_has_local_items.add(order_id)
-        
-        delivery_stats['total_delivery_orders'] = len(order_has_delivery_items)
-        delivery_stats['total_restaurant_orders'] = len(order_has_local_items)
-        
         # Calcular métricas principales
-        total_orders = len(paid_orders)
-        # USAR la suma de delivery + restaurant revenue para consistencia con total_with_container
-        total_revenue = delivery_stats['total_delivery_revenue'] + delivery_stats['total_restaurant_revenue']
-        average_ticket = total_revenue / total_orders if total_orders > 0 else Decimal('0')
-        # Contar items de órdenes PAID: row[2] = order_status, row[5] = item_id
-        total_items = len([row for row in all_data if row[2] == 'PAID' and row[5] is not None])
-        average_service_time = sum(entry['service_time'] for entry in service_times) / len(service_times) if service_times else 0
+        total_orders = summary['total_orders']
+        total_revenue = float(summary['delivery_revenue']) + float(summary['restaurant_revenue'])
+        average_ticket = total_revenue / total_orders if total_orders > 0 else 0
         
         # Category breakdown
-        total_category_revenue = sum(cat['revenue'] for cat in category_stats.values())
+        categories = queries.categories()
+        total_category_revenue = sum(float(row['revenue']) for row in categories)
         category_breakdown = []
-        for category, stats in sorted(category_stats.items(), key=lambda x: x[1]['revenue'], reverse=True):
-            percentage = (stats['revenue'] / total_category_revenue * 100) if total_category_revenue > 0 else 0
+        for row in categories:
+            revenue = float(row['revenue'])
             category_breakdown.append({
-                'category': category,
-                'revenue': float(stats['revenue']),
-                'quantity': stats['quantity'],
-                'percentage': float(percentage)
+                'category': row['category'],
+                'revenue': revenue,
+                'quantity': row['quantity'],
+                'percentage': revenue / total_category_revenue * 100 if total_category_revenue > 0 else 0
             })
         
-        # Delivery Category breakdown
-        total_delivery_revenue = sum(cat['revenue'] for cat in delivery_category_stats.values())
-        delivery_category_breakdown = []
-        for category, stats in sorted(delivery_category_stats.items(), key=lambda x: x[1]['revenue'], reverse=True):
-            percentage = (stats['revenue'] / total_delivery_revenue * 100) if total_delivery_revenue > 0 else 0
-            
-            # Formatear recipes para el frontend
-            recipes_list = []
-            for recipe_name, recipe_stats in sorted(stats['recipes'].items(), key=lambda x: x[1]['revenue'], reverse=True):
-                recipes_list.append({
-                    'name': recipe_name,
-                    'quantity': recipe_stats['quantity'],
-                    'revenue': float(recipe_stats['revenue']),
-                    'unit_price': float(recipe_stats['unit_price'])
-                })
-            
-            delivery_category_breakdown.append({
-                'category': category,
-                'revenue': float(stats['revenue']),
-                'quantity': stats['quantity'],
-                'percentage': float(percentage),
-                'recipes': recipes_list
+        # Delivery Category breakdown (las recetas llegan ordenadas por ingreso)
+        delivery_categories = {}
+        for row in queries.delivery_recipes():
+            category = delivery_categories.setdefault(row['category'], {
+                'category': row['category'], 'revenue': 0.0, 'quantity': 0, 'recipes': []
+            })
+            category['revenue'] += float(row['revenue'])
+            category['quantity'] += row['quantity']
+            category['recipes'].append({
+                'name': row['name'],
+                'quantity': row['quantity'],
+                'revenue': float(row['revenue']),
+                'unit_price': float(row['unit_price'] or 0)
             })
+        total_delivery_revenue = sum(category['revenue'] for category in delivery_categories.values())
+        delivery_category_breakdown = sorted(delivery_categories.values(), key=lambda x: x['revenue'], reverse=True)
+        for category in delivery_category_breakdown:
+            category['percentage'] = (
+                category['revenue'] / total_delivery_revenue * 100 if total_delivery_revenue > 0 else 0
+            )
         
         # Top dishes
+        dishes = queries.dishes()
         top_dishes = []
-        for dish, stats in sorted(dish_stats.items(), key=lambda x: x[1]['quantity'], reverse=True)[:10]:
+        for row in dishes[:10]:
             top_dishes.append({
-                'name': dish,
-                'category': stats['category'],
-                'quantity': stats['quantity'],
-                'revenue': float(stats['revenue']),
-                'unit_price': float(stats['unit_price'])
+                'name': row['name'],
+                'category': row['category'],
+                'quantity': row['quantity'],
+                'revenue': float(row['revenue']),
+                'unit_price': float(row['unit_price'] or 0)
             })
         
         # Waiter performance
         waiter_performance = []
-        for waiter, stats in sorted(waiter_stats.items(), key=lambda x: x[1]['revenue'], reverse=True):
-            clean_stats = {k: v for k, v in stats.items() if k != 'processed_orders'}
-            avg_ticket = clean_stats['revenue'] / clean_stats['orders'] if clean_stats['orders'] > 0 else Decimal('0')
+        for row in queries.waiters():
+            revenue = float(row['revenue'])
             waiter_performance.append({
-                'waiter': waiter,
-                'revenue': float(clean_stats['revenue']),
-                'orders': clean_stats['orders'],
-                'average_ticket': float(avg_ticket)
+                'waiter': row['waiter'],
+                'revenue': revenue,
+                'orders': row['orders'],
+                'average_ticket': revenue / row['orders'] if row['orders'] > 0 else 0
             })
         
         # Payment methods
-        total_payment_amount = sum(stat['amount'] for stat in payment_stats.values())
+        payments = queries.payment_methods()
+        total_payment_amount = sum(float(row['amount']) for row in payments)
         payment_methods = []
-        for method, stats in payment_stats.items():
-            percentage = (stats['amount'] / total_payment_amount * 100) if total_payment_amount > 0 else 0
-            # Limpiar stats para el frontend (remover processed_orders)
-            clean_stats = {k: v for k, v in stats.items() if k != 'processed_orders'}
+        for row in payments:
+            amount = float(row['amount'])
             payment_methods.append({
-                'method': method,
-                'amount': float(clean_stats['amount']),
-                'percentage': float(percentage),
-                'transaction_count': clean_stats['count']
+                'method': row['method'],
+                'amount': amount,
+                'percentage': amount / total_payment_amount * 100 if total_payment_amount > 0 else 0,
+                'transaction_count': row['transaction_count']
             })
         
         # Item status breakdown
-        total_items_status = sum(stat['count'] for stat in item_status_stats.values())
+        statuses = queries.item_statuses()
+        total_items_status = sum(row['count'] for row in statuses)
         item_status_breakdown = []
-        for status_name, stats in item_status_stats.items():
-            percentage = (stats['count'] / total_items_status * 100) if total_items_status > 0 else 0
+        for row in statuses:
             item_status_breakdown.append({
-                'status': status_name,
-                'count': stats['count'],
-                'amount': float(stats['amount']),
-                'count_percentage': float(percentage)
+                'status': row['status'],
+                'count': row['count'],
+                'amount': float(row['amount']),
+                'count_percentage': row['count'] / total_items_status * 100 if total_items_status > 0 else 0
             })
         
-        # Unsold recipes (obtener todas las recetas activas y compararlas)
+        # Unsold recipes (recetas activas sin ventas en el día)
         unsold_recipes_list = []
         try:
-            all_recipes = Recipe.objects.filter(is_active=True, is_available=True).select_related('group')
-            sold_recipe_names = set(dish_stats.keys())
+            all_recipes = Recipe.objects.filter(is_active=True, is_available=True).exclude(
+                name__in=[row['name'] for row in dishes]
+            ).select_related('group')
             
             for recipe in all_recipes:
-                if recipe.name not in sold_recipe_names:
-                    unsold_recipes_list.append({
-                        'name': recipe.name,
-                        'category': recipe.group.name if recipe.group else 'Sin Categoría',
-                        'price': float(recipe.base_price)
-                    })
+                unsold_recipes_list.append({
+                    'name': recipe.name,
+                    'category': recipe.group.name if recipe.group else 'Sin Categoría',
+                    'price': float(recipe.base_price)
+                })
         except Exception as e:
             # Si hay error, continuar sin recetas no vendidas
             pass
@@ -522,21 +289,21 @@ class DashboardOperativoViewSet(viewsets.ViewSet):
         return {
             'summary': {
                 'total_orders': total_orders,
-                'total_revenue': float(total_revenue),
-                'average_ticket': float(average_ticket),
-                'total_items': total_items,
-                'average_service_time': float(average_service_time),
-                'active_orders': len(active_orders),
-                'pending_items': pending_items,
-                'preparing_items': preparing_items,
-                'served_items': served_items,
+                'total_revenue': total_revenue,
+                'average_ticket': average_ticket,
+                'total_items': summary['total_items'],
+                'average_service_time': queries.average_service_time(),
+                'active_orders': summary['active_orders'],
+                'pending_items': summary['pending_items'],
+                'preparing_items': summary['preparing_items'],
+                'served_items': summary['served_items'],
                 # Delivery/Restaurant breakdown
-                'delivery_orders': delivery_stats['total_delivery_orders'],
-                'restaurant_orders': delivery_stats['total_restaurant_orders'],
-                'delivery_revenue': float(delivery_stats['total_delivery_revenue']),
-                'restaurant_revenue': float(delivery_stats['total_restaurant_revenue']),
-                'delivery_items': delivery_stats['delivery_items'],
-                'restaurant_items': delivery_stats['restaurant_items']
+                'delivery_orders': summary['delivery_orders'],
+                'restaurant_orders': summary['restaurant_orders'],
+                'delivery_revenue': float(summary['delivery_revenue']),
+                'restaurant_revenue': float(summary['restaurant_revenue']),
+                'delivery_items': summary['delivery_items'],
+                'restaurant_items': summary['restaurant_items']
             },
             'category_breakdown': category_breakdown,
             'delivery_category_breakdown': delivery_category_breakdown,
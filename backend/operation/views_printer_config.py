@@ -79,12 +79,11 @@ class PrinterConfigViewSet(viewsets.ModelViewSet):
         """Eliminar configuración de impresora"""
         instance = self.get_object()
         
-        # ELIMINADO: PrintQueue - ya no hay trabajos pendientes que verificar
-        # pending_jobs_count = instance.printqueue_set.filter(status='pending').count()
-        # if pending_jobs_count > 0:
-        #     return Response({
-        #         'error': f'No se puede eliminar la impresora. Tiene {pending_jobs_count} trabajos pendientes.'
-        #     }, status=status.HTTP_400_BAD_REQUEST)
+        pending_jobs_count = instance.print_jobs.filter(status__in=['PENDING', 'PRINTING']).count()
+        if pending_jobs_count > 0:
+            return Response({
+                'error': f'No se puede eliminar la impresora. Tiene {pending_jobs_count} trabajos pendientes.'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         # Verificar si hay recetas asignadas
         recipes_count = instance.recipe_set.count()